@@ -0,0 +1,86 @@
+"""
+Benchmark for the serial-number lookups in sync_verkada_device_ids.
+
+Seeds an org with synthetic devices in the Firestore emulator, then compares
+one deviceSerialNumber query per device (the old lookup) with the single
+paged, projected scan in utils/device_index.py, reporting Firestore round
+trips, documents read and wall time for each.
+
+Start the emulator first (firebase emulators:start --only firestore), then:
+
+    python benchmarks/bench_device_index.py [device_count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+
+import firebase_admin
+
+firebase_admin.initialize_app(options={'projectId': os.environ.get('GCLOUD_PROJECT', 'webbpulse-inventory-management')})
+
+from src.shared import db
+from src.helper_functions.verkada_integration.utils import device_index
+
+BENCH_ORG_ID = 'bench-device-index'
+
+
+def seed_devices(device_count):
+    devices_ref = db.collection('organizations').document(BENCH_ORG_ID).collection('devices')
+    existing = sum(1 for _ in devices_ref.select([]).stream())
+    if existing >= device_count:
+        return
+    batch = db.batch()
+    for i in range(existing, device_count):
+        doc_ref = devices_ref.document()
+        batch.set(doc_ref, {
+            'deviceId': doc_ref.id,
+            'deviceSerialNumber': f"BENCH{i:08d}",
+            'deviceVerkadaDeviceId': f"{i:032x}",
+            'deviceVerkadaDeviceType': 'Camera',
+            'isDeviceCheckedOut': False,
+            'deviceCheckedOutBy': '',
+            'deviceDeleted': False,
+        })
+        if (i + 1) % 500 == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+
+
+def per_device_queries(serial_numbers):
+    """The old lookup: one query per serial number."""
+    devices_ref = db.collection('organizations').document(BENCH_ORG_ID).collection('devices')
+    round_trips = 0
+    documents = 0
+    for serial_number in serial_numbers:
+        documents += len(devices_ref.where('deviceSerialNumber', '==', serial_number).limit(1).get())
+        round_trips += 1
+    return round_trips, documents
+
+
+def indexed_lookups(serial_numbers):
+    """The new lookup: one paged scan, then dictionary lookups."""
+    index = device_index.build_device_index(BENCH_ORG_ID)
+    found = sum(1 for serial_number in serial_numbers if index.get(serial_number) is not None)
+    return index.pages, len(index), found
+
+
+if __name__ == '__main__':
+    device_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"Seeding {device_count} devices in {os.environ['FIRESTORE_EMULATOR_HOST']}...")
+    seed_devices(device_count)
+    serial_numbers = [f"BENCH{i:08d}" for i in range(device_count)]
+
+    started_at = time.perf_counter()
+    round_trips, documents = per_device_queries(serial_numbers)
+    elapsed = time.perf_counter() - started_at
+    print(f"\nper-device queries: {round_trips:>6} round trips, {documents:>6} documents read, {elapsed:8.2f} s")
+
+    started_at = time.perf_counter()
+    pages, documents, found = indexed_lookups(serial_numbers)
+    elapsed = time.perf_counter() - started_at
+    print(f"paged index scan:   {pages:>6} round trips, {documents:>6} documents read, {elapsed:8.2f} s "
+          f"({found} of {len(serial_numbers)} serials found, page size {device_index.DEVICE_INDEX_PAGE_SIZE})")
@@ -0,0 +1,80 @@
+"""
+Memory benchmark for the device records kept by the Verkada inventory snapshot.
+
+Streams a synthetic camera list (shaped like the app/v2/init cameras array)
+from a file and holds what the device sync keeps of it: the full decoded
+items, as before, or one VerkadaDeviceRecord per item, as
+utils/inventory_snapshot.py does now. Each mode runs in its own process so
+peak RSS is measured separately; the traced Python heap peak is reported too.
+
+    python benchmarks/bench_device_records.py [device_count]
+"""
+import gc
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_json_codec import synthetic_init_payload
+from src.helper_functions.verkada_integration.utils import json_codec
+from src.helper_functions.verkada_integration.utils.json_stream import iter_json_array
+from src.helper_functions.verkada_integration.utils.verkada_device_types import VERKADA_DEVICE_TYPES
+
+CAMERA_TYPE = next(device_type for device_type in VERKADA_DEVICE_TYPES if device_type.device_type == 'Camera')
+
+
+def read_chunks(path, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_mode(mode, path):
+    gc.collect()
+    baseline_rss = peak_rss_mb()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    items = iter_json_array(read_chunks(path), 'cameras')
+    if mode == 'dicts':
+        kept = list(items)
+    else:
+        kept = [CAMERA_TYPE.to_record(item) for item in items]
+    elapsed = time.perf_counter() - started_at
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {mode:>7}: {len(kept):>7,} kept, {elapsed * 1000:8.1f} ms, "
+          f"held {current / 2 ** 20:7.1f} MB, heap peak {peak / 2 ** 20:7.1f} MB, "
+          f"peak RSS {peak_rss_mb():7.1f} MB (+{peak_rss_mb() - baseline_rss:.1f} MB)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    device_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    payload = synthetic_init_payload(camera_count=device_count)
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        f.write(json_codec.dumps(payload))
+        path = f.name
+    del payload
+    try:
+        print(f"{device_count:,} cameras, {os.path.getsize(path) / 2 ** 20:.1f} MB of JSON, codec {json_codec.JSON_CODEC}")
+        for mode in ('dicts', 'records'):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, path], check=True)
+    finally:
+        os.unlink(path)
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for the Verkada JSON codec and transfer compression.
+
+Compares stdlib json against the codec in utils/json_codec.py (orjson when
+installed) on payloads shaped like the app/v2/init document and a device list
+response, and reports the bytes saved by gzip and br on the wire.
+
+Pass recorded responses as arguments to benchmark them instead of the
+synthetic payloads:
+
+    python benchmarks/bench_json_codec.py [init.json] [device_list.json]
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.helper_functions.verkada_integration.utils import json_codec
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def synthetic_init_payload(camera_count=5000, site_count=300):
+    rng = random.Random(1)
+    sites = [{
+        'cameraGroupId': f"{rng.getrandbits(128):032x}",
+        'name': f"Site {i}",
+        'cameras': [],
+        'accessControllers': [f"{rng.getrandbits(128):032x}" for _ in range(rng.randint(0, 4))],
+        'vayuSensor': [f"{rng.getrandbits(128):032x}" for _ in range(rng.randint(0, 3))],
+        'timezone': 'America/Los_Angeles',
+    } for i in range(site_count)]
+    cameras = []
+    for i in range(camera_count):
+        site = rng.choice(sites)
+        camera_id = f"{rng.getrandbits(128):032x}"
+        site['cameras'].append(camera_id)
+        cameras.append({
+            'cameraId': camera_id,
+            'serialNumber': f"{rng.choice(['CD', 'CB', 'CF', 'CM'])}{rng.randint(10, 99)}-{rng.getrandbits(24):06X}",
+            'name': f"Camera {i} - Available",
+            'cameraGroup': site['cameraGroupId'],
+            'model': rng.choice(['CD42', 'CB52-E', 'CF81-E', 'CM42']),
+            'firmware': {'version': f"2.{rng.randint(0, 9)}.{rng.randint(0, 99)}", 'channel': 'stable'},
+            'location': {'lat': rng.uniform(-90, 90), 'lon': rng.uniform(-180, 180)},
+            'online': rng.random() > 0.05,
+            'settings': {'resolution': '4K', 'retentionDays': rng.choice([30, 60, 90]), 'audio': False},
+        })
+    return {'cameras': cameras, 'cameraGroups': sites, 'organization': {'name': 'Benchmark Org'}}
+
+
+def synthetic_device_list_payload(device_count=3000):
+    rng = random.Random(2)
+    return {'devices': [{
+        'id': f"{rng.getrandbits(128):032x}",
+        'serialNumber': f"{rng.getrandbits(48):012X}",
+        'alarmSystemId': f"{rng.getrandbits(128):032x}",
+        'name': f"{rng.getrandbits(48):012X} - Checked Out",
+        'deviceType': rng.choice(['doorContact', 'motionSensor', 'glassBreak', 'keypad']),
+        'batteryLevel': rng.randint(0, 100),
+        'lastSeen': 1700000000 + rng.randint(0, 10 ** 6),
+    } for _ in range(device_count)]}
+
+
+def time_call(func, arg, repeat=5):
+    """Returns the best time in milliseconds over repeat runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - started_at)
+    return best * 1000
+
+
+def bench(name, payload):
+    stdlib_body = json.dumps(payload).encode('utf-8')
+    codec_body = json_codec.dumps(payload)
+    print(f"\n{name}")
+    print(f"  encode  stdlib json: {time_call(lambda p: json.dumps(p).encode('utf-8'), payload):8.2f} ms")
+    print(f"  encode  {json_codec.JSON_CODEC:>11}: {time_call(json_codec.dumps, payload):8.2f} ms")
+    print(f"  decode  stdlib json: {time_call(json.loads, stdlib_body):8.2f} ms")
+    print(f"  decode  {json_codec.JSON_CODEC:>11}: {time_call(json_codec.loads, codec_body):8.2f} ms")
+    print(f"  bytes   stdlib json: {len(stdlib_body):>10,}")
+    print(f"  bytes   {json_codec.JSON_CODEC:>11}: {len(codec_body):>10,}")
+    gzipped = gzip.compress(codec_body, compresslevel=5)
+    print(f"  bytes          gzip: {len(gzipped):>10,} ({len(gzipped) / len(codec_body):.1%}), "
+          f"{time_call(lambda b: gzip.compress(b, compresslevel=5), codec_body):.2f} ms")
+    if brotli is not None:
+        brotlied = brotli.compress(codec_body, quality=5)
+        print(f"  bytes            br: {len(brotlied):>10,} ({len(brotlied) / len(codec_body):.1%})")
+    else:
+        print("  bytes            br: brotli not installed")
+
+
+def load_payload(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+if __name__ == '__main__':
+    init_payload = load_payload(sys.argv[1]) if len(sys.argv) > 1 else synthetic_init_payload()
+    device_list_payload = load_payload(sys.argv[2]) if len(sys.argv) > 2 else synthetic_device_list_payload()
+    print(f"Codec: {json_codec.JSON_CODEC}, Accept-Encoding: {json_codec.ACCEPT_ENCODING}")
+    bench("app/v2/init", init_payload)
+    bench("device list", device_list_payload)
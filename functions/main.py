@@ -15,6 +15,7 @@ from src.callable_functions.org_admin_callables.organizations.update_org_name_ca
 from src.callable_functions.org_admin_callables.organizations.delete_org_callable import delete_org_callable
 from src.callable_functions.org_admin_callables.users.delete_org_member_callable import delete_org_member_callable
 from src.callable_functions.org_admin_callables.devices.delete_device_callable import delete_device_callable
+from src.callable_functions.org_admin_callables.devices.migrate_device_doc_ids_callable import migrate_device_doc_ids_callable
 from src.callable_functions.org_admin_callables.organizations.verkada_integration.update_verkada_integration_status_callable import update_verkada_integration_status_callable
 from src.callable_functions.org_admin_callables.organizations.update_org_device_regex_callable import update_org_device_regex_callable
 from src.callable_functions.org_admin_callables.organizations.verkada_integration.sync_with_verkada_callable import sync_with_verkada_callable
@@ -23,6 +24,7 @@ from src.callable_functions.org_admin_callables.organizations.verkada_integratio
 from src.callable_functions.org_member_callables.devices.create_devices_callable import create_devices_callable
 from src.callable_functions.org_member_callables.devices.update_device_checkout_status_callable import update_device_checkout_status_callable
 from src.callable_functions.org_admin_callables.organizations.verkada_integration.update_verkada_site_cleaner_status_callable import update_verkada_site_cleaner_status_callable
+from src.callable_functions.org_admin_callables.organizations.verkada_integration.get_verkada_http_metrics_callable import get_verkada_http_metrics_callable
 
 #global user callable functions
 from src.callable_functions.global_user_callables.organizations.create_organization_callable import create_organization_callable
@@ -0,0 +1,38 @@
+from src.helper_functions.auth.auth_functions import check_user_is_org_admin, check_user_is_authed, check_user_token_current, check_user_is_email_verified
+from src.helper_functions.devices.migrate_device_doc_ids import migrate_device_doc_ids
+from src.helper_functions.verkada_integration.utils.deadline import Deadline
+from src.shared import POSTcorsrules
+
+from firebase_functions import https_fn
+from typing import Any
+
+@https_fn.on_call(cors=POSTcorsrules, timeout_sec=540)
+def migrate_device_doc_ids_callable(req: https_fn.CallableRequest) -> Any:
+    try:
+        org_id = req.data["orgId"]
+
+        check_user_is_authed(req)
+        check_user_is_email_verified(req)
+        check_user_token_current(req)
+        check_user_is_org_admin(req, org_id)
+
+        if not org_id:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+                message='The function must be called with the following arguments: orgId'
+            )
+
+        # Stops short of the function timeout; calling again resumes from the saved progress
+        result = migrate_device_doc_ids(org_id, deadline=Deadline.from_function_timeout())
+        if result.get('complete'):
+            return {"response": f"Device document IDs keyed by serial number for organization: {org_id}", **result}
+        return {"response": f"Device document ID migration paused for organization: {org_id}; call again to resume", **result}
+
+    except https_fn.HttpsError as e:
+        raise e
+
+    except Exception as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNKNOWN,
+            message=f"An error occurred: {str(e)}"
+        )
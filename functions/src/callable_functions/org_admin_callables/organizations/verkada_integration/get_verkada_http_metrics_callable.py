@@ -0,0 +1,37 @@
+from src.helper_functions.auth.auth_functions import check_user_is_org_admin, check_user_is_authed, check_user_token_current, check_user_is_email_verified
+from src.shared import db, POSTcorsrules
+
+from firebase_functions import https_fn
+from typing import Any
+
+
+@https_fn.on_call(cors=POSTcorsrules)
+def get_verkada_http_metrics_callable(req: https_fn.CallableRequest) -> Any:
+    """
+    Firebase Function to get the Verkada HTTP metrics recorded by the last run of each scheduled job.
+    Metrics are keyed by job name, then by HTTP method and endpoint template.
+    The function ensures the user is authenticated, their email is verified, their token is current,
+    and they are an admin of the organization.
+    """
+
+    org_id = req.data.get('orgId')
+
+    check_user_is_authed(req)
+    check_user_is_email_verified(req)
+    check_user_token_current(req)
+    check_user_is_org_admin(req, org_id)
+
+    try:
+        metrics_doc = db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaHttpMetrics').get()
+        metrics = metrics_doc.to_dict() or {}
+        for job_metrics in metrics.values():
+            updated_at = job_metrics.get('updatedAt')
+            if updated_at is not None:
+                job_metrics['updatedAt'] = updated_at.isoformat()
+
+        return {"response": metrics}
+    except Exception as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNKNOWN,
+            message=f"An error occurred: {str(e)}"
+        )
@@ -3,7 +3,10 @@ from src.shared import db, POSTcorsrules
 from src.helper_functions.verkada_integration.utils.grant_all_verkada_permissions import grant_all_verkada_permissions
 from src.helper_functions.verkada_integration.syncers.sync_verkada_device_ids import sync_verkada_device_ids
 from src.helper_functions.verkada_integration.syncers.sync_verkada_user_groups import sync_verkada_user_groups
-from src.helper_functions.verkada_integration.syncers.sync_verkada_site_ids import sync_verkada_site_ids
+from src.helper_functions.verkada_integration.utils.app_init_cache import log_app_init_cache_stats
+from src.helper_functions.verkada_integration.utils.inventory_snapshot import SECTION_SITES, take_inventory_snapshot
+from src.helper_functions.verkada_integration.utils.integration_runs import IntegrationRunReport
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -17,6 +20,7 @@ def sync_with_verkada_callable(req: https_fn.CallableRequest) -> Any:
     """
     
     """
+    deadline = Deadline.from_function_timeout()
 
     try:
         org_id = req.data.get("orgId", "")
@@ -24,6 +28,8 @@ def sync_with_verkada_callable(req: https_fn.CallableRequest) -> Any:
         verkada_org_id = req.data.get("orgVerkadaOrgId", "")
         verkada_org_bot_user_id = req.data.get("orgVerkadaBotUserId", "")
         verkada_org_bot_user_v2 = req.data.get("orgVerkadaBotUserV2", "")
+        # Reprocess every device type even when its Verkada payload is unchanged
+        force = req.data.get("force", False) is True
         
 
         check_user_is_authed(req)
@@ -65,17 +71,40 @@ def sync_with_verkada_callable(req: https_fn.CallableRequest) -> Any:
                 )
             verkada_bot_user_info = org_data['orgVerkadaBotUserInfo']
         if verkada_bot_user_info:
-            grant_all_verkada_permissions(verkada_bot_user_info)
-            sync_verkada_device_ids(org_id, verkada_bot_user_info)
-            sync_verkada_user_groups(org_id, verkada_bot_user_info)
-            sync_verkada_site_ids(org_id, verkada_bot_user_info)
+            run_report = IntegrationRunReport(org_id, 'sync_with_verkada_callable', verkada_bot_user_info.get('org_id'))
+            try:
+                # An admin syncing by hand expects current data, so the inventory is listed afresh for this run.
+                # Only the sites are needed for the grants; the rest is listed once the bot can see every site,
+                # otherwise devices on newly granted sites would be missed and marked removed.
+                with run_report.stage('sitesSnapshot'):
+                    take_inventory_snapshot(verkada_bot_user_info, org_id=org_id, deadline=deadline, sections=(SECTION_SITES,),
+                                            http_counts=run_report.http_counts)
+                with run_report.stage('permissions'):
+                    grant_all_verkada_permissions(verkada_bot_user_info, deadline=deadline, org_id=org_id,
+                                                  http_counts=run_report.http_counts)
+                with run_report.stage('inventorySnapshot'):
+                    take_inventory_snapshot(verkada_bot_user_info, org_id=org_id, deadline=deadline, http_counts=run_report.http_counts)
+                with run_report.stage('deviceSync'):
+                    # Device identity and site placement are written together, in one pass over the inventory
+                    device_sync_report = sync_verkada_device_ids(org_id, verkada_bot_user_info, deadline=deadline, force=force,
+                                                                 report=run_report, include_sites=True)
+                with run_report.stage('userGroups'):
+                    sync_verkada_user_groups(org_id, verkada_bot_user_info, deadline=deadline, http_counts=run_report.http_counts)
+            except Exception as e:
+                run_report.finish(error=e)
+                raise
+            log_app_init_cache_stats()
+            skipped = deadline.pop_skipped()
+            run_report.set('deadlineSkips', skipped)
+            run_report.finish()
+            save_deadline_skips(org_id, 'sync_with_verkada_callable', skipped)
         else:
             raise https_fn.HttpsError(
                 code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
                 message='The organization does not have Verkada bot user info configured.'
             )
 
-        return {"response": f"Organization Verkada permissions synced successfully."}
+        return {"response": f"Organization Verkada permissions synced successfully.", "deviceSync": device_sync_report, "runId": run_report.run_id}
 
     except https_fn.HttpsError as e:
         raise e
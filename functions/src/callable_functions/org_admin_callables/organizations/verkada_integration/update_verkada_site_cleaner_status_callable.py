@@ -13,12 +13,14 @@ from src.helper_functions.verkada_integration.cleaners.clean_verkada_device_site
 from src.helper_functions.verkada_integration.cleaners.clean_verkada_device_names import clean_verkada_device_names
 from src.helper_functions.verkada_integration.syncers.sync_verkada_site_ids import sync_verkada_site_ids
 from src.helper_functions.verkada_integration.cleaners.clean_orphaned_sites import clean_orphaned_sites
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 @https_fn.on_call(cors=POSTcorsrules, timeout_sec=540)
 def update_verkada_site_cleaner_status_callable(req: https_fn.CallableRequest,) -> any:
     """
     Updates the Verkada Site Cleaner status for a given organization.
     """
+    deadline = Deadline.from_function_timeout()
     try:
         org_id = req.data.get("orgId")
         enabled = req.data.get("enabled")
@@ -61,19 +63,23 @@ def update_verkada_site_cleaner_status_callable(req: https_fn.CallableRequest,)
                 )
             try:
                 functions = [
-                    ("clean_verkada_user_list", lambda: clean_verkada_user_list(verkada_bot_user_info)),
-                    ("clean_verkada_user_groups", lambda: clean_verkada_user_groups(org_id, verkada_bot_user_info)),
-                    ("clean_verkada_device_names", lambda: clean_verkada_device_names(org_id, verkada_bot_user_info)),
-                    ("clean_verkada_device_sites", lambda: clean_verkada_device_sites(org_id, verkada_bot_user_info)),
-                    ("sync_verkada_site_ids", lambda: sync_verkada_site_ids(org_id, verkada_bot_user_info)),
-                    ("clean_orphaned_sites", lambda: clean_orphaned_sites(org_id, verkada_bot_user_info))
+                    ("clean_verkada_user_list", lambda: clean_verkada_user_list(verkada_bot_user_info, deadline=deadline)),
+                    ("clean_verkada_user_groups", lambda: clean_verkada_user_groups(org_id, verkada_bot_user_info, deadline=deadline)),
+                    ("clean_verkada_device_names", lambda: clean_verkada_device_names(org_id, verkada_bot_user_info, deadline=deadline)),
+                    ("clean_verkada_device_sites", lambda: clean_verkada_device_sites(org_id, verkada_bot_user_info, deadline=deadline)),
+                    ("sync_verkada_site_ids", lambda: sync_verkada_site_ids(org_id, verkada_bot_user_info, deadline=deadline)),
+                    ("clean_orphaned_sites", lambda: clean_orphaned_sites(org_id, verkada_bot_user_info, deadline=deadline))
                 ]
                 
                 for func_name, func in functions:
+                    if deadline.expired:
+                        deadline.skip(func_name)
+                        continue
                     func()
                     logger.info(f"Successfully {func_name} for organization {org_id}.")
             except Exception as e:
                 logger.error(f"Error cleaning sites for organization: {org_id}, process: {func_name}, error: {e}")
+            save_deadline_skips(org_id, 'update_verkada_site_cleaner_status_callable', deadline.pop_skipped())
 
         return {"status": "success", "message": f"Verkada Site Cleaner status for organization {org_id} updated to {enabled}."}
 
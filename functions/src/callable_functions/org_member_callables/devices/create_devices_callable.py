@@ -1,5 +1,12 @@
 from src.helper_functions.auth.auth_functions import check_user_is_org_member, check_user_is_authed, check_user_token_current, check_user_is_email_verified
 from src.helper_functions.verkada_integration.utils.check_verkada_device_type import check_verkada_device_type
+from src.helper_functions.devices.device_doc_ids import (
+    DEVICE_DOC_ID_MODE_FIELD,
+    DEVICE_DOC_ID_MODE_SERIAL,
+    creates_serial_keyed_devices,
+    device_doc_id,
+    find_device_snapshot,
+)
 from src.shared import db, POSTcorsrules
 
 from firebase_functions import https_fn
@@ -23,7 +30,10 @@ def create_devices_callable(req: https_fn.CallableRequest) -> Any:
                 code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
                 message='The function must be called with a valid list of "deviceSerialNumbers" and a valid "org_id".'
             )
-        regex_filter = db.collection('organizations').document(org_id).get().get('orgDeviceRegexString')
+        org_data = db.collection('organizations').document(org_id).get().to_dict() or {}
+        regex_filter = org_data.get('orgDeviceRegexString')
+        serial_keyed = creates_serial_keyed_devices(org_data)
+        devices_ref = db.collection('organizations').document(org_id).collection('devices')
 
         response = {}
 
@@ -36,31 +46,32 @@ def create_devices_callable(req: https_fn.CallableRequest) -> Any:
                     response['failure'] = {}
                 response['failure'][device_serial_number] = f"Device does not match the regex filter"
                 continue
-            existing_device_query = db.collection('organizations').document(org_id).collection('devices').where('deviceSerialNumber', '==', device_serial_number).limit(1).get()
-            if existing_device_query:
-                device_ref = existing_device_query[0].reference
-                device_ref.set({
-                    'deviceId': device_ref.id,
-                    'deviceSerialNumber': device_serial_number,
-                    'createdAt': firestore.SERVER_TIMESTAMP,
-                    'isDeviceCheckedOut': False,
-                    'deviceCheckedOutBy': '',
-                    'deviceCheckedOutAt': None,
-                    'deviceDeleted': False,
-                    'deviceVerkadaDeviceType': device_verkada_device_type,
-                }, merge=True)
+            if org_data.get(DEVICE_DOC_ID_MODE_FIELD) == DEVICE_DOC_ID_MODE_SERIAL:
+                # Every device is keyed by its serial, so an existing device is upserted without reading it
+                existing_device = None
             else:
-                device_ref = db.collection('organizations').document(org_id).collection('devices').document()
-                device_ref.set({
-                    'deviceId': device_ref.id,
-                    'deviceSerialNumber': device_serial_number,
-                    'createdAt': firestore.SERVER_TIMESTAMP,
-                    'isDeviceCheckedOut': False,
-                    'deviceCheckedOutBy': '',
-                    'deviceCheckedOutAt': None,
-                    'deviceDeleted': False,
-                    'deviceVerkadaDeviceType': device_verkada_device_type,
-                })
+                # While a migration is running the device may still be under its legacy random ID
+                existing_device = find_device_snapshot(org_id, device_serial_number, org_data)
+            if existing_device is not None:
+                device_ref = existing_device.reference
+                merge = True
+            elif serial_keyed:
+                # The document ID is derived from the serial, so a concurrent create writes the same document
+                device_ref = devices_ref.document(device_doc_id(device_serial_number))
+                merge = True
+            else:
+                device_ref = devices_ref.document()
+                merge = False
+            device_ref.set({
+                'deviceId': device_ref.id,
+                'deviceSerialNumber': device_serial_number,
+                'createdAt': firestore.SERVER_TIMESTAMP,
+                'isDeviceCheckedOut': False,
+                'deviceCheckedOutBy': '',
+                'deviceCheckedOutAt': None,
+                'deviceDeleted': False,
+                'deviceVerkadaDeviceType': device_verkada_device_type,
+            }, merge=merge)
 
             if 'success' not in response:
                 response['success'] = {}
@@ -1,6 +1,8 @@
 from src.helper_functions.auth.auth_functions import check_user_is_org_member, check_user_is_authed, check_user_token_current, check_user_is_email_verified, check_user_is_org_deskstation_or_higher
+from src.helper_functions.devices.device_doc_ids import find_device_snapshot
 from src.shared import db, POSTcorsrules
 from src.helper_functions.verkada_integration.utils.rename_device_in_verkada_command import rename_device_in_verkada_command
+from src.helper_functions.verkada_integration.utils.device_tombstones import is_removed_from_verkada
 
 from firebase_functions import https_fn
 from typing import Any
@@ -33,14 +35,16 @@ def update_device_checkout_status_callable(req: https_fn.CallableRequest) -> Any
             )
         
         
-        device_snapshot = db.collection('organizations').document(org_id).collection('devices').where('deviceSerialNumber', '==', device_serial_number).get()
+        org_data = db.collection('organizations').document(org_id).get().to_dict() or {}
+        # Serial-keyed orgs read the device document directly instead of querying by serial number
+        device_snapshot = find_device_snapshot(org_id, device_serial_number, org_data)
 
-        if len(device_snapshot) > 0:
+        if device_snapshot is not None:
             if is_device_being_checked_out == False:
-                device_currently_checked_out_by = device_snapshot[0].to_dict().get('deviceCheckedOutBy')
+                device_currently_checked_out_by = device_snapshot.to_dict().get('deviceCheckedOutBy')
                 if device_currently_checked_out_by != device_being_checked_by:
                     check_user_is_org_deskstation_or_higher(req, org_id)
-            device_id = device_snapshot[0].id
+            device_id = device_snapshot.id
 
             if is_device_being_checked_out:
                 db.collection('organizations').document(org_id).collection('devices').document(device_id).update({
@@ -58,10 +62,11 @@ def update_device_checkout_status_callable(req: https_fn.CallableRequest) -> Any
                     'deviceCheckedOutNote': '',
                 })
 
-            org_verkada_integration_enabled = db.collection('organizations').document(org_id).get().get('orgVerkadaIntegrationEnabled')
+            org_verkada_integration_enabled = org_data.get('orgVerkadaIntegrationEnabled')
             if org_verkada_integration_enabled:
-                verkada_device_id = db.collection('organizations').document(org_id).collection('devices').document(device_id).get().get('deviceVerkadaDeviceId')
-                if verkada_device_id:
+                device_data = device_snapshot.to_dict()
+                verkada_device_id = device_data.get('deviceVerkadaDeviceId')
+                if verkada_device_id and not is_removed_from_verkada(device_data):
                     rename_device_in_verkada_command(device_id, org_id, is_device_being_checked_out)
                     
         else:
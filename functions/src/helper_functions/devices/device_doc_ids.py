@@ -0,0 +1,60 @@
+import re
+from typing import Optional
+from urllib.parse import quote
+from src.shared import db
+
+# Org field holding how device document IDs are chosen. Absent means random IDs;
+# 'migrating' while migrate_device_doc_ids is re-keying existing devices, during which
+# new devices already get serial-keyed IDs; 'serial' once every device is keyed by serial.
+DEVICE_DOC_ID_MODE_FIELD = 'orgDeviceDocIdMode'
+DEVICE_DOC_ID_MODE_MIGRATING = 'migrating'
+DEVICE_DOC_ID_MODE_SERIAL = 'serial'
+
+# Document IDs Firestore reserves.
+_RESERVED_DOC_ID = re.compile(r'^(\.|\.\.|__.*__)$')
+
+
+def normalize_serial_number(serial_number: str) -> str:
+    """Returns the org-wide form of a serial number: trimmed and upper-cased."""
+    return serial_number.strip().upper()
+
+
+def device_doc_id(serial_number: str) -> str:
+    """
+    Returns the device document ID for a serial number. Characters Firestore
+    does not allow in IDs (such as '/') are percent-encoded, so distinct
+    normalized serials always map to distinct IDs.
+    """
+    doc_id = quote(normalize_serial_number(serial_number), safe='')
+    if _RESERVED_DOC_ID.match(doc_id):
+        doc_id = f"%{ord(doc_id[0]):02X}{doc_id[1:]}"
+    return doc_id
+
+
+def creates_serial_keyed_devices(org_data: Optional[dict]) -> bool:
+    """Whether new devices in the org get serial-keyed document IDs."""
+    return (org_data or {}).get(DEVICE_DOC_ID_MODE_FIELD) in (DEVICE_DOC_ID_MODE_MIGRATING, DEVICE_DOC_ID_MODE_SERIAL)
+
+
+def find_device_snapshot(org_id: str, serial_number: str, org_data: Optional[dict]):
+    """
+    Finds the device document for a serial number. Serial-keyed orgs read the
+    document directly; while a migration is running, a device that has not
+    been re-keyed yet is still found through the serial number query.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        serial_number (str): The device's serial number.
+        org_data (dict): The organization document's data.
+
+    Returns:
+        DocumentSnapshot: The device document, or None if there is none.
+    """
+    devices_ref = db.collection('organizations').document(org_id).collection('devices')
+    mode = (org_data or {}).get(DEVICE_DOC_ID_MODE_FIELD)
+    if mode in (DEVICE_DOC_ID_MODE_MIGRATING, DEVICE_DOC_ID_MODE_SERIAL):
+        device_snapshot = devices_ref.document(device_doc_id(serial_number)).get()
+        if device_snapshot.exists or mode == DEVICE_DOC_ID_MODE_SERIAL:
+            return device_snapshot if device_snapshot.exists else None
+    device_query = devices_ref.where('deviceSerialNumber', '==', serial_number).limit(1).get()
+    return device_query[0] if device_query else None
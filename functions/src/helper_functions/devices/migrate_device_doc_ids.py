@@ -0,0 +1,167 @@
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from src.helper_functions.devices.device_doc_ids import (
+    DEVICE_DOC_ID_MODE_FIELD,
+    DEVICE_DOC_ID_MODE_MIGRATING,
+    DEVICE_DOC_ID_MODE_SERIAL,
+    device_doc_id,
+)
+from src.shared import db, logger
+
+# Org field holding the migration's progress, so an interrupted run resumes where it stopped.
+DEVICE_DOC_ID_MIGRATION_FIELD = 'orgDeviceDocIdMigration'
+# Devices read per page. Each one re-keyed is a set and a delete in the page's transaction, so this stays under 250.
+MIGRATION_PAGE_SIZE = 200
+
+
+# A device's checkout state, which is only ever taken from one document as a whole.
+DEVICE_CHECKOUT_FIELDS = ('isDeviceCheckedOut', 'deviceCheckedOutBy', 'deviceCheckedOutAt', 'deviceCheckedOutNote')
+
+
+def _checkout_source(legacy_data: dict, existing_data: dict) -> dict:
+    """The document whose checkout state is kept: the checked-out one, or the later checkout if both are."""
+    legacy_out = legacy_data.get('isDeviceCheckedOut') is True
+    existing_out = existing_data.get('isDeviceCheckedOut') is True
+    if legacy_out and existing_out:
+        legacy_at = legacy_data.get('deviceCheckedOutAt')
+        existing_at = existing_data.get('deviceCheckedOutAt')
+        if legacy_at is not None and (existing_at is None or legacy_at > existing_at):
+            return legacy_data
+        return existing_data
+    return legacy_data if legacy_out else existing_data
+
+
+def _merge_device_data(legacy_data: dict, existing_data: dict) -> dict:
+    """
+    Fields of a device's serial-keyed document merged with a legacy document
+    for the same serial. Fields the serial-keyed document has win, except the
+    checkout state, which comes from whichever document is checked out (so
+    a device checked out on its legacy document before it was re-keyed stays
+    checked out), and createdAt, which keeps the earlier of the two.
+    """
+    merged = dict(legacy_data)
+    merged.update(existing_data)
+    checkout_source = _checkout_source(legacy_data, existing_data)
+    for field in DEVICE_CHECKOUT_FIELDS:
+        if field in checkout_source:
+            merged[field] = checkout_source[field]
+        else:
+            merged.pop(field, None)
+    created_at = [data['createdAt'] for data in (legacy_data, existing_data) if data.get('createdAt') is not None]
+    if created_at:
+        merged['createdAt'] = min(created_at)
+    return merged
+
+
+@firestore.transactional
+def _move_devices(transaction, moves: list) -> int:
+    """
+    Copies each (device snapshot, serial-keyed reference) pair to its new
+    document and deletes the old one. Both are re-read in the transaction, so a
+    checkout written to the old document meanwhile is not lost.
+
+    Returns:
+        int: How many devices were merged into an existing serial-keyed document.
+    """
+    refs = [device_doc.reference for device_doc, _ in moves] + [new_ref for _, new_ref in moves]
+    current = {snapshot.reference.path: snapshot.to_dict() for snapshot in transaction.get_all(refs) if snapshot.exists}
+    merged = 0
+    for device_doc, new_ref in moves:
+        device_data = current.get(device_doc.reference.path)
+        if device_data is None:
+            # Deleted or already moved by a concurrent run
+            continue
+        if new_ref.path in current:
+            device_data = _merge_device_data(device_data, current[new_ref.path])
+            merged += 1
+        device_data['deviceId'] = new_ref.id
+        current[new_ref.path] = device_data
+        transaction.set(new_ref, device_data)
+        transaction.delete(device_doc.reference)
+    return merged
+
+
+def migrate_device_doc_ids(org_id: str, deadline=None) -> dict:
+    """
+    Re-keys an org's devices so each document ID is derived from its serial
+    number. Each device is copied to its serial-keyed document (merged into it
+    if one already exists, which also folds duplicate documents for one serial
+    together) with deviceId updated, and the old document is deleted in the
+    same transaction.
+
+    The org is put in 'migrating' mode first, so devices created meanwhile
+    already get serial-keyed IDs. Progress is saved after every page; a run
+    that stops at the deadline resumes from there when called again. The org
+    switches to 'serial' mode once every device has been visited.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        deadline (Deadline, optional): The run's deadline; no new page is started past it.
+
+    Returns:
+        dict: The migration's progress, with 'complete' set once it finished.
+    """
+    org_ref = db.collection('organizations').document(org_id)
+    devices_ref = org_ref.collection('devices')
+    org_data = org_ref.get().to_dict() or {}
+    if org_data.get(DEVICE_DOC_ID_MODE_FIELD) == DEVICE_DOC_ID_MODE_SERIAL:
+        logger.info(f"Device document IDs for organization {org_id} are already keyed by serial number.")
+        return {'complete': True}
+
+    progress = org_data.get(DEVICE_DOC_ID_MIGRATION_FIELD) or {}
+    last_doc_id = progress.get('lastDocId')
+    migrated = progress.get('migrated', 0)
+    merged = progress.get('merged', 0)
+    if org_data.get(DEVICE_DOC_ID_MODE_FIELD) != DEVICE_DOC_ID_MODE_MIGRATING:
+        org_ref.update({DEVICE_DOC_ID_MODE_FIELD: DEVICE_DOC_ID_MODE_MIGRATING})
+    logger.info(f"Migrating device document IDs for organization {org_id}" + (f", resuming after {last_doc_id}." if last_doc_id else "."))
+
+    query = devices_ref.order_by(FieldPath.document_id()).limit(MIGRATION_PAGE_SIZE)
+    while True:
+        if deadline is not None and deadline.expired:
+            deadline.skip("device document ID migration")
+            logger.warning(f"Device document ID migration for organization {org_id} stopped at the deadline after {last_doc_id}.")
+            return {'complete': False, 'lastDocId': last_doc_id, 'migrated': migrated, 'merged': merged}
+
+        # The cursor is a document ID rather than a snapshot, since that document was usually just moved
+        page_query = query.start_after({FieldPath.document_id(): devices_ref.document(last_doc_id)}) if last_doc_id else query
+        page = list(page_query.stream())
+        if not page:
+            break
+
+        moves = []
+        for device_doc in page:
+            device_data = device_doc.to_dict() or {}
+            serial_number = device_data.get('deviceSerialNumber')
+            if not serial_number:
+                logger.warning(f"Device {device_doc.id} in organization {org_id} has no serial number; leaving its ID unchanged.")
+                continue
+            new_doc_id = device_doc_id(serial_number)
+            if new_doc_id != device_doc.id:
+                moves.append((device_doc, devices_ref.document(new_doc_id)))
+
+        if moves:
+            merged += _move_devices(db.transaction(), moves)
+            migrated += len(moves)
+
+        last_doc_id = page[-1].id
+        org_ref.update({DEVICE_DOC_ID_MIGRATION_FIELD: {
+            'lastDocId': last_doc_id,
+            'migrated': migrated,
+            'merged': merged,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }})
+        if len(page) < MIGRATION_PAGE_SIZE:
+            break
+
+    org_ref.update({
+        DEVICE_DOC_ID_MODE_FIELD: DEVICE_DOC_ID_MODE_SERIAL,
+        DEVICE_DOC_ID_MIGRATION_FIELD: {
+            'lastDocId': None,
+            'migrated': migrated,
+            'merged': merged,
+            'completedAt': firestore.SERVER_TIMESTAMP,
+        },
+    })
+    logger.info(f"Migrated device document IDs for organization {org_id}: {migrated} re-keyed, {merged} merged into existing documents.")
+    return {'complete': True, 'migrated': migrated, 'merged': merged}
@@ -1,11 +1,21 @@
 from src.shared import db, logger
 from typing import Set, List, Optional
-from concurrent.futures import ThreadPoolExecutor
 
-from src.helper_functions.verkada_integration.utils.http_utils import requests_with_retry
+from src.helper_functions.verkada_integration.utils.verkada_client import get_verkada_client
+from src.helper_functions.verkada_integration.utils.async_verkada_client import VerkadaRequest, run_verkada_requests
+from src.helper_functions.verkada_integration.utils.rate_limiter import log_limiter_stats
+from src.helper_functions.verkada_integration.utils.app_init_cache import invalidate_verkada_app_init
+from src.helper_functions.verkada_integration.utils.retry_policy import NON_IDEMPOTENT_POLICY
+from src.helper_functions.verkada_integration.utils.inventory_snapshot import (
+    SECTION_SITE_LIST,
+    SECTION_SITES,
+    SECTION_ZONES,
+    get_inventory_snapshot,
+    invalidate_inventory_snapshot,
+)
 
 
-def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict) -> None:
+def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict, deadline=None) -> None:
     """
     Identifies and cleans up orphaned Verkada sites that are no longer associated with any devices.
     Also cleans up orphaned classic alarm zones if a configured zone is specified.
@@ -14,6 +24,7 @@ def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict) -> None:
     Args:
         org_id (str): The organization ID
         verkada_bot_user_info (dict): Verkada bot user info for API calls
+        deadline (Deadline, optional): The run's deadline; the site phase is skipped if it is reached first
     """
     logger.info(f"Starting orphaned site cleanup for organization {org_id}")
     
@@ -21,8 +32,13 @@ def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict) -> None:
         # Clean up orphaned classic alarm zones FIRST (before site deletions)
         # This is critical because site deletions are dependent on zone deletions
         logger.info("Starting classic alarm zone cleanup phase...")
-        clean_orphaned_classic_alarm_zones(org_id, verkada_bot_user_info)
+        clean_orphaned_classic_alarm_zones(org_id, verkada_bot_user_info, deadline=deadline)
         logger.info("Completed classic alarm zone cleanup phase")
+
+        if deadline is not None and deadline.expired:
+            # Site deletions must not run ahead of zone deletions, so leave them for the next run
+            deadline.skip("orphaned site cleanup")
+            return
         
         # Get all unique site IDs currently in use by devices
         logger.info("Starting site cleanup phase...")
@@ -30,7 +46,7 @@ def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict) -> None:
         logger.info(f"Found {len(active_site_ids)} active site IDs in use by devices")
         
         # Get all site IDs from Verkada API
-        verkada_site_ids = get_verkada_site_ids(verkada_bot_user_info)
+        verkada_site_ids = get_verkada_site_ids(verkada_bot_user_info, deadline=deadline, org_id=org_id)
         logger.info(f"Found {len(verkada_site_ids)} total site IDs from Verkada")
         
         # Find orphaned sites (in Verkada but not used by any devices)
@@ -40,9 +56,13 @@ def clean_orphaned_sites(org_id: str, verkada_bot_user_info: dict) -> None:
         if orphaned_site_ids:
             logger.info(f"Cleaning up orphaned sites: {list(orphaned_site_ids)}")
             # Clean up orphaned sites AFTER zone cleanup is complete
-            cleanup_orphaned_sites(orphaned_site_ids, verkada_bot_user_info)
+            cleanup_orphaned_sites(orphaned_site_ids, verkada_bot_user_info, deadline=deadline)
+            # The sites section is rebuilt from the init payload, so its cached copy goes too
+            invalidate_verkada_app_init(verkada_bot_user_info.get('org_id'))
+            invalidate_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_SITE_LIST, SECTION_SITES))
         else:
             logger.info("No orphaned sites found")
+        log_limiter_stats(verkada_bot_user_info.get('org_id'))
             
     except Exception as e:
         logger.error(f"Error during orphaned site cleanup for org {org_id}: {e}")
@@ -80,37 +100,25 @@ def get_active_site_ids(org_id: str) -> Set[str]:
         raise
 
 
-def get_verkada_site_ids(verkada_bot_user_info: dict) -> Set[str]:
+def get_verkada_site_ids(verkada_bot_user_info: dict, deadline=None, org_id: str = None) -> Set[str]:
     """
-    Get all site IDs from Verkada API.
+    Get all site IDs from the org's Verkada inventory snapshot.
     
     Args:
         verkada_bot_user_info (dict): Verkada bot user info
+        deadline (Deadline, optional): The run's deadline
+        org_id (str, optional): The organization ID, to share the org's stored snapshot
         
     Returns:
         Set[str]: Set of all site IDs from Verkada
     """
     
-    
-    verkada_site_ids = set()
-    
     try:
-        verkada_org_shortname = verkada_bot_user_info['org_name']
-        verkada_site_list_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_shortname}/org/site/list"
-        verkada_app_init_payload = {
-            "orgId": verkada_bot_user_info['org_id']
-        }
-        
-        response = requests_with_retry('post', verkada_site_list_url, 
-                                     json=verkada_app_init_payload, 
-                                     headers=verkada_bot_user_info['auth_headers'])
-        site_data = response.json()
-        sites = site_data.get('sites', [])
-        
-        for site in sites:
-            site_id = site.get('siteId')
-            if site_id:
-                verkada_site_ids.add(site_id)
+        snapshot = get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_SITE_LIST,), deadline=deadline)
+        site_list = snapshot.get(SECTION_SITE_LIST)
+        if site_list is None:
+            raise RuntimeError("The site list could not be fetched from Verkada.")
+        verkada_site_ids = set(site_list)
                 
         logger.info(f"Retrieved {len(verkada_site_ids)} site IDs from Verkada API")
         return verkada_site_ids
@@ -144,46 +152,25 @@ def get_configured_classic_alarm_zone(org_id: str) -> Optional[str]:
         logger.error(f"Error getting configured classic alarm zone for org {org_id}: {e}")
         raise
 
-def get_classic_alarm_zones(verkada_bot_user_info: dict) -> Set[str]:
+def get_classic_alarm_zones(verkada_bot_user_info: dict, deadline=None, org_id: str = None) -> Set[str]:
     """
-    Get all classic alarm zones from Verkada.
+    Get all classic alarm zones from the org's Verkada inventory snapshot.
     
     Args:
         verkada_bot_user_info (dict): Verkada bot user info
+        deadline (Deadline, optional): The run's deadline
+        org_id (str, optional): The organization ID, to share the org's stored snapshot
         
     Returns:
         Set[str]: Set of all classic alarm zone IDs from Verkada
     """
     
-    verkada_zone_ids = set()
-    
     try:
-        verkada_org_shortname = verkada_bot_user_info['org_name']
-        verkada_zone_list_url = f"https://alarms.command.verkada.com/__v/{verkada_org_shortname}/zone/list"
-        verkada_zone_list_payload = {
-            "organizationId": verkada_bot_user_info['org_id'],
-            "includeLastEvent": False
-        }
-        
-        
-        
-        response = requests_with_retry('post', verkada_zone_list_url, 
-                                     json=verkada_zone_list_payload, 
-                                     headers=verkada_bot_user_info['auth_headers'])
-        
-        zone_data = response.json()
-        
-        
-        zones = zone_data.get('zone', [])
-        logger.info(f"Found {len(zones)} zones in response")
-        
-        for i, zone in enumerate(zones):
-            zone_id = zone.get('zoneId')
-            if zone_id:
-                verkada_zone_ids.add(zone_id)
-                
-            else:
-                logger.warning(f"Zone {i} has no zoneId: {zone}")
+        snapshot = get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_ZONES,), deadline=deadline)
+        zones = snapshot.get(SECTION_ZONES)
+        if zones is None:
+            raise RuntimeError("The zone list could not be fetched from Verkada.")
+        verkada_zone_ids = set(zones)
                 
         logger.info(f"Retrieved {len(verkada_zone_ids)} classic alarm zone IDs from Verkada API")
         logger.info(f"Zone IDs: {list(verkada_zone_ids)}")
@@ -191,18 +178,16 @@ def get_classic_alarm_zones(verkada_bot_user_info: dict) -> Set[str]:
         
     except Exception as e:
         logger.error(f"Error retrieving Verkada classic alarm zone IDs: {e}")
-        logger.error(f"Exception type: {type(e)}")
-        import traceback
-        logger.error(f"Full traceback: {traceback.format_exc()}")
         raise
 
-def delete_classic_alarm_zone(zone_id: str, verkada_bot_user_info: dict) -> bool:
+def delete_classic_alarm_zone(zone_id: str, verkada_bot_user_info: dict, deadline=None) -> bool:
     """
     Delete a classic alarm zone from Verkada.
     
     Args:
         zone_id (str): The zone ID of the classic alarm zone to delete
         verkada_bot_user_info (dict): Verkada bot user info
+        deadline (Deadline, optional): The run's deadline
         
     Returns:
         bool: True if deletion was successful, False otherwise
@@ -215,9 +200,7 @@ def delete_classic_alarm_zone(zone_id: str, verkada_bot_user_info: dict) -> bool
             "zoneId": zone_id
         }
         
-        response = requests_with_retry('post', delete_url, 
-                                     json=payload, 
-                                     headers=verkada_bot_user_info['auth_headers'])
+        response = get_verkada_client(verkada_bot_user_info, deadline=deadline).post(delete_url, json=payload, policy=NON_IDEMPOTENT_POLICY)
         response.raise_for_status()
         
         logger.info(f"Successfully deleted classic alarm zone: {zone_id}")
@@ -227,13 +210,14 @@ def delete_classic_alarm_zone(zone_id: str, verkada_bot_user_info: dict) -> bool
         logger.error(f"Failed to delete classic alarm zone {zone_id}: {e}")
         return False
 
-def clean_orphaned_classic_alarm_zones(org_id: str, verkada_bot_user_info: dict) -> None:
+def clean_orphaned_classic_alarm_zones(org_id: str, verkada_bot_user_info: dict, deadline=None) -> None:
     """
     Identifies and cleans up orphaned classic alarm zones that are not the configured zone.
     
     Args:
         org_id (str): The organization ID
         verkada_bot_user_info (dict): Verkada bot user info for API calls
+        deadline (Deadline, optional): The run's deadline
     """
     logger.info(f"Starting orphaned classic alarm zone cleanup for organization {org_id}")
     
@@ -252,7 +236,7 @@ def clean_orphaned_classic_alarm_zones(org_id: str, verkada_bot_user_info: dict)
         
         # Get all classic alarm zones from Verkada
         logger.info("Retrieving all classic alarm zones from Verkada...")
-        verkada_zone_ids = get_classic_alarm_zones(verkada_bot_user_info)
+        verkada_zone_ids = get_classic_alarm_zones(verkada_bot_user_info, deadline=deadline, org_id=org_id)
         logger.info(f"Found {len(verkada_zone_ids)} total classic alarm zones from Verkada")
         logger.info(f"All zone IDs: {list(verkada_zone_ids)}")
         
@@ -263,7 +247,8 @@ def clean_orphaned_classic_alarm_zones(org_id: str, verkada_bot_user_info: dict)
         
         if orphaned_zone_ids:
             # Clean up orphaned zones
-            cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids, verkada_bot_user_info)
+            cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids, verkada_bot_user_info, deadline=deadline)
+            invalidate_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_ZONES,))
         else:
             logger.info("No orphaned classic alarm zones found")
             
@@ -271,7 +256,7 @@ def clean_orphaned_classic_alarm_zones(org_id: str, verkada_bot_user_info: dict)
         logger.error(f"Error during orphaned classic alarm zone cleanup for org {org_id}: {e}")
         raise
 
-def cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids: Set[str], verkada_bot_user_info: dict) -> None:
+def cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids: Set[str], verkada_bot_user_info: dict, deadline=None) -> None:
     """
     Clean up orphaned classic alarm zones by removing them from Verkada.
     If a zone deletion fails, the process continues with the next zone.
@@ -279,24 +264,26 @@ def cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids: Set[str], verkada_bo
     Args:
         orphaned_zone_ids (Set[str]): Set of orphaned zone IDs to clean up
         verkada_bot_user_info (dict): Verkada bot user info
+        deadline (Deadline, optional): The run's deadline
     """
-    def delete_zone(zone_id: str) -> tuple[str, bool]:
-        """Delete a single classic alarm zone from Verkada. Returns (zone_id, success)."""
-        success = delete_classic_alarm_zone(zone_id, verkada_bot_user_info)
-        return (zone_id, success)
-    
-    # Process deletions in parallel for better performance
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = list(executor.map(delete_zone, orphaned_zone_ids))
-    
-    # Track successful and failed deletions
+    verkada_org_shortname = verkada_bot_user_info['org_name']
+    delete_url = f"https://alarms.command.verkada.com/__v/{verkada_org_shortname}/zone/delete"
+    delete_requests = [
+        VerkadaRequest('post', delete_url, {"zoneId": zone_id}, NON_IDEMPOTENT_POLICY, zone_id)
+        for zone_id in orphaned_zone_ids
+    ]
+
+    # Deletions are fanned out concurrently; the per-host adaptive limit decides how many run at once
     successful_zones = []
     failed_zones = []
-    
-    for zone_id, success in results:
-        if success:
+
+    for result in run_verkada_requests(verkada_bot_user_info, delete_requests, deadline=deadline):
+        zone_id = result.request.context
+        if result.ok:
+            logger.info(f"Successfully deleted classic alarm zone: {zone_id}")
             successful_zones.append(zone_id)
         else:
+            logger.error(f"Failed to delete classic alarm zone {zone_id}: {result.error}")
             failed_zones.append(zone_id)
     
     successful_deletions = len(successful_zones)
@@ -311,42 +298,35 @@ def cleanup_orphaned_classic_alarm_zones(orphaned_zone_ids: Set[str], verkada_bo
         logger.warning(f"Failed to delete zones (process continued): {', '.join(failed_zones)}")
 
 
-def cleanup_orphaned_sites(orphaned_site_ids: Set[str], verkada_bot_user_info: dict) -> None:
+def cleanup_orphaned_sites(orphaned_site_ids: Set[str], verkada_bot_user_info: dict, deadline=None) -> None:
     """
     Clean up orphaned sites by removing them from Verkada.
     
     Args:
         orphaned_site_ids (Set[str]): Set of orphaned site IDs to clean up
         verkada_bot_user_info (dict): Verkada bot user info
+        deadline (Deadline, optional): The run's deadline
     """
     
     verkada_org_shortname = verkada_bot_user_info['org_name']
-    auth_headers = verkada_bot_user_info['auth_headers']
-    
-    def delete_site(site_id: str) -> bool:
-        """Delete a single site from Verkada."""
-        try:
-            # Use the correct API endpoint for site deletion
-            # Based on the pattern used in other Verkada API calls in the codebase
-            delete_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_shortname}/org/camera_group/delete"
-            payload = {
-                "cameraGroupId": site_id
-            }
-            response = requests_with_retry('post', delete_url, headers=auth_headers, json=payload)
-            response.raise_for_status()
-            
+    # Use the correct API endpoint for site deletion
+    # Based on the pattern used in other Verkada API calls in the codebase
+    delete_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_shortname}/org/camera_group/delete"
+    delete_requests = [
+        VerkadaRequest('post', delete_url, {"cameraGroupId": site_id}, NON_IDEMPOTENT_POLICY, site_id)
+        for site_id in orphaned_site_ids
+    ]
+
+    # Deletions are fanned out concurrently; the per-host adaptive limit decides how many run at once
+    successful_deletions = 0
+    for result in run_verkada_requests(verkada_bot_user_info, delete_requests, deadline=deadline):
+        site_id = result.request.context
+        if result.ok:
             logger.info(f"Successfully deleted orphaned site: {site_id}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to delete orphaned site {site_id}: {e}")
-            return False
-    
-    # Process deletions in parallel for better performance
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = list(executor.map(delete_site, orphaned_site_ids))
-    
-    successful_deletions = sum(results)
+            successful_deletions += 1
+        else:
+            logger.error(f"Failed to delete orphaned site {site_id}: {result.error}")
+
     logger.info(f"Successfully deleted {successful_deletions}/{len(orphaned_site_ids)} orphaned sites")
 
 
@@ -1,42 +1,65 @@
-import concurrent.futures
 from src.shared import db, logger
-from ..utils.http_utils import requests_with_retry
-from requests.exceptions import RequestException
-from src.helper_functions.verkada_integration.utils.rename_device_in_verkada_command import rename_device_in_verkada_command
+from ..utils.async_verkada_client import run_verkada_requests
+from ..utils.retry_policy import RetryBudget
+from ..utils.rate_limiter import log_limiter_stats
+from ..utils.verkada_client import get_verkada_client
+from ..utils.device_tombstones import is_removed_from_verkada
+from src.helper_functions.verkada_integration.utils.rename_device_in_verkada_command import build_rename_request, fetch_viewing_station_grids, get_verkada_device_name
 
-def _process_device_doc(device_doc, org_id, verkada_bot_user_info):
-    """Helper function to process a single device document."""
+
+def _build_device_rename_request(device_doc, verkada_org_short_name, verkada_org_id, viewing_station_grids):
+    """Helper function to build the rename call for a single device document."""
     try:
         device_data = device_doc.to_dict()
-        device_id = device_doc.id
-        is_device_checked_out = device_data.get('isDeviceCheckedOut')
-        rename_device_in_verkada_command(device_id, org_id, is_device_checked_out, verkada_bot_user_info)
+        device_name = get_verkada_device_name(device_data.get('deviceSerialNumber'), device_data.get('isDeviceCheckedOut'))
+        return build_rename_request(device_data, device_name, verkada_org_short_name, verkada_org_id, viewing_station_grids)
     except Exception as e:
-        logger.error(f"Error processing device {device_doc.id} for org {org_id}: {e}", exc_info=True)
+        logger.error(f"Error processing device {device_doc.id}: {e}", exc_info=True)
+        return None
+
 
-def clean_verkada_device_names(org_id, verkada_bot_user_info, max_workers=10):
+def clean_verkada_device_names(org_id, verkada_bot_user_info, deadline=None):
     """
-    Cleans device names in Verkada with the corresponding checkout status in Firestore using multiple threads.
-    
+    Cleans device names in Verkada with the corresponding checkout status in Firestore,
+    sending the renames concurrently on an event loop.
+
     Args:
         verkada_bot_user_info (dict): The Verkada bot user information.
         org_id (str): The organization ID in firestore.
-        max_workers (int): The maximum number of threads to use.
+        deadline (Deadline, optional): The run's deadline; renames not started before it are skipped.
     """
-    
+
     logger.info(f"Fetching verkada devices from firestore for organization {org_id}.")
-    verkada_devices_ref = db.collection('organizations').document(org_id).collection('devices').where('deviceVerkadaDeviceId', '!=', None).stream()
-    
-    # Use ThreadPoolExecutor to process documents concurrently
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Create a list of future tasks
-        futures = [executor.submit(_process_device_doc, device_doc, org_id, verkada_bot_user_info) for device_doc in verkada_devices_ref]
-        
-        # Wait for all futures to complete and log any exceptions
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                future.result()  # Raises exceptions from the worker thread if any occurred
-            except Exception as e:
-                logger.error(f"A thread encountered an error during device sync for org {org_id}: {e}")
-
-    logger.info(f"Finished syncing Verkada device names for organization {org_id}.")
\ No newline at end of file
+    verkada_devices = list(db.collection('organizations').document(org_id).collection('devices').where('deviceVerkadaDeviceId', '!=', None).stream())
+    # Devices Verkada no longer lists would only fail their renames through every retry
+    verkada_devices = [device_doc for device_doc in verkada_devices if not is_removed_from_verkada(device_doc.to_dict())]
+
+    verkada_org_short_name = verkada_bot_user_info.get('orgVerkadaOrgShortName')
+    verkada_org_id = verkada_bot_user_info.get('org_id')
+    retry_budget = RetryBudget()
+
+    # Viewing stations are renamed by resending their grid, so read all grids once up front
+    viewing_station_grids = {}
+    if any((device_doc.to_dict() or {}).get('deviceVerkadaDeviceType') == 'Viewing Station' for device_doc in verkada_devices):
+        try:
+            verkada_client = get_verkada_client(verkada_bot_user_info, retry_budget=retry_budget, deadline=deadline)
+            viewing_station_grids = fetch_viewing_station_grids(verkada_client, verkada_org_short_name, verkada_org_id)
+        except Exception as e:
+            logger.error(f"Error fetching Viewing Station info for org {org_id}: {e}")
+
+    rename_requests = []
+    for device_doc in verkada_devices:
+        rename_request = _build_device_rename_request(device_doc, verkada_org_short_name, verkada_org_id, viewing_station_grids)
+        if rename_request is not None:
+            rename_requests.append(rename_request)
+
+    logger.info(f"Sending {len(rename_requests)} device renames for organization {org_id}.")
+    for result in run_verkada_requests(verkada_bot_user_info, rename_requests, retry_budget=retry_budget, deadline=deadline):
+        device_type, device_serial_number, device_name = result.request.context
+        if result.ok:
+            logger.info(f"{device_type} {device_serial_number} renamed successfully to {device_name}.")
+        else:
+            logger.error(f"Error renaming {device_type} {device_serial_number}: {result.error}")
+
+    log_limiter_stats(verkada_org_id)
+    logger.info(f"Finished syncing Verkada device names for organization {org_id}.")
@@ -1,10 +1,70 @@
-from src.helper_functions.verkada_integration.utils.http_utils import requests_with_retry
-from requests.exceptions import RequestException
+from src.helper_functions.verkada_integration.utils.async_verkada_client import VerkadaRequest, run_verkada_requests
+from src.helper_functions.verkada_integration.utils.retry_policy import IDEMPOTENT_WRITE_POLICY, RetryBudget
+from src.helper_functions.verkada_integration.utils.rate_limiter import log_limiter_stats
+from src.helper_functions.verkada_integration.utils.circuit_breaker import log_breaker_stats, save_skipped_operations
+from src.helper_functions.verkada_integration.utils.app_init_cache import invalidate_verkada_app_init
+from src.helper_functions.verkada_integration.utils.inventory_snapshot import SECTION_DEVICES, SECTION_SITES, invalidate_inventory_snapshot
+from src.helper_functions.verkada_integration.utils.device_tombstones import is_removed_from_verkada
 from src.shared import db, logger
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
+from typing import NamedTuple
+import httpx
 
-def clean_verkada_device_sites(org_id, verkada_bot_user_info):
+# Cameras moved per camera/site/batch/set request.
+CAMERA_MOVE_BATCH_SIZE = 100
+
+
+class _BatchedMove(NamedTuple):
+    """A device move sent together with others to the same destination through a batch endpoint."""
+    endpoint: str
+    device_id: str
+    destination_id: str
+
+
+class _MoveBatch(NamedTuple):
+    """The devices of one batch move request, handed back with its result."""
+    endpoint: str
+    device_ids: tuple
+    destination_id: str
+
+
+def _is_rejected_batch(result) -> bool:
+    """
+    Whether a batch move of several devices was refused outright with a
+    non-retryable 4xx, as one stale or invalid device ID in it can cause.
+    """
+    context = result.request.context
+    if result.ok or not isinstance(context, _MoveBatch) or len(context.device_ids) < 2:
+        return False
+    if not isinstance(result.error, httpx.HTTPStatusError):
+        return False
+    status = result.error.response.status_code
+    return 400 <= status < 500 and status not in result.request.policy.retry_statuses
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def clean_verkada_device_sites(org_id, verkada_bot_user_info, deadline=None, camera_batch_size: int = CAMERA_MOVE_BATCH_SIZE) -> dict:
+    """
+    Moves the org's Verkada devices to the sites and zones designated for
+    their type. Moves of endpoints that take a list of devices (cameras) are
+    grouped by destination and sent in chunks; the rest are sent one per device.
+    A chunk rejected with a non-retryable 4xx is split in half and re-sent
+    until the devices it was rejected for are on their own, so one bad
+    device ID does not fail the moves of the others.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        verkada_bot_user_info (dict): The Verkada bot user's info.
+        deadline (Deadline, optional): The run's deadline; moves not started before it are skipped.
+        camera_batch_size (int, optional): Cameras moved per batch request.
+
+    Returns:
+        dict: Verkada device ID -> {'destinationId', 'ok', 'error'} for every move sent, from
+            the last request the device was in.
+    """
     logger.info("Moving Verkada devices...")
     
     # Check if verkada_bot_user_info is None
@@ -19,6 +79,7 @@ def clean_verkada_device_sites(org_id, verkada_bot_user_info):
         raise ValueError("verkada_bot_user_info must contain 'org_id'")
     if not verkada_auth_headers:
         raise ValueError("verkada_bot_user_info must contain 'auth_headers'")
+    retry_budget = RetryBudget()
     
     org_verkada_product_site_designations = {}
     try:
@@ -72,7 +133,8 @@ def clean_verkada_device_sites(org_id, verkada_bot_user_info):
     devices = []
     try:
         devices_ref = db.collection('organizations').document(org_id).collection('devices').where('deviceVerkadaDeviceId', '!=', None)
-        devices = devices_ref.get()
+        # Devices Verkada no longer lists would only fail their moves through every retry
+        devices = [device for device in devices_ref.get() if not is_removed_from_verkada(device.to_dict())]
         logger.info(f"Devices to move: {len(devices)}")
     except Exception as e:
         logger.error(f"Error retrieving devices: {e}")
@@ -81,236 +143,163 @@ def clean_verkada_device_sites(org_id, verkada_bot_user_info):
     def move_camera(device, verkada_camera_site_id):
         if not verkada_camera_site_id:
             logger.error("No site ID provided for camera.")
-            return
+            return None
         
-        try:
-            camera_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/camera/site/batch/set"
-            payload = {"cameraIds":[camera_id],
-                    "destinationSiteId": verkada_camera_site_id}
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{camera_id} moved successfully to {verkada_camera_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {camera_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {camera_id}: {e}")
+        camera_id = device.get('deviceVerkadaDeviceId')
+        # Sent with the other cameras going to the same site, see move_cameras
+        return _BatchedMove('camera', camera_id, verkada_camera_site_id)
+
+    def move_cameras(camera_ids, verkada_camera_site_id):
+        move_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/camera/site/batch/set"
+        payload = {"cameraIds": camera_ids,
+                "destinationSiteId": verkada_camera_site_id}
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, _MoveBatch('camera', tuple(camera_ids), verkada_camera_site_id))
+
+    # Batch endpoint -> (builder of one request for a list of device IDs and their destination, chunk size)
+    batch_move_builders = {
+        'camera': (move_cameras, max(1, camera_batch_size)),
+    }
     
     def move_controller(device, verkada_access_control_site_id):
         if not verkada_access_control_site_id:
             logger.error("No site ID provided for access controller.")
-            return
+            return None
         
-        try:
-            controller_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vcerberus.command.verkada.com/__v/{verkada_org_short_name}/access_controller/move_to_site"
-            payload = {"accessControllerId":controller_id,"siteId":verkada_access_control_site_id}
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{controller_id} moved successfully to {verkada_access_control_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {controller_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {controller_id}: {e}")
+        controller_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://vcerberus.command.verkada.com/__v/{verkada_org_short_name}/access_controller/move_to_site"
+        payload = {"accessControllerId":controller_id,"siteId":verkada_access_control_site_id}
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (controller_id, verkada_access_control_site_id))
     
 
     def move_env_sensor(device, verkada_env_sensor_site_id):
         if not verkada_env_sensor_site_id:
             logger.error("No site ID provided for environmental sensor.")
-            return
+            return None
         
-        try:
-            env_sensor_id = device.get('deviceVerkadaDeviceId')
-            env_sensor_prev_site = device.get('deviceVerkadaSiteId')
-            move_url = f"https://vsensor.command.verkada.com/__v/{verkada_org_short_name}/devices/{env_sensor_id}"
-            payload = {'currentSiteId': env_sensor_prev_site, 'siteId': verkada_env_sensor_site_id}
-            response = requests_with_retry('patch', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{env_sensor_id} moved successfully to {verkada_env_sensor_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {env_sensor_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {env_sensor_id}: {e}")
+        env_sensor_id = device.get('deviceVerkadaDeviceId')
+        env_sensor_prev_site = device.get('deviceVerkadaSiteId')
+        move_url = f"https://vsensor.command.verkada.com/__v/{verkada_org_short_name}/devices/{env_sensor_id}"
+        payload = {'currentSiteId': env_sensor_prev_site, 'siteId': verkada_env_sensor_site_id}
+        return VerkadaRequest('patch', move_url, payload, IDEMPOTENT_WRITE_POLICY, (env_sensor_id, verkada_env_sensor_site_id))
 
     def move_intercom(device, verkada_intercom_site_id):
         if not verkada_intercom_site_id:
             logger.error("No site ID provided for intercom.")
-            return
+            return None
         
-        try:
-            intercom_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/intercom/{intercom_id}"
-            payload = {"siteId":verkada_intercom_site_id}
-            response = requests_with_retry('patch', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{intercom_id} moved successfully to {verkada_intercom_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {intercom_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {intercom_id}: {e}")
+        intercom_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/intercom/{intercom_id}"
+        payload = {"siteId":verkada_intercom_site_id}
+        return VerkadaRequest('patch', move_url, payload, IDEMPOTENT_WRITE_POLICY, (intercom_id, verkada_intercom_site_id))
 
     def move_gateway(device, verkada_gateway_site_id):
         if not verkada_gateway_site_id:
             logger.error("No site ID provided for gateway.")
-            return
+            return None
         
-        try:
-            gateway_prev_site = device.get('deviceVerkadaSiteId')
-            gateway_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vnet.command.verkada.com/__v/{verkada_org_short_name}/devices/{gateway_id}"
-            payload = {'currentSiteId': gateway_prev_site, 'siteId': verkada_gateway_site_id}
-            response = requests_with_retry('patch', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{gateway_id} moved successfully to {verkada_gateway_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {gateway_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {gateway_id}: {e}")
+        gateway_prev_site = device.get('deviceVerkadaSiteId')
+        gateway_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://vnet.command.verkada.com/__v/{verkada_org_short_name}/devices/{gateway_id}"
+        payload = {'currentSiteId': gateway_prev_site, 'siteId': verkada_gateway_site_id}
+        return VerkadaRequest('patch', move_url, payload, IDEMPOTENT_WRITE_POLICY, (gateway_id, verkada_gateway_site_id))
 
 
     def move_command_connector(device, verkada_command_connector_site_id):
         if not verkada_command_connector_site_id:
             logger.error("No site ID provided for Command Connector.")
-            return
+            return None
         
-        try:
-            cc_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/vfortress/update_box"
-            payload = {
-                'deviceId': cc_id,
-                'siteId': verkada_command_connector_site_id
-            }
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{cc_id} moved successfully to {verkada_command_connector_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {cc_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {cc_id}: {e}")
+        cc_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/vfortress/update_box"
+        payload = {
+            'deviceId': cc_id,
+            'siteId': verkada_command_connector_site_id
+        }
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (cc_id, verkada_command_connector_site_id))
 
     
     def move_viewing_station(device, verkada_viewing_station_site_id):
         if not verkada_viewing_station_site_id:
             logger.error("No site ID provided for Viewing Station.")
-            return
+            return None
         
-        try:
-            vx_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vvx.command.verkada.com/__v/{verkada_org_short_name}/viewing_station/update"
-            payload = {
-                'viewingStationId': vx_id,
-                'siteId': verkada_viewing_station_site_id
-            }
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{vx_id} moved successfully to {verkada_viewing_station_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {vx_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {vx_id}: {e}")
+        vx_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://vvx.command.verkada.com/__v/{verkada_org_short_name}/viewing_station/update"
+        payload = {
+            'viewingStationId': vx_id,
+            'siteId': verkada_viewing_station_site_id
+        }
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (vx_id, verkada_viewing_station_site_id))
     
     def move_desk_station(device, verkada_desk_station_site_id):
         if not verkada_desk_station_site_id:
             logger.error("No site ID provided for Desk Station.")
-            return
+            return None
         
-        try:
-            desk_station_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/desk/{desk_station_id}"
-            payload = {"siteId": verkada_desk_station_site_id}
-            response = requests_with_retry('patch', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{desk_station_id} moved successfully to {verkada_desk_station_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {desk_station_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {desk_station_id}: {e}")
+        desk_station_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/desk/{desk_station_id}"
+        payload = {"siteId": verkada_desk_station_site_id}
+        return VerkadaRequest('patch', move_url, payload, IDEMPOTENT_WRITE_POLICY, (desk_station_id, verkada_desk_station_site_id))
 
 
     def move_speaker(device, verkada_speaker_site_id):
         if not verkada_speaker_site_id:
             logger.error("No site ID provided for Speaker.")
-            return
+            return None
         
-        try:
-            speaker_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://vbroadcast.command.verkada.com/__v/{verkada_org_short_name}/management/speaker/update"
-            payload = {
-                "deviceId": speaker_id,
-                "siteId": verkada_speaker_site_id
-            }
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{speaker_id} moved successfully to {verkada_speaker_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {speaker_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {speaker_id}: {e}")
+        speaker_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://vbroadcast.command.verkada.com/__v/{verkada_org_short_name}/management/speaker/update"
+        payload = {
+            "deviceId": speaker_id,
+            "siteId": verkada_speaker_site_id
+        }
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (speaker_id, verkada_speaker_site_id))
 
     def move_classic_alarm_hub_device(device, verkada_classic_alarm_site_id):
         if not verkada_classic_alarm_site_id:
             logger.error("No site ID provided for Classic Alarm Hub.")
-            return
+            return None
         
-        try:
-            hub_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/hub/{hub_id}"
-            payload = {
-                "siteId": verkada_classic_alarm_site_id
-            }
-            response = requests_with_retry('patch', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{hub_id} moved successfully to {verkada_classic_alarm_site_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {hub_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {hub_id}: {e}")
+        hub_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/hub/{hub_id}"
+        payload = {
+            "siteId": verkada_classic_alarm_site_id
+        }
+        return VerkadaRequest('patch', move_url, payload, IDEMPOTENT_WRITE_POLICY, (hub_id, verkada_classic_alarm_site_id))
 
     def move_classic_alarm_keypad(device, verkada_classic_alarm_zone_id):
         if not verkada_classic_alarm_zone_id:
             logger.error("No zone ID provided for Classic Alarm Keypad.")
-            return
+            return None
         
-        try:
-            keypad_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/keypad/zone/set_associations"
-            payload = {
-                "keypadId":keypad_id,"zoneIds":[verkada_classic_alarm_zone_id] #target zone
-                }
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{keypad_id} moved successfully to {verkada_classic_alarm_zone_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {keypad_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {keypad_id}: {e}")
+        keypad_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/keypad/zone/set_associations"
+        payload = {
+            "keypadId":keypad_id,"zoneIds":[verkada_classic_alarm_zone_id] #target zone
+            }
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (keypad_id, verkada_classic_alarm_zone_id))
 
     def move_siren_strobe(device, verkada_new_alarm_site_id):
         logger.warning(f"Cannot move new alarm device 'Siren Strobe' to {verkada_new_alarm_site_id}")
+        return None
         
     def move_alarm_expander(device, verkada_new_alarm_site_id):
         logger.warning(f"Cannot move new alarm device 'Alarm Expander' to {verkada_new_alarm_site_id}")
+        return None
 
     def move_classic_alarm_sensor(device, verkada_classic_alarm_zone_id, device_type):
         if not verkada_classic_alarm_zone_id:
             logger.error("No zone ID provided for classic alarm sensor.")
-            return
+            return None
         
-        try:
-            sensor_id = device.get('deviceVerkadaDeviceId')
-            move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/sensor/add_to_zone"
-            payload = {
-                "deviceId": sensor_id,
-                "deviceType": device_type,
-                "zoneId": verkada_classic_alarm_zone_id
-            }
-            response = requests_with_retry('post', move_url, headers=verkada_auth_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{sensor_id} moved successfully to {verkada_classic_alarm_zone_id}.")
-        except RequestException as e:
-            logger.error(f"Error moving {sensor_id} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error moving {sensor_id}: {e}")
+        sensor_id = device.get('deviceVerkadaDeviceId')
+        move_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/sensor/add_to_zone"
+        payload = {
+            "deviceId": sensor_id,
+            "deviceType": device_type,
+            "zoneId": verkada_classic_alarm_zone_id
+        }
+        return VerkadaRequest('post', move_url, payload, IDEMPOTENT_WRITE_POLICY, (sensor_id, verkada_classic_alarm_zone_id))
     
     
     def move_device(device):
@@ -319,61 +308,106 @@ def clean_verkada_device_sites(org_id, verkada_bot_user_info):
         # Check if device.to_dict() returned None
         if device_dict is None:
             logger.error("Device document is empty or corrupted, skipping device")
-            return
+            return None
             
         device_type = device_dict.get('deviceVerkadaDeviceType')
 
         if device_type == "Camera":
-            move_camera(device_dict, verkada_camera_site_id)
+            return move_camera(device_dict, verkada_camera_site_id)
         elif device_type == 'Access Controller' or device_type == 'Input Output Board':
-            move_controller(device_dict, verkada_access_control_site_id)
+            return move_controller(device_dict, verkada_access_control_site_id)
         elif device_type == 'Environmental Sensor':
-            move_env_sensor(device_dict, verkada_env_sensor_site_id)
+            return move_env_sensor(device_dict, verkada_env_sensor_site_id)
         elif device_type == 'Intercom':
-            move_intercom(device_dict, verkada_intercom_site_id)
+            return move_intercom(device_dict, verkada_intercom_site_id)
         elif device_type == 'Gateway':
-            move_gateway(device_dict, verkada_gateway_site_id)
+            return move_gateway(device_dict, verkada_gateway_site_id)
         elif device_type == 'Command Connector':
-            move_command_connector(device_dict, verkada_command_connector_site_id)
+            return move_command_connector(device_dict, verkada_command_connector_site_id)
         elif device_type == 'Viewing Station':
-            move_viewing_station(device_dict, verkada_viewing_station_site_id)
+            return move_viewing_station(device_dict, verkada_viewing_station_site_id)
         elif device_type == 'Desk Station':
-            move_desk_station(device_dict, verkada_desk_station_site_id)
+            return move_desk_station(device_dict, verkada_desk_station_site_id)
         elif device_type == 'Speaker':
-            move_speaker(device_dict, verkada_classic_alarm_site_id)
+            return move_speaker(device_dict, verkada_classic_alarm_site_id)
         elif device_type == 'Classic Alarm Hub Device':
-            move_classic_alarm_hub_device(device_dict, verkada_classic_alarm_site_id)
+            return move_classic_alarm_hub_device(device_dict, verkada_classic_alarm_site_id)
         elif device_type == 'Classic Alarm Keypad':
-            move_classic_alarm_keypad(device_dict, verkada_classic_alarm_zone_id)
+            return move_classic_alarm_keypad(device_dict, verkada_classic_alarm_zone_id)
         elif device_type == 'Classic Alarm Door Contact Sensor':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "doorContactSensor")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "doorContactSensor")
         elif device_type == 'Classic Alarm Glass Break Sensor':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "glassBreakSensor")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "glassBreakSensor")
         elif device_type == 'Classic Alarm Motion Sensor':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "motionSensor")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "motionSensor")
         elif device_type == 'Classic Alarm Panic Button':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "panicButton")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "panicButton")
         elif device_type == 'Classic Alarm Water Sensor':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "waterSensor")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "waterSensor")
         elif device_type == 'Classic Alarm Wireless Relay':
-            move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "wirelessRelay")
+            return move_classic_alarm_sensor(device_dict, verkada_classic_alarm_zone_id, "wirelessRelay")
         elif device_type == 'Siren Strobe':
-            move_siren_strobe(device_dict, verkada_new_alarm_site_id)
+            return move_siren_strobe(device_dict, verkada_new_alarm_site_id)
         elif device_type == 'BP52 Panel':
             logger.warning('Encountered unhandled device type: BP52')
-            pass
         elif device_type == 'Alarm Expander':
-            move_alarm_expander(device_dict, verkada_new_alarm_site_id)
-            pass
+            return move_alarm_expander(device_dict, verkada_new_alarm_site_id)
             
         else:
             logger.warning(f"Device type unaccounted for when moving: {device_type}")
+        return None
+
+    move_requests = []
+    # (batch endpoint, destination) -> device IDs
+    batched_moves = {}
+    for device in devices:
+        try:
+            move_request = move_device(device)
+        except Exception as e:
+            logger.error(f"Error preparing move for device {device.id}: {e}")
+            continue
+        if isinstance(move_request, _BatchedMove):
+            batched_moves.setdefault((move_request.endpoint, move_request.destination_id), []).append(move_request.device_id)
+        elif move_request is not None:
+            move_requests.append(move_request)
+    for (endpoint, destination_id), device_ids in batched_moves.items():
+        build_request, chunk_size = batch_move_builders[endpoint]
+        move_requests.extend(build_request(chunk, destination_id) for chunk in _chunks(device_ids, chunk_size))
 
-    # Multithreading with ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=10) as executor:  # Adjust max_workers as needed
-        futures = [executor.submit(move_device, device) for device in devices]
-        for future in as_completed(futures):
-            try:
-                future.result()  # Retrieve the result to catch exceptions
-            except Exception as e:
-                logger.error(f"Error in moving device: {e}")
\ No newline at end of file
+    # Fan the moves out concurrently on an event loop
+    logger.info(f"Sending {len(move_requests)} device move requests "
+                f"({sum(len(device_ids) for device_ids in batched_moves.values())} devices in batches).")
+    results = {}
+    pending_requests = move_requests
+    while pending_requests:
+        split_requests = []
+        for result in run_verkada_requests(verkada_bot_user_info, pending_requests, retry_budget=retry_budget, deadline=deadline):
+            context = result.request.context
+            if isinstance(context, _MoveBatch):
+                moved_ids, destination_id = context.device_ids, context.destination_id
+            else:
+                moved_id, destination_id = context
+                moved_ids = (moved_id,)
+            if _is_rejected_batch(result):
+                # Halve the batch so the devices it was rejected for end up in requests of their own
+                logger.warning(f"Batch move of {len(moved_ids)} devices to {destination_id} was rejected ({result.error}); splitting it.")
+                build_request = batch_move_builders[context.endpoint][0]
+                half = len(moved_ids) // 2
+                split_requests.append(build_request(list(moved_ids[:half]), destination_id))
+                split_requests.append(build_request(list(moved_ids[half:]), destination_id))
+                continue
+            for moved_id in moved_ids:
+                results[moved_id] = {'destinationId': destination_id, 'ok': result.ok, 'error': None if result.ok else str(result.error)}
+            if result.ok:
+                logger.info(f"{', '.join(map(str, moved_ids))} moved successfully to {destination_id}.")
+            else:
+                logger.error(f"Error moving {', '.join(map(str, moved_ids))}: {result.error}")
+        pending_requests = split_requests
+    if move_requests:
+        # Site membership changed, so a cached init payload is stale
+        invalidate_verkada_app_init(verkada_org_id)
+        invalidate_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_SITES, SECTION_DEVICES))
+    log_limiter_stats(verkada_org_id)
+    log_breaker_stats(verkada_org_id)
+    save_skipped_operations(org_id, verkada_org_id, 'clean_verkada_device_sites')
+    return results
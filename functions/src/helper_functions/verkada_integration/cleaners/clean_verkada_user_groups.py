@@ -1,9 +1,11 @@
 from src.shared import db, logger
-from ..utils.http_utils import requests_with_retry
+from ..utils.verkada_client import get_verkada_client
+from ..utils.retry_policy import NON_IDEMPOTENT_POLICY
+from ..utils.inventory_snapshot import SECTION_USER_GROUPS, invalidate_inventory_snapshot
 from requests.exceptions import RequestException
 
 
-def clean_verkada_user_groups(org_id, verkada_bot_user_info):
+def clean_verkada_user_groups(org_id, verkada_bot_user_info, deadline=None):
     """
     Cleans up the Verkada user groups by removing any groups that are not in the allowed list.
     """
@@ -18,32 +20,35 @@ def clean_verkada_user_groups(org_id, verkada_bot_user_info):
             logger.warning(f"No groups found for organization {org_id}.")
             return
         
+        removed_any = False
         for group in org_verkada_user_groups:
             if not group.get('isWhitelisted'):
-                remove_group(verkada_bot_user_info, group)
+                if deadline is not None and deadline.expired:
+                    deadline.skip("user group removal")
+                    continue
+                remove_group(verkada_bot_user_info, group, deadline=deadline)
+                removed_any = True
+        if removed_any:
+            # The snapshot's group list no longer matches Verkada
+            invalidate_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_USER_GROUPS,))
         
         logger.info(f"Cleaned up user groups for organization {org_id}.")
     
     except Exception as e:
         logger.error(f"Error cleaning up user groups for organization {org_id}: {str(e)}")
 
-def remove_group(verkada_bot_user_info, group):
+def remove_group(verkada_bot_user_info, group, deadline=None):
     """
     Removes a group from the Verkada organization.
     """
     verkada_org_short_name = verkada_bot_user_info.get('org_name')
-    bot_auth_headers = verkada_bot_user_info.get('auth_headers')
+    verkada_client = get_verkada_client(verkada_bot_user_info, deadline=deadline)
     group_id = group.get('groupId')
     
     try:
         # Make a request to the Verkada API to remove the group
         delete_url = f"https://vauth.command.verkada.com/__v/{verkada_org_short_name}/security_entity_group/delete"
-        response = requests_with_retry(
-            'post',
-            delete_url,
-            headers=bot_auth_headers,
-            json={"securityEntityGroupIds":[group_id]},
-        )
+        response = verkada_client.post(delete_url, json={"securityEntityGroupIds":[group_id]}, policy=NON_IDEMPOTENT_POLICY)
 
     except RequestException as e:
         # Handle request exceptions
@@ -1,37 +1,62 @@
 import requests
+import threading
 import concurrent.futures
+from collections import Counter
+from typing import Optional
 from firebase_admin import firestore
-from requests.exceptions import RequestException, JSONDecodeError
-from ..utils.http_utils import requests_with_retry
+from ..utils.rate_limiter import log_limiter_stats
+from ..utils.hedging import log_hedge_stats
+from ..utils.circuit_breaker import log_breaker_stats, save_skipped_operations
+from ..utils.inventory_snapshot import SECTION_DEVICES, SECTION_SITES, device_site_ids, get_inventory_snapshot
+from ..utils.device_index import DeviceIndex, build_device_index
+from ..utils.firestore_writes import BULK_WRITE_ALREADY_EXISTS_CODE, FirestoreWriteEngine
+from ..utils.device_tombstones import VERKADA_REMOVED_FIELD, find_removed_devices, is_removed_from_verkada, mark_removed_devices
+from ..utils.integration_runs import IntegrationRunReport, run_stage
+from ..utils.payload_fingerprints import fingerprint_records, get_payload_fingerprints, is_fingerprint_current, save_payload_fingerprints
+from ..utils.verkada_device_types import DEVICE_SYNC_MAX_WORKERS, VERKADA_DEVICE_TYPES, VerkadaDeviceRecord, VerkadaDeviceType
+from src.helper_functions.devices.device_doc_ids import creates_serial_keyed_devices, device_doc_id
 from src.shared import db, logger
-from functools import partial
 from src.helper_functions.verkada_integration.utils.check_verkada_device_type import check_verkada_device_type
 
 
+# Fields only a newly created device document is given. When a create finds the
+# document already there, the rest of the data is merged into it without these,
+# so the device's checkout state and history are kept.
+DEVICE_CREATE_ONLY_FIELDS = (
+    'deviceId',
+    'deviceSerialNumber',
+    'createdAt',
+    'isDeviceCheckedOut',
+    'deviceCheckedOutBy',
+    'deviceCheckedOutAt',
+    'deviceDeleted',
+)
+
 # --- Generic Helper to Prepare Write Data ---
 
-def _prepare_device_write_data(device_data: dict, org_id: str, id_field: str, serial_field: str, expected_type: str, extra_fields: dict = None):
+def _prepare_device_write_data(record: VerkadaDeviceRecord, device_index: DeviceIndex, expected_type: str, site_id: str = None):
     """
-    Prepares data for Firestore write (update or create) for a single device.
-    Queries Firestore to check existence based on serial number.
+    Prepares data for Firestore write (update or create) for a single listed device.
+    Checks existence based on serial number in the org's prefetched device index.
+    A site_id from the org's site membership is written along with the device's
+    Verkada fields, unless the listing itself gave the device a site.
     Returns a tuple: (action, target, data) or None.
-    action: 'update' or 'create'
-    target: DocumentReference for update, serial_number for create
-    data: Dictionary of fields to set/update
+    action: 'update', 'create' or 'unchanged'
+    target: DocumentReference for update/unchanged, serial_number for create
+    data: Dictionary of fields to set/update; for updates only the fields whose value changed
     """
-    verkada_device_id = device_data.get(id_field)
-    serial_number = device_data.get(serial_field)
-    # Special case for env sensors using 'claimedSerialNumber'
-    if serial_field == 'claimedSerialNumber' and not serial_number:
-        serial_number = device_data.get('serialNumber') # Fallback if needed, adjust if API guarantees one or the other
+    verkada_device_id = record.device_id
+    serial_number = record.serial_number
+    extra_fields = record.extra_data()
+    if site_id is not None:
+        extra_fields.setdefault('deviceVerkadaSiteId', site_id)
 
     if not (verkada_device_id and serial_number):
-        logger.warning(f"Skipping {expected_type} due to missing ID ('{id_field}') or Serial ('{serial_field}'): {device_data}")
+        logger.warning(f"Skipping {expected_type} due to missing ID or serial number: {record}")
         return None
 
     try:
-        devices_ref = db.collection('organizations').document(org_id).collection('devices')
-        existing_device_query = devices_ref.where('deviceSerialNumber', '==', serial_number).limit(1).get()
+        existing_device = device_index.get(serial_number)
 
         update_data = {
             'deviceVerkadaDeviceId': verkada_device_id,
@@ -40,14 +65,19 @@ def _prepare_device_write_data(device_data: dict, org_id: str, id_field: str, se
         if extra_fields:
             update_data.update(extra_fields) # Add specific fields like siteId
 
-        if existing_device_query:
-            # Device exists, prepare for update
-            device_ref = existing_device_query[0].reference
-            return ('update', device_ref, update_data)
+        if existing_device:
+            # Device exists, only write the Verkada fields whose value differs from the stored document
+            changed_fields = {field: value for field, value in update_data.items() if existing_device.fields.get(field) != value}
+            if is_removed_from_verkada(existing_device.fields):
+                # Listed by Verkada again, so the cleaners should handle it again
+                changed_fields[VERKADA_REMOVED_FIELD] = False
+            if not changed_fields:
+                return ('unchanged', existing_device.reference, {})
+            return ('update', existing_device.reference, changed_fields)
         else:
             # Device doesn't exist, prepare for creation
             create_data = {
-                # 'deviceId' will be added during batch creation
+                # 'deviceId' will be added when the document is queued for writing
                 'deviceSerialNumber': serial_number,
                 'deviceVerkadaDeviceId': verkada_device_id,
                 'createdAt': firestore.SERVER_TIMESTAMP,
@@ -66,313 +96,300 @@ def _prepare_device_write_data(device_data: dict, org_id: str, id_field: str, se
         logger.error(f"Error preparing write data for {expected_type} SN {serial_number}: {e}")
         return None
 
+
+def _is_type_in_sync(device_type: VerkadaDeviceType, records, device_index: DeviceIndex, site_ids: dict) -> bool:
+    """
+    Whether every listed device of a type is already stored the way the sync
+    would write it. A matching payload fingerprint only shows Verkada's side is
+    unchanged; this catches devices created, deleted or edited in Firestore
+    since the last full pass. Only the in-memory device index is read.
+    """
+    for record in records:
+        if not (record.device_id and record.serial_number):
+            continue
+        if device_type.reclassified_as and check_verkada_device_type(record.serial_number) == device_type.reclassified_as:
+            continue
+        result = _prepare_device_write_data(record, device_index, device_type.device_type, site_id=site_ids.get(record.device_id))
+        if result is not None and result[0] != 'unchanged':
+            return False
+    return True
+
 # --- Function to Execute Batches ---
 
-def _execute_firestore_batches(write_data_list: list, org_id: str, batch_size: int = 499):
-    """Executes Firestore writes in batches based on prepared data."""
+class _DeviceWriteCounts:
+    """Thread-safe totals of unchanged, updated, created and failed devices across a sync's tasks, overall and per device type."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._by_type = {}
+        self._lock = threading.Lock()
+
+    def add(self, counts: Counter, device_type: str = None) -> None:
+        with self._lock:
+            self._counts.update(counts)
+            if device_type is not None:
+                self._by_type.setdefault(device_type, Counter()).update(counts)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {action: self._counts.get(action, 0) for action in ('unchanged', 'update', 'create', 'failed')}
+
+    def by_type(self) -> dict:
+        with self._lock:
+            return {device_type: dict(counts) for device_type, counts in self._by_type.items()}
+
+
+def _execute_device_writes(write_data_list: list, org_id: str, description: str, write_counts: _DeviceWriteCounts = None, serial_keyed: bool = False):
+    """
+    Writes the prepared device data through the shared bulk write engine.
+    Unchanged devices are counted but not written; updated and created devices
+    are counted once their write succeeds. In serial-keyed orgs new devices
+    are created at their serial's document, so concurrent syncs cannot create
+    duplicates. A create that finds the document already there (a device added
+    after the index was built) only merges the Verkada fields into it.
+
+    Returns:
+        int: The number of documents written.
+    """
     if not write_data_list:
         return 0
 
     devices_ref = db.collection('organizations').document(org_id).collection('devices')
-    batch = db.batch()
-    batch_count = 0
-    total_processed = 0
-
-    for action, target, data in write_data_list:
-        try:
-            if action == 'update':
-                doc_ref = target # Target is the DocumentReference
-                batch.set(doc_ref, data, merge=True)
-                total_processed += 1
-                batch_count += 1
-            elif action == 'create':
-                # Target is the serial_number, data is the full doc data
-                # We need to generate a new ID here before adding to batch
-                doc_ref = devices_ref.document()
-                data['deviceId'] = doc_ref.id # Add the generated ID
-                batch.set(doc_ref, data)
-                total_processed += 1
-                batch_count += 1
-            else:
-                 logger.warning(f"Unknown action '{action}' in write data list.")
-                 continue # Skip unknown actions
-
-            if batch_count >= batch_size:
-                logger.info(f"Committing batch of {batch_count} operations...")
-                batch.commit()
-                logger.info("Batch committed.")
-                # Start new batch
-                batch = db.batch()
-                batch_count = 0
-
-        except Exception as e:
-            logger.error(f"Error adding operation to batch or committing batch: {e}")
-            batch = db.batch()
-            batch_count = 0
-
-    # Commit any remaining items
-    if batch_count > 0:
-        try:
-            logger.info(f"Committing final batch of {batch_count} operations...")
-            batch.commit()
-            logger.info("Final batch committed.")
-        except Exception as e:
-            logger.error(f"Error committing final batch: {e}")
-
-    return total_processed
+    action_counts = Counter()
+    actions_by_path = {}
+    # Document path -> (reference, create data) of serial-keyed creates
+    serial_creates = {}
+
+    with FirestoreWriteEngine(description) as writes:
+        for action, target, data in write_data_list:
+            try:
+                if action == 'unchanged':
+                    action_counts['unchanged'] += 1
+                    continue
+                elif action == 'update':
+                    doc_ref = target # Target is the DocumentReference
+                    writes.set(doc_ref, data, merge=True)
+                elif action == 'create':
+                    # Target is the serial_number, data is the full doc data
+                    doc_ref = devices_ref.document(device_doc_id(target)) if serial_keyed else devices_ref.document()
+                    data['deviceId'] = doc_ref.id # Add the generated ID
+                    writes.create(doc_ref, data)
+                    if serial_keyed:
+                        serial_creates[doc_ref.path] = (doc_ref, data)
+                else:
+                    logger.warning(f"Unknown action '{action}' in write data list.")
+                    continue # Skip unknown actions
+                actions_by_path[doc_ref.path] = action
+            except Exception as e:
+                logger.error(f"Error queueing {action} for device {target}: {e}")
+
+    results = dict(writes.results)
+    existing = [serial_creates[path] for path, result in results.items()
+                if not result.succeeded and result.code == BULK_WRITE_ALREADY_EXISTS_CODE and path in serial_creates]
+    if existing:
+        logger.info(f"{len(existing)} {description} devices to create already exist; updating their Verkada fields.")
+        with FirestoreWriteEngine(f"{description} existing") as existing_writes:
+            for doc_ref, data in existing:
+                verkada_data = {field: value for field, value in data.items() if field not in DEVICE_CREATE_ONLY_FIELDS}
+                verkada_data[VERKADA_REMOVED_FIELD] = False
+                existing_writes.set(doc_ref, verkada_data, merge=True)
+                actions_by_path[doc_ref.path] = 'update'
+        results.update(existing_writes.results)
+
+    for path, result in results.items():
+        action_counts[actions_by_path.get(path) if result.succeeded else 'failed'] += 1
+
+    logger.info(f"Devices unchanged: {action_counts['unchanged']}, updated: {action_counts['update']}, "
+                f"created: {action_counts['create']}, failed: {action_counts['failed']}.")
+    if write_counts is not None:
+        write_counts.add(action_counts, description)
+    return sum(1 for result in results.values() if result.succeeded)
+
+def _site_only_updates(site_ids: dict, device_index: DeviceIndex, listed_ids: set) -> list:
+    """
+    Site changes of devices in a site's membership that no listed device type
+    covered, matched by their stored Verkada device ID.
+    Returns (device reference, site ID) pairs.
+    """
+    updates = []
+    for device in device_index:
+        verkada_device_id = device.fields.get('deviceVerkadaDeviceId')
+        if not verkada_device_id or str(verkada_device_id) in listed_ids or verkada_device_id not in site_ids:
+            continue
+        if device.fields.get('deviceVerkadaSiteId') != site_ids[verkada_device_id]:
+            updates.append((device.reference, site_ids[verkada_device_id]))
+    return updates
 
 # --- Main Sync Function (Modified Structure) ---
 
-def sync_verkada_device_ids(org_id, verkada_bot_user_info: dict, max_workers: int = 10) -> None:
-    verkada_org_shortname = verkada_bot_user_info.get("org_name")
+def sync_verkada_device_ids(org_id, verkada_bot_user_info: dict, deadline=None, force: bool = False, report: IntegrationRunReport = None,
+                            include_sites: bool = False) -> dict:
+    """
+    Syncs Verkada device IDs and types into the org's devices collection,
+    writing only devices whose Verkada fields changed. The devices are read
+    from the org's inventory snapshot, which is listed from Verkada at most
+    once per run. Device types whose payload fingerprint matches the last full
+    pass, and whose listed devices all match their indexed documents, skip the
+    write stage entirely.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        verkada_bot_user_info (dict): The Verkada bot user's info.
+        deadline (Deadline, optional): The run's deadline; no new lookups are started past it.
+        force (bool, optional): Process every device type even if its payload is unchanged.
+        report (IntegrationRunReport, optional): The run's report; stage timings, per-type
+            counts and the Verkada calls of this sync are added to it.
+        include_sites (bool, optional): Also sync deviceVerkadaSiteId from the org's site
+            membership, in the same write as each device's Verkada fields. This replaces
+            a separate sync_verkada_site_ids pass.
+
+    Returns:
+        dict: Numbers of unchanged, updated ('update'), created ('create'), failed and newly
+            removed devices, and the skipped device types with the fraction of fetched types they make up.
+            With include_sites, also the number of site-only updates ('siteUpdated').
+    """
     verkada_org_id = verkada_bot_user_info.get("org_id")
-    auth_headers = verkada_bot_user_info.get("auth_headers")
-
-    def _sync_generic(api_url: str, api_method: str, api_payload: dict, result_key: str, id_field: str, serial_field: str, device_type_str: str, extra_fields_map: dict = None):
-        """Generic function to fetch, prepare, and batch write for a device type."""
-        logger.info(f"Starting sync for {device_type_str}...")
-        items = []
-        try:
-            response = requests_with_retry(api_method, api_url, headers=auth_headers, json=api_payload)
-            response.raise_for_status()
-            json_response = response.json()
-            if isinstance(json_response, list):
-                items = json_response
-            elif isinstance(json_response, dict):
-                items = json_response.get(result_key, [])
-            else:
-                logger.warning(f"Unexpected response format for {device_type_str}. Expected list or dict, got {type(json_response)}")
-                items = []
-
-        except RequestException as e:
-            logger.error(f"Error fetching {device_type_str} info after retries: {e}")
-            return
-        except JSONDecodeError as e:
-            logger.error(f"Error decoding JSON response for {device_type_str}: {e}")
-            return
-        except Exception as e:
-            logger.error(f"An unexpected error occurred during {device_type_str} fetch: {e}")
-            return
 
-        if not items:
-            logger.info(f"No {device_type_str} found to process.")
-            return
-
-        # Filter out intercoms from cameras if applicable
-        if device_type_str == "Camera":
-            filtered_items = []
-            for item in items: # Changed item_data to item
-                serial_number = item.get(serial_field)
-                if serial_number:
-                    actual_type = check_verkada_device_type(serial_number)
-                    if actual_type == 'Intercom':
-                        logger.info(f"Skipping Camera sync for SN {serial_number} as it's identified as an Intercom.")
-                        continue # Skip this item, it will be handled by the Intercom sync task
-        
-                filtered_items.append(item)
-            items = filtered_items
+    # One paged scan of the devices collection replaces a serial-number query per fetched device
+    try:
+        with run_stage(report, 'deviceIndex'):
+            device_index = build_device_index(org_id)
+            serial_keyed = creates_serial_keyed_devices(db.collection('organizations').document(org_id).get().to_dict())
+    except Exception as e:
+        logger.error(f"Error indexing devices for organization {org_id}: {e}")
+        return {}
+    write_counts = _DeviceWriteCounts()
 
+    def prepare_items(device_type: VerkadaDeviceType, records) -> tuple:
+        """Turns one type's listed records into write data. Returns (records looked up, prepared writes)."""
+        fetched_count = 0
         prepared_writes = []
-        worker_func = partial(_prepare_device_write_data,
-                              org_id=org_id,
-                              id_field=id_field,
-                              serial_field=serial_field,
-                              expected_type=device_type_str)
-
-        tasks = []
-        for item_data in items:
-            extra_data = {}
-            if extra_fields_map:
-                for dest_key, src_key in extra_fields_map.items():
-                    val = item_data.get(src_key)
-                    if val is not None:
-                        extra_data[dest_key] = val
-            tasks.append((item_data, extra_data))
-
-        def worker_wrapper(task_args):
-            item_data, extra_data = task_args
-            return worker_func(device_data=item_data, extra_fields=extra_data)
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(worker_wrapper, tasks)
-            prepared_writes = [result for result in results if result is not None]
-
-        logger.info(f"Prepared {len(prepared_writes)} write operations for {len(items)} fetched {device_type_str}.")
-        processed_count = _execute_firestore_batches(prepared_writes, org_id)
-        logger.info(f"Finished processing {device_type_str}. Processed {processed_count} Firestore operations.")
-
-    sync_tasks_definitions = [
-        {
-            "api_url": f"https://vappinit.command.verkada.com/__v/{verkada_org_shortname}/app/v2/init",
-            "api_method": "post", "api_payload": {"fieldsToSkip": ["permissions"]}, "result_key": "cameras",
-            "id_field": "cameraId", "serial_field": "serialNumber", "device_type_str": "Camera"
-        },
-        {
-            "api_url": f"https://vcerberus.command.verkada.com/__v/{verkada_org_shortname}/access/v2/user/access_controllers",
-            "api_method": "get", "api_payload": {}, "result_key": "accessControllers",
-            "id_field": "accessControllerId", "serial_field": "serialNumber", "device_type_str": "Access Controller"
-        },
-        {
-            "api_url": f"https://vsensor.command.verkada.com/__v/{verkada_org_shortname}/devices/list",
-            "api_method": "post", "api_payload": {"organizationId": verkada_org_id, "favoritesOnly": False}, "result_key": "sensorDevice",
-            "id_field": "deviceId", "serial_field": "claimedSerialNumber", "device_type_str": "Environmental Sensor"
-        },
-        {
-            "api_url": f"https://vnet.command.verkada.com/__v/{verkada_org_shortname}/devices/list",
-            "api_method": "post", "api_payload": {"organizationId": verkada_org_id}, "result_key": None,
-            "id_field": "device_id", "serial_field": "claimed_serial_number", "device_type_str": "Gateway"
-        },
-        {
-            "api_url": f"https://vprovision.command.verkada.com/__v/{verkada_org_shortname}/vfortress/list_boxes",
-            "api_method": "post", "api_payload": {'organizationId': verkada_org_id}, "result_key": None,
-            "id_field": "deviceId", "serial_field": "claimedSerialNumber", "device_type_str": "Command Connector"
-        },
-        {
-            "api_url": f"https://vvx.command.verkada.com/__v/{verkada_org_shortname}/device/list",
-            "api_method": "post", "api_payload": {"organizationId": verkada_org_id}, "result_key": "viewingStations",
-            "id_field": "viewingStationId", "serial_field": "claimedSerialNumber", "device_type_str": "Viewing Station"
-        },
-        {
-            "api_url": f"https://vbroadcast.command.verkada.com/__v/{verkada_org_shortname}/management/speaker/list",
-            "api_method": "post", "api_payload": {"organizationId": verkada_org_id}, "result_key": "garfunkel",
-            "id_field": "deviceId", "serial_field": "serialNumber", "device_type_str": "Speaker"
-        },
-        {
-            "api_url": f"https://alarms.command.verkada.com/__v/{verkada_org_shortname}/device/keypad/get_all",
-            "api_method": "post", "api_payload": {"organizationId": verkada_org_id}, "result_key": "keypad",
-            "id_field": "deviceId", "serial_field": "claimedSerialNumber", "device_type_str": "Classic Alarm Keypad"
-        },
-        {
-            "api_url": f"https://vproconfig.command.verkada.com/__v/{verkada_org_shortname}/org/get_devices_and_alarm_systems",
-            "api_method": "post", "api_payload": {}, "result_key": "devices",
-            "id_field": "id", "serial_field": "serialNumber",
-            "device_type_str": "New Alarms Device",
-            "extra_fields_map": {"deviceVerkadaNewAlarmsSystemId": "alarmSystemId"}
-        },
-    ]
-
-    def sync_intercom_and_desk_station_ids_combined():
-        logger.info("Starting sync for Intercoms and Desk Stations...")
-        url = f"https://api.command.verkada.com/__v/{verkada_org_shortname}/vinter/v1/user/organization/{verkada_org_id}/device"
-        desk_stations = []
-        intercoms = []
-        try:
-            response = requests_with_retry('get', url, headers=auth_headers, json={})
-            response.raise_for_status()
-            data = response.json()
-            desk_stations = data.get("deskApps", [])
-            intercoms = data.get("intercoms", [])
-        except Exception as e:
-            logger.error(f"Error fetching intercom/desk station data: {e}")
-            return
-
-        if desk_stations:
-            worker_func_ds = partial(_prepare_device_write_data, org_id=org_id, id_field="deviceId", serial_field="serialNumber", expected_type="Desk Station")
-            tasks_ds = [(ds_data, {}) for ds_data in desk_stations]
-            def worker_wrapper_ds(task_args):
-                item_data, extra_data = task_args
-                return worker_func_ds(device_data=item_data, extra_fields=extra_data)
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                results_ds = executor.map(worker_wrapper_ds, tasks_ds)
-                prepared_writes_ds = [result for result in results_ds if result is not None]
-            logger.info(f"Prepared {len(prepared_writes_ds)} write operations for {len(desk_stations)} fetched Desk Stations.")
-            processed_count_ds = _execute_firestore_batches(prepared_writes_ds, org_id)
-            logger.info(f"Finished processing Desk Stations. Processed {processed_count_ds} Firestore operations.")
-        else:
-            logger.info("No Desk Stations found to process.")
-
-        if intercoms:
-            worker_func_ic = partial(_prepare_device_write_data, org_id=org_id, id_field="deviceId", serial_field="serialNumber", expected_type="Intercom")
-            tasks_ic = [(ic_data, {}) for ic_data in intercoms]
-            def worker_wrapper_ic(task_args):
-                item_data, extra_data = task_args
-                return worker_func_ic(device_data=item_data, extra_fields=extra_data)
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                results_ic = executor.map(worker_wrapper_ic, tasks_ic)
-                prepared_writes_ic = [result for result in results_ic if result is not None]
-            logger.info(f"Prepared {len(prepared_writes_ic)} write operations for {len(intercoms)} fetched Intercoms.")
-            processed_count_ic = _execute_firestore_batches(prepared_writes_ic, org_id)
-            logger.info(f"Finished processing Intercoms. Processed {processed_count_ic} Firestore operations.")
-        else:
-            logger.info("No Intercoms found to process.")
-
-    def sync_classic_alarms_hub_and_sensors_combined():
-        logger.info("Starting sync for Classic Alarm Hubs and Sensors...")
-        url = f"https://alarms.command.verkada.com/__v/{verkada_org_shortname}/device/get_all"
-        payload = {"organizationId": verkada_org_id}
-        all_sensor_types = {}
-        try:
-            response = requests_with_retry('post', url, headers=auth_headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            all_sensor_types = {
-                "hubDevice": (data.get("hubDevice", []), "deviceId", "claimedSerialNumber", "Classic Alarm Hub Device", {"deviceVerkadaSiteId": "siteId"}),
-                "doorContactSensor": (data.get("doorContactSensor", []), "deviceId", "serialNumber", "Classic Alarm Door Contact Sensor", {}),
-                "glassBreakSensor": (data.get("glassBreakSensor", []), "deviceId", "serialNumber", "Classic Alarm Glass Break Sensor", {}),
-                "motionSensor": (data.get("motionSensor", []), "deviceId", "serialNumber", "Classic Alarm Motion Sensor", {}),
-                "panicButton": (data.get("panicButton", []), "deviceId", "serialNumber", "Classic Alarm Panic Button", {}),
-                "waterSensor": (data.get("waterSensor", []), "deviceId", "serialNumber", "Classic Alarm Water Sensor", {}),
-                "wirelessRelay": (data.get("wirelessRelay", []), "deviceId", "serialNumber", "Classic Alarm Wireless Relay", {}),
-            }
-        except Exception as e:
-            logger.error(f"Error fetching classic alarm device data: {e}")
-            return
-
-        if not any(v[0] for v in all_sensor_types.values()):
-             logger.info("No classic alarm devices found to process.")
-             return
-
-        for api_key, (items, id_field, serial_field, type_str, extra_map) in all_sensor_types.items():
-            if items:
-                logger.info(f"Processing {len(items)} {type_str}...")
-                worker_func = partial(_prepare_device_write_data, org_id=org_id, id_field=id_field, serial_field=serial_field, expected_type=type_str)
-                tasks = []
-                for item_data in items:
-                    # Check if it's a hubDevice but has a Keypad serial prefix
-                    if type_str == "Classic Alarm Hub Device":
-                        serial_number = item_data.get(serial_field)
-                        if serial_number:
-                            actual_type = check_verkada_device_type(serial_number)
-                            if actual_type == 'Classic Alarm Keypad':
-                                logger.info(f"Skipping hubDevice sync for SN {serial_number} as it's identified as a Keypad.")
-                                continue # Skip this item, it will be handled by the Keypad sync task
-                    
-                    extra_data = {}
-                    if extra_map:
-                        for dest_key, src_key in extra_map.items():
-                            val = item_data.get(src_key)
-                            if val is not None:
-                                extra_data[dest_key] = val
-                    tasks.append((item_data, extra_data))
-
-                def worker_wrapper(task_args):
-                    item_data, extra_data = task_args
-                    return worker_func(device_data=item_data, extra_fields=extra_data)
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    results = executor.map(worker_wrapper, tasks)
-                    prepared_writes = [result for result in results if result is not None]
-                logger.info(f"Prepared {len(prepared_writes)} write operations for {len(items)} fetched {type_str}.")
-                processed_count = _execute_firestore_batches(prepared_writes, org_id)
-                logger.info(f"Finished processing {type_str}. Processed {processed_count} Firestore operations.")
-            else:
-                logger.info(f"No {type_str} found to process.")
-
-    all_futures = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for task_def in sync_tasks_definitions:
-            future = executor.submit(_sync_generic, **task_def)
-            all_futures.append(future)
-
-        all_futures.append(executor.submit(sync_intercom_and_desk_station_ids_combined))
-        all_futures.append(executor.submit(sync_classic_alarms_hub_and_sensors_combined))
-
-        for future in concurrent.futures.as_completed(all_futures):
+        for record in records:
+            if deadline is not None and deadline.expired:
+                # Writes prepared so far are still committed
+                deadline.skip(f"{device_type.device_type} lookups")
+                break
+            fetched_count += 1
+            if device_type.reclassified_as:
+                serial_number = record.serial_number
+                if serial_number and check_verkada_device_type(serial_number) == device_type.reclassified_as:
+                    logger.info(f"Skipping {device_type.device_type} sync for SN {serial_number} as it's identified as a {device_type.reclassified_as}.")
+                    continue # Skip this item, it will be handled by the sync of the type it was reclassified as
+
+            result = _prepare_device_write_data(record, device_index, device_type.device_type, site_id=site_ids.get(record.device_id))
+            if result is not None:
+                prepared_writes.append(result)
+        return fetched_count, prepared_writes
+
+    def write_device_type(device_type: VerkadaDeviceType, items: list, fingerprint: str) -> Optional[str]:
+        """
+        Prepare and write stage: writes one type's items through the bulk write engine.
+        Returns the fingerprint to save if every item was prepared and written, otherwise None.
+        """
+        if not items:
+            logger.info(f"No {device_type.device_type} found to process.")
+            return fingerprint
+        fetched_count, prepared_writes = prepare_items(device_type, items)
+        logger.info(f"Prepared {len(prepared_writes)} write operations for {fetched_count} fetched {device_type.device_type}.")
+        processed_count = _execute_device_writes(prepared_writes, org_id, device_type.device_type, write_counts=write_counts, serial_keyed=serial_keyed)
+        logger.info(f"Finished processing {device_type.device_type}. Wrote {processed_count} device documents.")
+        expected_count = sum(1 for action, _, _ in prepared_writes if action != 'unchanged')
+        if fetched_count < len(items) or processed_count < expected_count:
+            # Not fully processed, so the next run must not skip this type
+            return None
+        return fingerprint
+
+    # Every type is listed once per run by the inventory snapshot; this sync only reconciles it
+    with run_stage(report, 'deviceInventory'):
+        snapshot = get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, deadline=deadline,
+                                          sections=(SECTION_DEVICES, SECTION_SITES) if include_sites else (SECTION_DEVICES,),
+                                          http_counts=report.http_counts if report is not None else None)
+    listed_devices = snapshot.get(SECTION_DEVICES, {})
+    if include_sites and snapshot.get(SECTION_SITES) is None:
+        logger.error(f"Site data for organization {org_id} could not be fetched from Verkada; syncing device ids without sites.")
+        include_sites = False
+    site_ids = device_site_ids(snapshot.get(SECTION_SITES)) if include_sites else {}
+    # Fingerprints cover the sites in combined mode, so each mode keeps its own
+    fingerprint_job = 'sync_verkada_device_ids_with_sites' if include_sites else 'sync_verkada_device_ids'
+    saved_fingerprints = {} if force else get_payload_fingerprints(org_id, fingerprint_job)
+    fingerprints_to_save = {}
+    skipped_types = []
+    fetched_types = set()
+    fetched_ids = set()
+    fetched_counts = {}
+
+    with run_stage(report, 'deviceWrites'), concurrent.futures.ThreadPoolExecutor(max_workers=DEVICE_SYNC_MAX_WORKERS) as executor:
+        futures = {}
+        for device_type in VERKADA_DEVICE_TYPES:
+            items = listed_devices.get(device_type.device_type)
+            if items is None:
+                # Its listing failed, so nothing is known about this type in this run
+                continue
+            fetched_types.add(device_type.device_type)
+            fetched_counts[device_type.device_type] = len(items)
+            fetched_ids.update(str(record.device_id) for record in items if record.device_id)
+            fingerprint = fingerprint_records((*record, site_ids.get(record.device_id)) for record in items) if include_sites else fingerprint_records(items)
+            if (is_fingerprint_current(saved_fingerprints.get(device_type.device_type), fingerprint)
+                    and _is_type_in_sync(device_type, items, device_index, site_ids)):
+                # Same payload as the last full pass and every device already stored as listed
+                logger.info(f"Skipping {device_type.device_type}: {len(items)} items unchanged since the last sync.")
+                skipped_types.append(device_type.device_type)
+                continue
+            if deadline is not None and deadline.expired:
+                deadline.skip(f"{device_type.device_type} sync")
+                continue
+            futures[executor.submit(write_device_type, device_type, items, fingerprint)] = device_type
+        for future in concurrent.futures.as_completed(futures):
+            device_type = futures[future]
             try:
-                future.result()
+                fingerprint = future.result()
             except Exception as exc:
-                logger.error(f'A sync task generated an exception: {exc}')
-
-    logger.info(f"Completed all Verkada device sync for org: {org_id}")
\ No newline at end of file
+                logger.error(f'Device sync for {device_type.device_type} generated an exception: {exc}')
+                continue
+            if fingerprint is not None:
+                fingerprints_to_save[device_type.device_type] = fingerprint
+
+    save_payload_fingerprints(org_id, fingerprint_job, fingerprints_to_save)
+
+    site_updated = 0
+    if include_sites and deadline is not None and deadline.expired:
+        deadline.skip("site id writes")
+    elif include_sites:
+        # Devices of types the registry does not list (or whose listing failed) still get their site
+        with run_stage(report, 'siteWrites'):
+            site_updates = _site_only_updates(site_ids, device_index, fetched_ids)
+            if site_updates:
+                with FirestoreWriteEngine('site id') as writes:
+                    for device_ref, site_id in site_updates:
+                        writes.update(device_ref, {'deviceVerkadaSiteId': site_id})
+                site_updated = len(writes.succeeded)
+                logger.info(f"Site id write completed for {site_updated} of {len(site_updates)} devices outside the listed types.")
+
+    # Linked devices of a completely listed type that Verkada no longer lists were unclaimed or removed
+    with run_stage(report, 'removedDevices'):
+        removed_devices = find_removed_devices(device_index, fetched_ids, fetched_types)
+        removed_count = mark_removed_devices(removed_devices)
+    log_limiter_stats(verkada_org_id)
+    log_hedge_stats()
+    log_breaker_stats(verkada_org_id)
+    save_skipped_operations(org_id, verkada_org_id, 'sync_verkada_device_ids')
+    counts = write_counts.summary()
+    counts['skippedTypes'] = sorted(skipped_types)
+    counts['skippedFraction'] = round(len(skipped_types) / len(fetched_types), 3) if fetched_types else 0.0
+    counts['removed'] = removed_count
+    if include_sites:
+        counts['siteUpdated'] = site_updated
+    if report is not None:
+        type_counts = write_counts.by_type()
+        for device_type, fetched_count in fetched_counts.items():
+            report.add_device_counts(device_type, {'fetched': fetched_count, **type_counts.get(device_type, {}),
+                                                   **({'skipped': fetched_count} if device_type in skipped_types else {})})
+        # The index scan, org document and fingerprints are read; written are changed devices, tombstones and fingerprints
+        report.add_firestore_ops(reads=len(device_index) + 2,
+                                 writes=counts['update'] + counts['create'] + counts['failed'] + len(removed_devices) + site_updated + (1 if fingerprints_to_save else 0))
+        report.set('deviceSync', counts)
+    logger.info(f"Completed all Verkada device sync for org: {org_id}. "
+                f"Devices unchanged: {counts['unchanged']}, updated: {counts['update']}, created: {counts['create']}, failed: {counts['failed']}, "
+                f"marked removed from Verkada: {removed_count}. "
+                f"Skipped {len(skipped_types)} of {len(fetched_types)} device types with unchanged payloads ({counts['skippedFraction']:.0%}).")
+    return counts
\ No newline at end of file
@@ -1,82 +1,76 @@
-from src.helper_functions.verkada_integration.utils.http_utils import requests_with_retry
-from src.shared import db, logger
+from src.helper_functions.verkada_integration.utils.inventory_snapshot import SECTION_SITES, get_inventory_snapshot
+from src.shared import logger
 from requests.exceptions import RequestException
-from concurrent.futures import ThreadPoolExecutor
-from google.cloud.firestore import WriteBatch
+from src.helper_functions.verkada_integration.utils.device_index import build_verkada_id_index
+from src.helper_functions.verkada_integration.utils.firestore_writes import FirestoreWriteEngine
 
 
 
 
 
-def sync_verkada_site_ids(org_id, verkada_bot_user_info):
+def sync_verkada_site_ids(org_id, verkada_bot_user_info, deadline=None):
     """
     Sync Verkada site IDs for a given organization.
+    The devices are matched to their site in memory, from one projected scan of
+    the devices collection, and only devices whose site changed are written.
     Args:
         org_id (str): The organization ID.
         verkada_bot_user_info (dict): The user info dictionary containing authentication headers and other details.
-    """
+        deadline (Deadline, optional): The run's deadline; the site ids are not written if it is reached first.
 
-    def write_site_ids_to_firestore(batch, updates):
-        """Batch write site IDs to Firestore."""
-        for update in updates:
-            device_doc_ref = db.collection('organizations').document(org_id).collection('devices').document(update['device_id'])
-            batch.update(device_doc_ref, {'deviceVerkadaSiteId': update['site_id']})
-        batch.commit()
-        logger.info(f"Batch site id write completed for {len(updates)} devices.")
+    Returns:
+        dict: Numbers of devices whose site changed ('updated'), unchanged, listed by Verkada
+            but not linked to any device ('unmatched'), and failed writes. Empty on error.
+    """
 
-    def process_device(device_id, site_id, updates):
-        """Process a single device and prepare it for batch writing."""
-        device_ref = db.collection('organizations').document(org_id).collection('devices').where('deviceVerkadaDeviceId', '==', device_id).limit(1).stream()
-        for device_doc in device_ref:
-            updates.append({'device_id': device_doc.id, 'site_id': site_id})
+    def write_site_ids_to_firestore(updates):
+        """Bulk write site IDs to Firestore. Returns the number of devices written."""
+        with FirestoreWriteEngine('site id') as writes:
+            for device_ref, site_id in updates:
+                writes.update(device_ref, {'deviceVerkadaSiteId': site_id})
+        logger.info(f"Site id write completed for {len(writes.succeeded)} of {len(updates)} devices.")
+        return len(writes.succeeded)
 
     try:
-        verkada_org_shortname = verkada_bot_user_info['org_name']
-        verkada_app_init_url = f"https://vappinit.command.verkada.com/__v/{verkada_org_shortname}/app/v2/init"
-        verkada_app_init_payload = {}
-        response = requests_with_retry('post', verkada_app_init_url, json=verkada_app_init_payload, headers=verkada_bot_user_info['auth_headers'])
-        init_data = response.json()
-        sites = init_data.get('cameraGroups', {})
-
-        updates = []
-        with ThreadPoolExecutor() as executor:
-            for site in sites:
-                site_id = site.get('cameraGroupId')
+        snapshot = get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_SITES,), deadline=deadline)
+        sites = snapshot.get(SECTION_SITES)
+        if sites is None:
+            logger.error(f"Site data for organization {org_id} could not be fetched from Verkada.")
+            return {}
 
-                # Collect all device types
-                device_types = [
-                    ('accessControllers', site.get('accessControllers', [])),
-                    ('alarmsDevice', site.get('alarmsDevice', [])),
-                    ('biometricAccessController', site.get('biometricAccessController', [])),
-                    ('cameras', site.get('cameras', [])),
-                    ('connectBox', site.get('connectBox', [])),
-                    ('deskApp', site.get('deskApp', [])),
-                    ('fortress', site.get('fortress', [])),
-                    ('gateway', site.get('gateway', [])),
-                    ('intercom', site.get('intercom', [])),
-                    ('pavaSpeaker', site.get('pavaSpeaker', [])),
-                    ('speaker', site.get('speaker', [])),
-                    ('vayuSensor', site.get('vayuSensor', [])),
-                    ('wirelessLocks', site.get('wirelessLocks', [])),
-                ]
+        # One scan replaces a deviceVerkadaDeviceId query per listed device
+        devices_by_verkada_id = build_verkada_id_index(org_id)
 
-                # Process devices concurrently
-                for _, devices in device_types:
-                    for device_id in devices:
-                        executor.submit(process_device, device_id, site_id, updates)
+        # Device document path -> (reference, new site id), for the devices whose site changed
+        changed = {}
+        unchanged = 0
+        unmatched = 0
+        for site in sites:
+            site_id = site['siteId']
+            for device_ids in site['devices'].values():
+                for device_id in device_ids:
+                    device = devices_by_verkada_id.get(device_id)
+                    if device is None:
+                        unmatched += 1
+                    elif device.fields.get('deviceVerkadaSiteId') == site_id:
+                        unchanged += 1
+                    else:
+                        changed[device.reference.path] = (device.reference, site_id)
 
-        # Perform batch writes
-        batch_size = 500  # Firestore batch limit
-        for i in range(0, len(updates), batch_size):
-            batch = db.batch()
-            write_site_ids_to_firestore(batch, updates[i:i + batch_size])
+        if deadline is not None and deadline.expired:
+            deadline.skip("site id writes")
+            return {}
+        written = write_site_ids_to_firestore(list(changed.values()))
+        counts = {'updated': written, 'unchanged': unchanged, 'unmatched': unmatched, 'failed': len(changed) - written}
+        logger.info(f"Site ids for organization {org_id}: {counts}.")
+        return counts
 
     except RequestException as e:
         logger.error(f"Error fetching site data for organization {org_id}: {e}")
-        return
+        return {}
     except ValueError as e:
         logger.error(f"Error parsing JSON response for organization {org_id}: {e}")
-        return
+        return {}
     except Exception as e:
         logger.error(f"Unexpected error for organization {org_id}: {e}")
-        return
+        return {}
@@ -1,45 +1,25 @@
 from src.shared import db, logger
-from ..utils.http_utils import requests_with_retry
-from requests.exceptions import RequestException
+from ..utils.inventory_snapshot import SECTION_USER_GROUPS, get_inventory_snapshot
 
-def sync_verkada_user_groups(org_id, verkada_bot_user_info):
+def sync_verkada_user_groups(org_id, verkada_bot_user_info, deadline=None, http_counts=None):
     """
     Syncs user groups from Verkada to the Firestore database.
     """
     logger.info("Syncing Verkada user groups...")
-    verkada_org_id = verkada_bot_user_info.get('org_id')
-    verkada_bot_user_id = verkada_bot_user_info.get('user_id')
-    verkada_bot_headers = verkada_bot_user_info.get('auth_headers')
 
-    def fetch_verkada_user_groups(verkada_org_id, verkada_bot_user_id):
+    def fetch_verkada_user_groups():
         """
-        Fetches user groups from Verkada.
+        Reads the user groups from the org's inventory snapshot.
         """
-        url = f"https://vauth.command.verkada.com/__v/webbpulse/security_entity_group/list"
-        payload = {
-            "organizationId": verkada_org_id,
-            "includeMembers": False,
-            "includeMemberCount": False,
-        }
-        response = requests_with_retry(
-            "post",
-            url=url,
-            headers=verkada_bot_headers,
-            json=payload
-        )
-        user_groups = response.json().get("securityEntityGroup", [])
+        snapshot = get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=(SECTION_USER_GROUPS,), deadline=deadline,
+                                          http_counts=http_counts)
+        user_groups = snapshot.get(SECTION_USER_GROUPS)
+        if user_groups is None:
+            raise RuntimeError("User groups could not be fetched from Verkada.")
         logger.info(f"Fetched {len(user_groups)} user groups from Verkada.")
         if not user_groups:
             logger.warning("No user groups found in the response.")
-            return []
-        return [
-            {
-                "groupId": group.get("entityGroupId"),
-                "groupName": group.get("name"),
-            }
-            for group in user_groups
-            if group.get("entityGroupId") and group.get("name") is not None
-        ]
+        return user_groups
     def update_firestore_with_user_groups(org_id, new_user_groups):
         """
         Updates Firestore with the fetched user groups.
@@ -79,7 +59,7 @@ def sync_verkada_user_groups(org_id, verkada_bot_user_info):
         }, merge=True)
 
     # Fetch user groups from Verkada
-    user_groups = fetch_verkada_user_groups(verkada_org_id, verkada_bot_user_id)
+    user_groups = fetch_verkada_user_groups()
 
     # Update Firestore with the fetched user groups
     update_firestore_with_user_groups(org_id, user_groups)
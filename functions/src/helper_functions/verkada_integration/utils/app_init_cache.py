@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Dict, Optional
+from src.shared import logger
+from src.helper_functions.verkada_integration.utils.retry_policy import READ_POLICY
+from src.helper_functions.verkada_integration.utils.json_stream import stream_response_members
+
+# How long a fetched app/v2/init payload is reused. Long enough to cover one
+# sync run (grants, device ids, site ids), short enough that the next
+# scheduled run always sees fresh data.
+APP_INIT_CACHE_TTL_SECONDS = 120.0
+# None of the callers need the bot user's permissions, which are a large part of the payload.
+APP_INIT_PAYLOAD = {"fieldsToSkip": ["permissions"]}
+# The top-level arrays callers read. Everything else in the payload is skipped while streaming.
+APP_INIT_KEYS = ('cameras', 'cameraGroups')
+
+_entries: Dict[tuple, '_AppInitEntry'] = {}
+_entries_lock = threading.Lock()
+_stats = {'fetches': 0, 'hits': 0, 'sharedInFlight': 0, 'errors': 0}
+
+
+class _AppInitEntry:
+    """One fetch of the init payload. Waiters block on `done` until the fetching thread finishes."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data: Optional[dict] = None
+        self.error: Optional[Exception] = None
+        self.fetched_at = 0.0
+
+
+def get_verkada_app_init(verkada_client, max_age: float = APP_INIT_CACHE_TTL_SECONDS) -> dict:
+    """
+    Returns the app/v2/init payload for the client's Verkada org, reduced to
+    the arrays in APP_INIT_KEYS. The response is decoded as it streams in and
+    the rest of the document is never materialized.
+
+    The payload is cached for max_age seconds. If another thread is already
+    fetching it, the caller waits for that fetch and shares its result
+    instead of downloading it again. Failed fetches are not cached.
+
+    The returned dict is shared between callers and must not be modified.
+
+    Args:
+        verkada_client (VerkadaClient): The client for the Verkada org.
+        max_age (float, optional): Maximum age in seconds of a cached payload.
+
+    Returns:
+        dict: APP_INIT_KEYS key -> list of elements, for the keys present.
+
+    Raises:
+        RequestException: If the fetch fails after retries.
+        ValueError: If the response is not valid JSON.
+    """
+    key = (verkada_client.org_id, verkada_client.org_name)
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.done.is_set() and time.monotonic() - entry.fetched_at < max_age:
+            _stats['hits'] += 1
+            return entry.data
+        if entry is not None and not entry.done.is_set():
+            _stats['sharedInFlight'] += 1
+            is_leader = False
+        else:
+            entry = _AppInitEntry()
+            _entries[key] = entry
+            _stats['fetches'] += 1
+            is_leader = True
+
+    if not is_leader:
+        entry.done.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.data
+
+    try:
+        init_url = f"https://vappinit.command.verkada.com/__v/{verkada_client.org_name}/app/v2/init"
+
+        def decode(response):
+            init_data = {}
+            for member_key, element in stream_response_members(response, APP_INIT_KEYS):
+                init_data.setdefault(member_key, []).append(element)
+            return init_data
+
+        # A connection dropped mid-body is retried along with the request
+        entry.data = verkada_client.stream('post', init_url, decode, json=APP_INIT_PAYLOAD, policy=READ_POLICY)
+        entry.fetched_at = time.monotonic()
+        return entry.data
+    except Exception as e:
+        entry.error = e
+        with _entries_lock:
+            _stats['errors'] += 1
+            if _entries.get(key) is entry:
+                del _entries[key]
+        raise
+    finally:
+        entry.done.set()
+
+
+def invalidate_verkada_app_init(verkada_org_id: str) -> None:
+    """
+    Drops the cached init payload for a Verkada org, e.g. after devices were
+    moved between sites. A fetch already in flight is left to finish.
+    """
+    with _entries_lock:
+        for key in [key for key, entry in _entries.items() if key[0] == verkada_org_id and entry.done.is_set()]:
+            del _entries[key]
+
+
+def get_app_init_cache_stats() -> dict:
+    """Returns counters for the init payload cache: fetches made and fetches avoided."""
+    with _entries_lock:
+        return dict(_stats)
+
+
+def log_app_init_cache_stats() -> None:
+    """Logs the init payload cache counters."""
+    logger.info(f"Verkada app init cache: {get_app_init_cache_stats()}")
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from typing import Any, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from src.shared import logger
+from src.helper_functions.verkada_integration.utils.rate_limiter import get_host_limiter
+from src.helper_functions.verkada_integration.utils.concurrency_controller import AIMD_MAX_LIMIT
+from src.helper_functions.verkada_integration.utils.retry_policy import RetryPolicy, compute_backoff, default_policy_for_method
+from src.helper_functions.verkada_integration.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from src.helper_functions.verkada_integration.utils.json_codec import ACCEPT_ENCODING, encode_json_body
+from src.helper_functions.verkada_integration.utils.http_metrics import get_endpoint_template, record_attempt, record_call
+from src.helper_functions.verkada_integration.utils.deadline import MIN_REQUEST_SECONDS, DeadlineExceeded
+
+# Total operations one fan-out keeps in flight, across all Verkada hosts.
+# Per host, the shared adaptive limit in rate_limiter decides.
+ASYNC_MAX_IN_FLIGHT = 200
+# Keep-alive connections httpx holds open, matching the adaptive limit's ceiling.
+ASYNC_KEEPALIVE_CONNECTIONS = AIMD_MAX_LIMIT
+
+
+class VerkadaRequest(NamedTuple):
+    """
+    A single Verkada API call to run in an async fan-out.
+
+    Attributes:
+        method (str): The HTTP method.
+        url (str): The URL for the request.
+        json (Any): The JSON payload, if any.
+        policy (RetryPolicy): How the call is retried. Defaults to one chosen from the method.
+        context (Any): Caller data (e.g. the device ID) handed back with the result.
+    """
+    method: str
+    url: str
+    json: Any = None
+    policy: Optional[RetryPolicy] = None
+    context: Any = None
+
+
+class VerkadaRequestResult(NamedTuple):
+    request: VerkadaRequest
+    response: Optional[httpx.Response]
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _is_retryable(exc: httpx.HTTPError, policy: RetryPolicy) -> bool:
+    """httpx counterpart of retry_policy.is_retryable."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in policy.retry_statuses
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return policy.retry_read_errors
+    return False
+
+
+class AsyncVerkadaClient:
+    """
+    asyncio client for one Verkada org, built on httpx.
+
+    Concurrency is bounded by a global semaphore and, per host, by the same
+    adaptive limit and token bucket the threaded client uses, so async and
+    threaded callers share one concurrency and rate ceiling. Every attempt
+    checks the same circuit breakers so an open circuit fails fast for both. Use as an async
+    context manager within a single event loop.
+    """
+
+    def __init__(self, verkada_bot_user_info: dict, retry_budget=None, deadline=None,
+                 max_in_flight: int = ASYNC_MAX_IN_FLIGHT, http_counts=None):
+        self.org_id = verkada_bot_user_info.get('org_id')
+        self.org_name = verkada_bot_user_info.get('org_name') or verkada_bot_user_info.get('orgVerkadaOrgShortName')
+        self.auth_headers = dict(verkada_bot_user_info.get('auth_headers') or {})
+        self.retry_budget = retry_budget
+        self.deadline = deadline
+        self.http_counts = http_counts
+        self.max_in_flight = max_in_flight
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._client = httpx.AsyncClient(
+            headers={**self.auth_headers, 'Accept-Encoding': ACCEPT_ENCODING},
+            timeout=30,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=ASYNC_KEEPALIVE_CONNECTIONS),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+
+    async def request(self, method: str, url: str, policy: Optional[RetryPolicy] = None, **kwargs) -> httpx.Response:
+        """
+        Sends a request with the same retry semantics as requests_with_retry.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL for the request.
+            policy (RetryPolicy, optional): How the call is retried.
+            **kwargs: Additional arguments for httpx (e.g. json, timeout).
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPError: If the request fails permanently or retries are exhausted.
+            CircuitOpenError: If the endpoint family's circuit is open.
+            DeadlineExceeded: If the run's deadline leaves no time to start the request.
+        """
+        if policy is None:
+            policy = default_policy_for_method(method)
+        host = urlparse(url).hostname
+        limiter = get_host_limiter(host, self.org_id)
+        endpoint = get_endpoint_template(url)
+        breaker = get_circuit_breaker(url, self.org_id)
+        payload = kwargs.pop('json', None)
+        if payload is not None:
+            kwargs['content'], body_headers = encode_json_body(payload)
+            kwargs['headers'] = {**body_headers, **(kwargs.get('headers') or {})}
+
+        bytes_out = len(kwargs.get('content') or b'')
+
+        async def send_attempt():
+            sent_at = time.monotonic()
+            try:
+                response = await self._client.request(method.upper(), url, **kwargs)
+            except httpx.HTTPError as e:
+                record_attempt(self.org_id, method, url, type(e).__name__, time.monotonic() - sent_at, bytes_out, http_counts=self.http_counts)
+                raise
+            record_attempt(self.org_id, method, url, response.status_code, time.monotonic() - sent_at, bytes_out, len(response.content),
+                           http_counts=self.http_counts)
+            return response
+
+        started_at = time.monotonic()
+        attempt = 0
+        succeeded = False
+        try:
+            while True:
+                attempt += 1
+                # The deadline is checked first, so a request it stops never holds a half-open probe slot
+                if self.deadline is not None:
+                    try:
+                        kwargs['timeout'] = self.deadline.request_timeout(30)
+                    except DeadlineExceeded:
+                        self.deadline.skip(f"{method.upper()} {get_endpoint_template(url)}")
+                        attempt -= 1
+                        raise
+                if not breaker.allow_request():
+                    breaker.record_skip(method, url, payload)
+                    logger.warning(f"Circuit open for {url}, skipping request. Method: {method}")
+                    attempt -= 1
+                    raise CircuitOpenError(f"Circuit open for {url}")
+                try:
+                    # Take the per-host slot first so a busy host cannot tie up global slots.
+                    async with limiter.acquire_async(endpoint) as slot:
+                        async with self._semaphore:
+                            response = await send_attempt()
+                        slot.status = response.status_code
+                    if response.status_code == 400 and response.text == 'siteId and currentSiteId are the same':
+                        response.status_code = 200
+                    response.raise_for_status()
+                    breaker.record_outcome(None)
+                    succeeded = True
+                    return response
+                except httpx.HTTPError as e:
+                    breaker.record_outcome(e)
+                    if not _is_retryable(e, policy):
+                        logger.error(f"Request failed with non-retryable error ({e}). URL: {url}, Method: {method}")
+                        raise
+                    if attempt >= policy.max_attempts:
+                        logger.error(f"Request failed after {attempt} attempts ({e}). URL: {url}, Method: {method}")
+                        raise
+                    sleep_for = compute_backoff(attempt, policy, e)
+                    if time.monotonic() - started_at + sleep_for > policy.max_elapsed:
+                        logger.error(f"Request failed ({e}) and retrying would exceed the {policy.max_elapsed}s budget. URL: {url}, Method: {method}")
+                        raise
+                    if self.retry_budget is not None and not self.retry_budget.try_consume():
+                        logger.error(f"Request failed ({e}) and the caller's retry budget is exhausted. URL: {url}, Method: {method}")
+                        raise
+                    if self.deadline is not None and sleep_for + MIN_REQUEST_SECONDS > self.deadline.remaining():
+                        logger.error(f"Request failed ({e}) and the run's deadline leaves no time to retry. URL: {url}, Method: {method}")
+                        raise
+                    logger.warning(f"Request failed ({e}). Retrying ({attempt}/{policy.max_attempts}, {policy.name}) in {sleep_for:.2f} second(s)... URL: {url}, Method: {method}")
+                    await asyncio.sleep(sleep_for)
+                except BaseException:
+                    # The attempt ended without an outcome to record, e.g. it was cancelled
+                    breaker.release_probe()
+                    raise
+        finally:
+            record_call(self.org_id, method, url, attempt, succeeded, http_counts=self.http_counts)
+
+    async def run(self, verkada_request: VerkadaRequest) -> VerkadaRequestResult:
+        """Runs one VerkadaRequest, capturing the error instead of raising it."""
+        try:
+            response = await self.request(verkada_request.method, verkada_request.url,
+                                          policy=verkada_request.policy, json=verkada_request.json)
+            return VerkadaRequestResult(verkada_request, response, None)
+        except Exception as e:
+            return VerkadaRequestResult(verkada_request, None, e)
+
+
+def run_verkada_requests(verkada_bot_user_info: dict, verkada_requests: List[VerkadaRequest], retry_budget=None, deadline=None,
+                         http_counts=None) -> List[VerkadaRequestResult]:
+    """
+    Runs Verkada API calls concurrently on an event loop and waits for all of them.
+
+    Meant to be called from synchronous function code: it starts its own
+    event loop, fans the requests out through an AsyncVerkadaClient and
+    returns once every request has succeeded or failed.
+
+    Args:
+        verkada_bot_user_info (dict): The Verkada bot user info for the org.
+        verkada_requests (List[VerkadaRequest]): The calls to make.
+        retry_budget (RetryBudget, optional): Caller-owned cap on total retries.
+        deadline (Deadline, optional): The run's deadline. Requests not started
+            before it fail with DeadlineExceeded and are recorded as skipped.
+        http_counts (RunHttpCounts, optional): The caller's run HTTP counts.
+
+    Returns:
+        List[VerkadaRequestResult]: One result per request, in request order.
+    """
+    if not verkada_requests:
+        return []
+
+    async def _run_all():
+        async with AsyncVerkadaClient(verkada_bot_user_info, retry_budget=retry_budget, deadline=deadline, http_counts=http_counts) as client:
+            return await asyncio.gather(*(client.run(verkada_request) for verkada_request in verkada_requests))
+
+    return list(asyncio.run(_run_all()))
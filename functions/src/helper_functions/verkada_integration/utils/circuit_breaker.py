@@ -0,0 +1,220 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from firebase_admin import firestore
+from requests.exceptions import RequestException
+from src.shared import db, logger
+
+# Consecutive failed attempts against one endpoint family before its circuit opens.
+BREAKER_FAILURE_THRESHOLD = 5
+# Seconds an open circuit fails fast before letting a probe request through.
+BREAKER_RECOVERY_SECONDS = 60.0
+# Probe requests allowed at once while half-open.
+BREAKER_HALF_OPEN_MAX_CALLS = 1
+# Skipped requests remembered per Verkada org until a job saves them.
+MAX_SKIPPED_OPERATIONS = 500
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_breakers: Dict[tuple, 'CircuitBreaker'] = {}
+_skipped_operations: Dict[Optional[str], List[dict]] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(RequestException):
+    """Raised instead of sending a request whose endpoint family's circuit is open."""
+
+
+def is_breaker_failure(exc: Exception) -> bool:
+    """
+    Whether a failed attempt means the backend itself is unhealthy. Connection
+    errors, timeouts and 5xx responses count; 4xx responses (including 429)
+    show the backend is up and answering.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        return response.status_code >= 500
+    return True
+
+
+def get_endpoint_family(url: str) -> tuple:
+    """
+    Returns (subdomain, endpoint family) for a Verkada URL, e.g.
+    'https://vsensor.command.verkada.com/__v/acme/devices/list' -> ('vsensor', 'devices').
+    """
+    parsed = urlparse(url)
+    subdomain = (parsed.hostname or '').split('.')[0]
+    path_parts = [part for part in parsed.path.split('/') if part]
+    # Verkada paths are /__v/{org short name}/{family}/...
+    if len(path_parts) >= 3 and path_parts[0] == '__v':
+        family = path_parts[2]
+    else:
+        family = path_parts[0] if path_parts else ''
+    return subdomain, family
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one Verkada endpoint family and org.
+
+    Closed: requests flow and consecutive failures are counted. Open: requests
+    fail fast with CircuitOpenError until the recovery timeout passes.
+    Half-open: a limited number of probe requests are let through; a success
+    closes the circuit and a failure opens it again.
+    """
+
+    def __init__(self, key: tuple, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_seconds: float = BREAKER_RECOVERY_SECONDS,
+                 half_open_max_calls: int = BREAKER_HALF_OPEN_MAX_CALLS):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Returns whether a request may be sent now, reserving a probe slot when half-open."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_seconds:
+                    self.skipped += 1
+                    return False
+                self.state = HALF_OPEN
+                self.half_open_calls = 0
+                logger.info(f"Circuit {self.key} half-open, probing.")
+            if self.state == HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.skipped += 1
+                    return False
+                self.half_open_calls += 1
+            return True
+
+    def release_probe(self) -> None:
+        """Gives back a probe slot reserved by allow_request when no request was sent or no outcome came back."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.key} closed.")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                logger.warning(f"Circuit {self.key} opened after {self.consecutive_failures} consecutive failures.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.half_open_calls = 0
+
+    def record_outcome(self, exc: Optional[Exception]) -> None:
+        """Records one attempt: exc is None on success, else the attempt's error."""
+        if exc is None or not is_breaker_failure(exc):
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_skip(self, method: str, url: str, payload=None) -> None:
+        """Remembers a request that was not sent because this circuit was open."""
+        with _breakers_lock:
+            skipped_operations = _skipped_operations.setdefault(self.key[2], [])
+            if len(skipped_operations) >= MAX_SKIPPED_OPERATIONS:
+                return
+            skipped_operations.append({
+                'method': method.lower(),
+                'url': url,
+                'payload': payload,
+                'endpointFamily': '/'.join(self.key[:2]),
+                'skippedAt': time.time(),
+            })
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'state': self.state, 'consecutiveFailures': self.consecutive_failures, 'skipped': self.skipped}
+
+
+def get_circuit_breaker(url: str, verkada_org_id: Optional[str]) -> CircuitBreaker:
+    """
+    Returns the process-wide breaker for a URL's endpoint family and Verkada org.
+    Breakers are shared by every thread pool and event loop in the instance.
+
+    Args:
+        url (str): The request URL.
+        verkada_org_id (str): The Verkada organization ID the request is made for.
+
+    Returns:
+        CircuitBreaker: The shared breaker.
+    """
+    key = get_endpoint_family(url) + (verkada_org_id,)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key)
+                _breakers[key] = breaker
+    return breaker
+
+
+def pop_skipped_operations(verkada_org_id: Optional[str]) -> List[dict]:
+    """Returns and clears the requests skipped by open circuits for a Verkada org."""
+    with _breakers_lock:
+        return _skipped_operations.pop(verkada_org_id, [])
+
+
+def log_breaker_stats(verkada_org_id: Optional[str] = None) -> None:
+    """Logs every circuit that is not closed or has skipped requests, optionally for one Verkada org."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        if verkada_org_id is not None and breaker.key[2] != verkada_org_id:
+            continue
+        stats = breaker.stats()
+        if stats['state'] != CLOSED or stats['skipped']:
+            logger.info(f"Verkada circuit {'/'.join(breaker.key[:2])}: {stats}")
+
+
+def save_skipped_operations(org_id: str, verkada_org_id: Optional[str], job_name: str) -> int:
+    """
+    Records the operations a job skipped because of open circuits, so an admin
+    can see what a run left undone. Jobs do not replay the record: each run
+    recomputes its operations from current data, which sends the skipped ones
+    again if they are still needed. Overwrites the job's previous record, so a
+    clean run clears it.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        verkada_org_id (str): The Verkada organization ID.
+        job_name (str): The syncer or cleaner that skipped the operations.
+
+    Returns:
+        int: The number of skipped operations recorded.
+    """
+    skipped_operations = pop_skipped_operations(verkada_org_id)
+    try:
+        db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaSkippedOperations').set({
+            job_name: {
+                'operations': skipped_operations,
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+            }
+        }, merge=True)
+    except Exception as e:
+        logger.error(f"Error saving skipped Verkada operations for organization {org_id}: {e}")
+    if skipped_operations:
+        logger.warning(f"{job_name} skipped {len(skipped_operations)} Verkada operations for organization {org_id} because circuits were open.")
+    return len(skipped_operations)
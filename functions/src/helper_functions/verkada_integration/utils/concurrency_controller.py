@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Union
+from src.shared import logger
+
+# Concurrency a (host, Verkada org) pair starts at, and the range it moves in.
+AIMD_INITIAL_LIMIT = 8
+AIMD_MIN_LIMIT = 1
+AIMD_MAX_LIMIT = 32
+# Added to the limit over one limit's worth of healthy responses, i.e. about one step per round trip.
+AIMD_INCREASE = 1.0
+# Multiplier applied to the limit on a 429, 5xx, transport error or latency spike.
+AIMD_DECREASE_FACTOR = 0.5
+# Minimum seconds between decreases, so one burst of errors only halves the limit once.
+AIMD_DECREASE_COOLDOWN = 1.0
+# A response is a latency spike when it takes this many times the endpoint's usual latency,
+# and at least AIMD_SPIKE_MIN_SECONDS.
+AIMD_SPIKE_FACTOR = 3.0
+AIMD_SPIKE_MIN_SECONDS = 1.0
+# Weight of a new sample in an endpoint's usual-latency average.
+AIMD_LATENCY_SMOOTHING = 0.1
+# Concurrency level changes kept for the stats.
+AIMD_HISTORY_SIZE = 50
+
+
+def is_congestion_signal(status: Union[int, str, None]) -> bool:
+    """
+    True for outcomes that mean Verkada is overloaded: 429s, 5xx responses
+    and transport errors (given as the exception name).
+    """
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return status is not None
+
+
+class AIMDController:
+    """
+    Thread-safe adaptive concurrency limit for one (host, Verkada org) pair.
+
+    The limit grows additively while responses are healthy and at least half
+    of it is in use, and is cut
+    multiplicatively on 429s, 5xx responses, transport errors or latency
+    spikes. Threaded callers block in acquire() and event-loop callers await
+    acquire_async(); freed slots are handed to waiters in arrival order.
+    """
+
+    def __init__(self, name: str, initial_limit: float = AIMD_INITIAL_LIMIT,
+                 min_limit: float = AIMD_MIN_LIMIT, max_limit: float = AIMD_MAX_LIMIT):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.started_at = time.monotonic()
+        self._last_decrease_at = 0.0
+        self._usual_latency: Dict[str, float] = {}
+        self._history = deque([(0.0, int(self.limit), 'start')], maxlen=AIMD_HISTORY_SIZE)
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _grant_waiters(self) -> List[Callable]:
+        """Takes slots for queued waiters while the limit allows. Call with the lock held."""
+        wakers = []
+        while self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            wakers.append(self._waiters.popleft())
+        return wakers
+
+    def acquire(self) -> None:
+        """Blocks until an in-flight slot is free."""
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            granted = threading.Event()
+            self._waiters.append(granted.set)
+        granted.wait()
+
+    async def acquire_async(self) -> None:
+        """Event-loop counterpart of acquire()."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            granted = loop.create_future()
+            self._waiters.append(lambda: loop.call_soon_threadsafe(self._hand_over, granted))
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # Cancelled after the slot was handed over
+                self.release()
+            raise
+
+    def _hand_over(self, granted: asyncio.Future) -> None:
+        if granted.cancelled():
+            # The waiter gave up before its slot arrived
+            self.release()
+        else:
+            granted.set_result(None)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            wakers = self._grant_waiters()
+        for wake in wakers:
+            wake()
+
+    def record_outcome(self, status: Union[int, str, None], latency: float, endpoint: str = '') -> None:
+        """
+        Adjusts the limit after a response (or transport error) on this host.
+
+        Args:
+            status (int | str): The response status code, or the exception name.
+            latency (float): Seconds the request held its slot.
+            endpoint (str, optional): The endpoint template, so latency is compared
+                with that endpoint's own usual latency.
+        """
+        with self._lock:
+            usual = self._usual_latency.get(endpoint)
+            spike = usual is not None and latency > max(usual * AIMD_SPIKE_FACTOR, AIMD_SPIKE_MIN_SECONDS)
+            congested = is_congestion_signal(status)
+            if not congested:
+                self._usual_latency[endpoint] = latency if usual is None else usual + AIMD_LATENCY_SMOOTHING * (latency - usual)
+            previous = int(self.limit)
+            now = time.monotonic()
+            if congested or spike:
+                if now - self._last_decrease_at < AIMD_DECREASE_COOLDOWN:
+                    return
+                self._last_decrease_at = now
+                self.limit = max(self.min_limit, self.limit * AIMD_DECREASE_FACTOR)
+                self.decreases += 1
+                reason = f"status {status}" if congested else f"latency spike {latency:.2f}s on {endpoint}"
+            elif self.in_flight * 2 >= self.limit:
+                # Only grow while the limit is actually in use, so idle hosts do not drift to the ceiling
+                self.limit = min(self.max_limit, self.limit + AIMD_INCREASE / self.limit)
+                reason = 'healthy'
+            else:
+                return
+            current = int(self.limit)
+            if current == previous:
+                return
+            if current > previous:
+                self.increases += 1
+            self._history.append((round(now - self.started_at, 1), current, reason))
+            wakers = self._grant_waiters()
+        log = logger.info if current > previous else logger.warning
+        log(f"Verkada concurrency for {self.name}: {previous} -> {current} ({reason}).")
+        for wake in wakers:
+            wake()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'concurrencyLimit': int(self.limit),
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'concurrencyHistory': [f"{at}s:{level}" for at, level, _ in self._history],
+            }
@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Dict
+from firebase_admin import firestore
+from requests.exceptions import RequestException
+from src.shared import db, logger
+
+# timeout_sec of the scheduled functions and long-running callables.
+FUNCTION_TIMEOUT_SECONDS = 540
+# Kept free at the end of the budget to flush pending Firestore batches and record what was skipped.
+DEADLINE_RESERVE_SECONDS = 45
+# An HTTP attempt is not started with less time than this left.
+MIN_REQUEST_SECONDS = 2.0
+
+
+class DeadlineExceeded(RequestException):
+    """Raised instead of starting a Verkada request the run has no time left for."""
+
+
+class Deadline:
+    """
+    The time a function invocation has left, created at function entry and
+    passed down through the syncers, cleaners and HTTP layer.
+
+    Work stops being started once the deadline is reached, which is
+    DEADLINE_RESERVE_SECONDS before the function would be killed, so pending
+    writes can still be flushed. Work that was not started is recorded with
+    skip() and saved per org with save_deadline_skips().
+    """
+
+    def __init__(self, seconds: float, reserve: float = DEADLINE_RESERVE_SECONDS):
+        self.stop_at = time.monotonic() + max(0.0, seconds - reserve)
+        self._skipped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_function_timeout(cls, timeout_sec: float = FUNCTION_TIMEOUT_SECONDS) -> 'Deadline':
+        """Returns the deadline for a function invocation that started now."""
+        return cls(timeout_sec)
+
+    def remaining(self) -> float:
+        """Seconds left before work must stop being started."""
+        return max(0.0, self.stop_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def request_timeout(self, timeout: float) -> float:
+        """
+        Trims an HTTP timeout to the time left.
+
+        Raises:
+            DeadlineExceeded: If there is too little time left to start a request.
+        """
+        remaining = self.remaining()
+        if remaining < MIN_REQUEST_SECONDS:
+            raise DeadlineExceeded(f"Deadline reached with {remaining:.1f}s left")
+        if isinstance(timeout, tuple):
+            return tuple(min(part, remaining) if part is not None else remaining for part in timeout)
+        return min(timeout, remaining) if timeout is not None else remaining
+
+    def skip(self, description: str) -> None:
+        """Records a piece of work that was not started because the deadline was reached."""
+        with self._lock:
+            first = description not in self._skipped
+            self._skipped[description] = self._skipped.get(description, 0) + 1
+        if first:
+            logger.warning(f"Deadline reached, skipping: {description}")
+
+    def pop_skipped(self) -> Dict[str, int]:
+        """Returns and clears the skipped work, as description -> count."""
+        with self._lock:
+            skipped, self._skipped = self._skipped, {}
+        return skipped
+
+
+def save_deadline_skips(org_id: str, job_name: str, skipped: Dict[str, int]) -> None:
+    """
+    Records the work a job's run skipped for an org because it ran out of
+    time, next to the operations skipped by open circuits. Overwrites the
+    job's previous record, so a complete run clears it.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        job_name (str): The function that ran the job.
+        skipped (Dict[str, int]): Skipped work as description -> count, from Deadline.pop_skipped().
+    """
+    if skipped:
+        logger.warning(f"{job_name} ran out of time for organization {org_id}, skipped: {skipped}")
+    try:
+        db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaSkippedOperations').set({
+            job_name: {
+                'deadlineSkipped': skipped,
+                'deadlineUpdatedAt': firestore.SERVER_TIMESTAMP,
+            }
+        }, merge=[f"{job_name}.deadlineSkipped", f"{job_name}.deadlineUpdatedAt"])
+    except Exception as e:
+        logger.error(f"Error saving deadline skips for organization {org_id}: {e}")
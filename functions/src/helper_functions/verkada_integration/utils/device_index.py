@@ -0,0 +1,140 @@
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence
+from google.cloud.firestore_v1.field_path import FieldPath
+from src.helper_functions.devices.device_doc_ids import device_doc_id, normalize_serial_number
+from src.helper_functions.verkada_integration.utils.device_tombstones import VERKADA_REMOVED_FIELD
+from src.shared import db, logger
+
+# Fields read for each device when indexing an org's devices collection.
+DEVICE_INDEX_FIELDS = (
+    'deviceSerialNumber',
+    'deviceVerkadaDeviceId',
+    'deviceVerkadaDeviceType',
+    'deviceVerkadaSiteId',
+    'deviceVerkadaNewAlarmsSystemId',
+    VERKADA_REMOVED_FIELD,
+)
+# Documents fetched per query while scanning the devices collection.
+DEVICE_INDEX_PAGE_SIZE = 1000
+
+
+class IndexedDevice(NamedTuple):
+    """A device document's reference and its indexed fields."""
+    reference: object
+    fields: dict
+
+
+class DeviceIndex:
+    """
+    In-memory serial number -> IndexedDevice index of an org's devices,
+    built from one paged scan of the devices collection. Serials are matched
+    in their normalized form, the one device_doc_id keys documents by, so
+    'abc123 ' and 'ABC123' find the same device. Read-only once built, so it
+    can be shared by concurrent sync tasks.
+    """
+
+    def __init__(self, devices: Dict[str, IndexedDevice], pages: int):
+        self._devices = devices
+        self.pages = pages
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def get(self, serial_number: str) -> Optional[IndexedDevice]:
+        return self._devices.get(normalize_serial_number(serial_number))
+
+    def __iter__(self) -> Iterator[IndexedDevice]:
+        return iter(self._devices.values())
+
+
+def iter_device_pages(org_id: str, fields: Sequence[str] = DEVICE_INDEX_FIELDS,
+                      page_size: int = DEVICE_INDEX_PAGE_SIZE) -> Iterator[list]:
+    """
+    Yields an org's device documents a page at a time, reading only the given
+    fields. Pages are ordered by document ID, so each query resumes after the
+    last document of the previous one.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        fields (Sequence[str], optional): The fields to read.
+        page_size (int, optional): Documents per query.
+
+    Yields:
+        list: DocumentSnapshots of one page.
+    """
+    query = (db.collection('organizations').document(org_id).collection('devices')
+             .select(list(fields))
+             .order_by(FieldPath.document_id())
+             .limit(page_size))
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc is not None else query
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_doc = page[-1]
+
+
+def build_device_index(org_id: str, fields: Sequence[str] = DEVICE_INDEX_FIELDS) -> DeviceIndex:
+    """
+    Scans an org's devices collection once and indexes it by serial number.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        fields (Sequence[str], optional): The fields kept for each device.
+
+    Returns:
+        DeviceIndex: The index.
+    """
+    devices = {}
+    pages = 0
+    for page in iter_device_pages(org_id, fields):
+        pages += 1
+        for device_doc in page:
+            device_fields = device_doc.to_dict() or {}
+            serial_number = device_fields.get('deviceSerialNumber')
+            if not isinstance(serial_number, str) or not serial_number.strip():
+                continue
+            serial_number = normalize_serial_number(serial_number)
+            device = IndexedDevice(device_doc.reference, device_fields)
+            if serial_number in devices:
+                kept, ignored = devices[serial_number], device
+                # Prefer the document keyed by the serial, which is the one new devices are written to
+                if device_doc.id == device_doc_id(serial_number):
+                    kept, ignored = device, kept
+                logger.warning(f"Duplicate device documents for SN {serial_number} in organization {org_id}; "
+                               f"using {kept.reference.id}, ignoring {ignored.reference.id}.")
+                devices[serial_number] = kept
+                continue
+            devices[serial_number] = device
+    logger.info(f"Indexed {len(devices)} devices for organization {org_id} in {pages} page(s).")
+    return DeviceIndex(devices, pages)
+
+
+def build_verkada_id_index(org_id: str, fields: Sequence[str] = ('deviceVerkadaDeviceId', 'deviceVerkadaSiteId')) -> Dict[str, IndexedDevice]:
+    """
+    Scans an org's devices collection once and indexes the devices linked to
+    Verkada by their Verkada device ID.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        fields (Sequence[str], optional): The fields kept for each device.
+
+    Returns:
+        Dict[str, IndexedDevice]: Verkada device ID -> device.
+    """
+    devices = {}
+    for page in iter_device_pages(org_id, fields):
+        for device_doc in page:
+            device_fields = device_doc.to_dict() or {}
+            verkada_device_id = device_fields.get('deviceVerkadaDeviceId')
+            if not verkada_device_id:
+                continue
+            if verkada_device_id in devices:
+                logger.warning(f"Duplicate device documents for Verkada device {verkada_device_id} in organization {org_id}; using {devices[verkada_device_id].reference.id}.")
+                continue
+            devices[verkada_device_id] = IndexedDevice(device_doc.reference, device_fields)
+    logger.info(f"Indexed {len(devices)} Verkada-linked devices for organization {org_id}.")
+    return devices
@@ -0,0 +1,79 @@
+from collections import Counter
+from typing import Iterable, List, Set
+from firebase_admin import firestore
+from src.helper_functions.verkada_integration.utils.firestore_writes import FirestoreWriteEngine
+from src.shared import logger
+
+# Set on device documents whose Verkada device is no longer listed by Verkada (unclaimed or
+# removed). The device cleaners skip these, and the device sync clears it if the device comes back.
+VERKADA_REMOVED_FIELD = 'deviceVerkadaRemoved'
+VERKADA_REMOVED_AT_FIELD = 'deviceVerkadaRemovedAt'
+# A device type whose linked devices would mostly disappear in one run is left alone, since an
+# empty or truncated Verkada listing is likelier than a mass removal.
+TOMBSTONE_MAX_FRACTION = 0.5
+# ...unless only this few devices would be marked.
+TOMBSTONE_GUARD_MIN_DEVICES = 5
+
+
+def is_removed_from_verkada(device_data: dict) -> bool:
+    """Whether a device document is marked as no longer present in Verkada."""
+    return bool((device_data or {}).get(VERKADA_REMOVED_FIELD))
+
+
+def find_removed_devices(indexed_devices: Iterable, fetched_ids: Set[str], fetched_types: Set[str]) -> list:
+    """
+    Returns the Verkada-linked devices whose Verkada ID was not in this run's
+    listings. Only devices of types whose listing was fetched completely are
+    considered, and devices already marked are left out.
+
+    Args:
+        indexed_devices (Iterable[IndexedDevice]): The org's devices, from the device index.
+        fetched_ids (Set[str]): Every Verkada device ID listed by Verkada in this run.
+        fetched_types (Set[str]): The device types whose listing was fetched completely.
+
+    Returns:
+        list: The IndexedDevices to mark as removed.
+    """
+    linked = Counter()
+    removed_by_type = {}
+    for device in indexed_devices:
+        verkada_device_id = device.fields.get('deviceVerkadaDeviceId')
+        device_type = device.fields.get('deviceVerkadaDeviceType')
+        if not verkada_device_id or device_type not in fetched_types or is_removed_from_verkada(device.fields):
+            continue
+        linked[device_type] += 1
+        if str(verkada_device_id) not in fetched_ids:
+            removed_by_type.setdefault(device_type, []).append(device)
+
+    removed = []
+    for device_type, devices in removed_by_type.items():
+        if len(devices) > TOMBSTONE_GUARD_MIN_DEVICES and len(devices) / linked[device_type] > TOMBSTONE_MAX_FRACTION:
+            logger.warning(f"Not marking {len(devices)} of {linked[device_type]} {device_type} devices as removed from Verkada; "
+                           f"the listing may be incomplete.")
+            continue
+        removed.extend(devices)
+    return removed
+
+
+def mark_removed_devices(devices: List, description: str = 'removed device') -> int:
+    """
+    Marks devices as removed from Verkada through the bulk write engine.
+
+    Args:
+        devices (List[IndexedDevice]): The devices to mark.
+        description (str, optional): What the writes are, for the logs.
+
+    Returns:
+        int: The number of devices marked.
+    """
+    if not devices:
+        return 0
+    with FirestoreWriteEngine(description) as writes:
+        for device in devices:
+            writes.update(device.reference, {
+                VERKADA_REMOVED_FIELD: True,
+                VERKADA_REMOVED_AT_FIELD: firestore.SERVER_TIMESTAMP,
+            })
+    by_type = Counter(device.fields.get('deviceVerkadaDeviceType') for device in devices)
+    logger.info(f"Marked devices as removed from Verkada: {dict(by_type)}.")
+    return len(writes.succeeded)
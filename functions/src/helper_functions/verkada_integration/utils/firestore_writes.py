@@ -0,0 +1,117 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriteFailure, BulkWriterOptions, SendMode
+from src.shared import db, logger
+
+# Firestore's 500/50/5 guidance: start at 500 writes per second and grow by 50% every 5 minutes.
+# BulkWriter's rate limiter implements the ramp; this caps where it can get to.
+BULK_WRITE_INITIAL_OPS_PER_SECOND = 500
+BULK_WRITE_MAX_OPS_PER_SECOND = 10000
+# Attempts per document, including the first, for errors that are worth retrying.
+BULK_WRITE_MAX_ATTEMPTS = 5
+# gRPC status codes retried individually: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED, INTERNAL, UNAVAILABLE.
+BULK_WRITE_RETRYABLE_CODES = frozenset({4, 8, 10, 13, 14})
+# gRPC status code of a create whose document already exists.
+BULK_WRITE_ALREADY_EXISTS_CODE = 6
+# Failed documents listed in the log for each write session.
+BULK_WRITE_LOGGED_FAILURES = 10
+
+
+class WriteResult(NamedTuple):
+    """The outcome of one document write."""
+    path: str
+    succeeded: bool
+    attempts: int
+    error: Optional[str] = None
+    code: Optional[int] = None
+
+
+class FirestoreWriteEngine:
+    """
+    Writes many Firestore documents through a BulkWriter. Batches are committed
+    concurrently, throughput ramps up following Firestore's 500/50/5 guidance,
+    and a failed write is retried on its own instead of losing its whole batch.
+
+    Use as a context manager; leaving the block flushes every queued write, and
+    results holds one WriteResult per document path.
+
+        with FirestoreWriteEngine('site ids') as writes:
+            writes.update(device_ref, {'deviceVerkadaSiteId': site_id})
+        writes.succeeded
+    """
+
+    def __init__(self, description: str):
+        self.description = description
+        self.results: Dict[str, WriteResult] = {}
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = db.bulk_writer(options=BulkWriterOptions(
+            initial_ops_per_second=BULK_WRITE_INITIAL_OPS_PER_SECOND,
+            max_ops_per_second=BULK_WRITE_MAX_OPS_PER_SECOND,
+            mode=SendMode.parallel,
+            retry=BulkRetry.exponential,
+        ))
+        self._writer.on_write_result(self._on_write_result)
+        self._writer.on_write_error(self._on_write_error)
+
+    def __enter__(self) -> 'FirestoreWriteEngine':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def set(self, reference, data: dict, merge: bool = False) -> None:
+        self._writer.set(reference, data, merge=merge)
+
+    def create(self, reference, data: dict) -> None:
+        """Creates the document; fails with BULK_WRITE_ALREADY_EXISTS_CODE if it exists."""
+        self._writer.create(reference, data)
+
+    def update(self, reference, data: dict) -> None:
+        self._writer.update(reference, data)
+
+    def _on_write_result(self, reference, result, bulk_writer) -> None:
+        with self._lock:
+            attempts = self._attempts.pop(reference.path, 0) + 1
+            self.results[reference.path] = WriteResult(reference.path, True, attempts)
+
+    def _on_write_error(self, failure: BulkWriteFailure, bulk_writer) -> bool:
+        """Retries the document if its error is transient and it has attempts left."""
+        path = failure.operation.reference.path
+        # BulkWriter counts retries, starting at 0, so the attempts made include this one on top
+        attempts = failure.attempts + 1
+        if failure.code in BULK_WRITE_RETRYABLE_CODES and attempts < BULK_WRITE_MAX_ATTEMPTS:
+            with self._lock:
+                self._attempts[path] = attempts
+            return True
+        with self._lock:
+            self._attempts.pop(path, None)
+            self.results[path] = WriteResult(path, False, attempts, f"{failure.code}: {failure.message}", failure.code)
+        return False
+
+    def close(self) -> None:
+        """Flushes the queued writes, waits for them and logs a summary. Safe to call twice."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._writer.close()
+        except Exception as e:
+            logger.error(f"Error flushing {self.description} writes: {e}")
+        failed = self.failed
+        logger.info(f"Wrote {len(self.results) - len(failed)} of {len(self.results)} {self.description} documents.")
+        for result in failed[:BULK_WRITE_LOGGED_FAILURES]:
+            logger.error(f"Failed to write {result.path} after {result.attempts} attempt(s): {result.error}")
+        if len(failed) > BULK_WRITE_LOGGED_FAILURES:
+            logger.error(f"...and {len(failed) - BULK_WRITE_LOGGED_FAILURES} more failed {self.description} writes.")
+
+    @property
+    def succeeded(self) -> List[WriteResult]:
+        with self._lock:
+            return [result for result in self.results.values() if result.succeeded]
+
+    @property
+    def failed(self) -> List[WriteResult]:
+        with self._lock:
+            return [result for result in self.results.values() if not result.succeeded]
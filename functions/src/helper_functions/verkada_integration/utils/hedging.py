@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+from src.shared import logger
+from src.helper_functions.verkada_integration.utils.http_metrics import get_endpoint_template
+
+# Latency percentile of an endpoint's recent first attempts after which a second request is sent.
+HEDGE_PERCENTILE = 95.0
+# Samples an endpoint needs before its own percentile is trusted; until then HEDGE_DEFAULT_DELAY is used.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 2.0
+# Floor on the hedge delay, so a fast endpoint is not hedged on every scheduling hiccup.
+HEDGE_MIN_DELAY = 0.05
+# Recent latencies kept per endpoint.
+HEDGE_LATENCY_WINDOW = 200
+# Process-wide budget: hedges may be at most this fraction of hedgeable calls, plus a small allowance.
+HEDGE_BUDGET_RATIO = 0.1
+HEDGE_BUDGET_MIN = 3
+# Threads the hedged attempts run on; callers wait on them.
+HEDGE_MAX_WORKERS = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_endpoints: Dict[tuple, 'EndpointHedgeStats'] = {}
+_endpoints_lock = threading.Lock()
+
+
+def _percentile(samples, percentile: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Thread-safe cap on hedges across all Verkada calls in the process. A hedge
+    is allowed while hedges sent stay under HEDGE_BUDGET_RATIO of the hedgeable
+    calls seen, plus HEDGE_BUDGET_MIN, so a slow Verkada backend never sees
+    more than a fixed fraction of extra load.
+    """
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, min_hedges: int = HEDGE_BUDGET_MIN):
+        self.ratio = ratio
+        self.min_hedges = min_hedges
+        self.calls = 0
+        self.used = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_consume(self) -> bool:
+        with self._lock:
+            if self.used >= self.min_hedges + self.ratio * self.calls:
+                self.denied += 1
+                return False
+            self.used += 1
+            return True
+
+
+HEDGE_BUDGET = HedgeBudget()
+
+
+class EndpointHedgeStats:
+    """Recent latencies and hedge counters for one (method, endpoint template)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Time to the first attempt's response, whether or not it won; this is the unhedged latency.
+        self.primary_latencies = deque(maxlen=HEDGE_LATENCY_WINDOW)
+        # Time until the caller got a response, with hedging.
+        self.hedged_latencies = deque(maxlen=HEDGE_LATENCY_WINDOW)
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            if len(self.primary_latencies) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY
+            return max(HEDGE_MIN_DELAY, _percentile(self.primary_latencies, HEDGE_PERCENTILE))
+
+    def record_primary(self, latency: float) -> None:
+        with self._lock:
+            self.primary_latencies.append(latency)
+
+    def record_call(self, latency: float, hedged: bool, hedge_won: bool, budget_denied: bool) -> None:
+        with self._lock:
+            self.hedged_latencies.append(latency)
+            self.calls += 1
+            self.hedges_sent += hedged
+            self.hedge_wins += hedge_won
+            self.budget_denied += budget_denied
+
+    def summary(self) -> dict:
+        with self._lock:
+            primary_p99 = _percentile(self.primary_latencies, 99)
+            hedged_p99 = _percentile(self.hedged_latencies, 99)
+            return {
+                'calls': self.calls,
+                'hedgesSent': self.hedges_sent,
+                'hedgeWins': self.hedge_wins,
+                'budgetDenied': self.budget_denied,
+                'unhedgedP50Ms': round(_percentile(self.primary_latencies, 50) * 1000, 1) if primary_p99 is not None else None,
+                'unhedgedP99Ms': round(primary_p99 * 1000, 1) if primary_p99 is not None else None,
+                'hedgedP50Ms': round(_percentile(self.hedged_latencies, 50) * 1000, 1) if hedged_p99 is not None else None,
+                'hedgedP99Ms': round(hedged_p99 * 1000, 1) if hedged_p99 is not None else None,
+            }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix='verkada-hedge')
+    return _executor
+
+
+def _get_endpoint_stats(method: str, url: str) -> EndpointHedgeStats:
+    key = (method.upper(), get_endpoint_template(url))
+    stats = _endpoints.get(key)
+    if stats is None:
+        with _endpoints_lock:
+            stats = _endpoints.setdefault(key, EndpointHedgeStats())
+    return stats
+
+
+def _discard(future) -> None:
+    """Releases the connection held by a losing attempt once it returns."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def send_hedged(send: Callable, method: str, url: str, budget: HedgeBudget = HEDGE_BUDGET):
+    """
+    Sends one attempt of an idempotent request, and a second identical one if
+    the first has not answered within the endpoint's HEDGE_PERCENTILE latency.
+    The first response to arrive is returned; the other attempt is abandoned
+    and its connection released when it returns, since requests cannot abort
+    a request in flight. If one attempt raises, the other is still awaited.
+
+    Only use this for calls that are safe to send twice (GETs and list POSTs).
+
+    Args:
+        send (Callable): Sends the request once and returns the response.
+        method (str): The HTTP method, for the latency statistics.
+        url (str): The request URL, for the latency statistics.
+        budget (HedgeBudget, optional): The budget the second request is charged to.
+
+    Returns:
+        requests.Response: The first response to arrive.
+
+    Raises:
+        RequestException: If every attempt that was sent failed.
+    """
+    stats = _get_endpoint_stats(method, url)
+    budget.record_call()
+    executor = _get_executor()
+    started_at = time.monotonic()
+
+    def send_primary():
+        try:
+            return send()
+        finally:
+            stats.record_primary(time.monotonic() - started_at)
+
+    primary = executor.submit(send_primary)
+    pending = {primary}
+    hedge = None
+    budget_denied = False
+    done, _ = wait(pending, timeout=stats.hedge_delay())
+    if not done:
+        if budget.try_consume():
+            hedge = executor.submit(send)
+            pending.add(hedge)
+        else:
+            budget_denied = True
+
+    winner = None
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+            elif winner is None:
+                winner = future
+            else:
+                future.result().close()
+        if winner is not None:
+            break
+
+    for future in pending:
+        future.add_done_callback(_discard)
+    stats.record_call(time.monotonic() - started_at, hedge is not None, winner is not None and winner is hedge, budget_denied)
+    if winner is None:
+        raise error
+    if hedge is not None:
+        logger.info(f"Hedged {method.upper()} {get_endpoint_template(url)}, {'hedge' if winner is hedge else 'first attempt'} answered first.")
+    return winner.result()
+
+
+def get_hedge_stats() -> Dict[str, dict]:
+    """Returns the hedge counters and unhedged vs hedged latency percentiles per 'METHOD endpoint template'."""
+    with _endpoints_lock:
+        endpoints = dict(_endpoints)
+    return {f"{method} {template}": stats.summary() for (method, template), stats in endpoints.items()}
+
+
+def log_hedge_stats() -> None:
+    """Logs the hedge statistics, including the p99 latency with and without hedging."""
+    for name, summary in sorted(get_hedge_stats().items()):
+        logger.info(f"Verkada hedging {name}: {summary}")
+    logger.info(f"Verkada hedge budget: {HEDGE_BUDGET.used} hedges for {HEDGE_BUDGET.calls} calls, {HEDGE_BUDGET.denied} denied.")
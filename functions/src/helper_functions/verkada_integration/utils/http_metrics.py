@@ -0,0 +1,219 @@
+import re
+import threading
+from typing import Dict, Optional, Union
+from urllib.parse import urlparse
+from firebase_admin import firestore
+from src.shared import db, logger
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Path segments that are IDs rather than part of the endpoint: UUIDs, long hex strings and numbers.
+_ID_SEGMENT = re.compile(r'^(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|\d+)$')
+
+_metrics: Dict[tuple, 'EndpointMetrics'] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_endpoint_template(url: str) -> str:
+    """
+    Returns the URL with the org short name and IDs replaced by placeholders, e.g.
+    'https://vsensor.command.verkada.com/__v/acme/devices/5f0c...' -> 'vsensor/__v/{org}/devices/{id}'.
+    """
+    parsed = urlparse(url)
+    subdomain = (parsed.hostname or '').split('.')[0]
+    segments = [segment for segment in parsed.path.split('/') if segment]
+    template = []
+    for index, segment in enumerate(segments):
+        if index == 1 and segments[0] == '__v':
+            template.append('{org}')
+        elif _ID_SEGMENT.match(segment):
+            template.append('{id}')
+        else:
+            template.append(segment)
+    return '/'.join([subdomain] + template)
+
+
+class EndpointMetrics:
+    """Counters for one (Verkada org, method, endpoint template)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failed_calls = 0
+        self.attempts = 0
+        self.attempts_per_call: Dict[int, int] = {}
+        self.status_codes: Dict[str, int] = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def summary(self) -> dict:
+        bucket_names = [f"le{bound}ms" for bound in LATENCY_BUCKETS_MS] + [f"gt{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'calls': self.calls,
+            'failedCalls': self.failed_calls,
+            'attempts': self.attempts,
+            'attemptsPerCall': {str(attempts): count for attempts, count in sorted(self.attempts_per_call.items())},
+            'statusCodes': dict(self.status_codes),
+            'latencyHistogram': {name: count for name, count in zip(bucket_names, self.latency_buckets) if count},
+            'avgLatencyMs': round(self.total_latency_ms / self.attempts, 1) if self.attempts else 0.0,
+            'maxLatencyMs': round(self.max_latency_ms, 1),
+            'bytesOut': self.bytes_out,
+            'bytesIn': self.bytes_in,
+        }
+
+
+class RunHttpCounts:
+    """
+    Calls, attempts and failed calls per 'METHOD endpoint template' made by one
+    run, whichever clients, threads and event loops made them. Unlike the
+    process-wide metrics it is never reset by another job and never sees
+    another run's traffic. Passed to clients as http_counts.
+    """
+
+    def __init__(self):
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, method: str, url: str) -> Dict[str, int]:
+        name = f"{method.upper()} {get_endpoint_template(url)}"
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = self._endpoints[name] = {'calls': 0, 'attempts': 0, 'failedCalls': 0}
+        return endpoint
+
+    def add_attempt(self, method: str, url: str) -> None:
+        with self._lock:
+            self._endpoint(method, url)['attempts'] += 1
+
+    def add_call(self, method: str, url: str, succeeded: bool) -> None:
+        with self._lock:
+            endpoint = self._endpoint(method, url)
+            endpoint['calls'] += 1
+            if not succeeded:
+                endpoint['failedCalls'] += 1
+
+    def summary(self) -> dict:
+        """Totals over every endpoint, and the counts per endpoint."""
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self._endpoints.items()}
+        return {
+            'calls': sum(endpoint['calls'] for endpoint in endpoints.values()),
+            'attempts': sum(endpoint['attempts'] for endpoint in endpoints.values()),
+            'failedCalls': sum(endpoint['failedCalls'] for endpoint in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+
+def _get_metrics(verkada_org_id: Optional[str], method: str, url: str) -> EndpointMetrics:
+    key = (verkada_org_id, method.upper(), get_endpoint_template(url))
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _metrics.setdefault(key, EndpointMetrics())
+    return metrics
+
+
+def record_attempt(verkada_org_id: Optional[str], method: str, url: str, status: Union[int, str],
+                   latency_seconds: float, bytes_out: int = 0, bytes_in: int = 0,
+                   http_counts: Optional[RunHttpCounts] = None) -> None:
+    """
+    Records one attempt of a Verkada call.
+
+    Args:
+        verkada_org_id (str): The Verkada organization ID the call is made for.
+        method (str): The HTTP method.
+        url (str): The request URL; it is reduced to its endpoint template.
+        status (int | str): The response status code, or the error name if no response arrived.
+        latency_seconds (float): Time from sending the request to receiving the response headers.
+        bytes_out (int, optional): Request body size.
+        bytes_in (int, optional): Response body size.
+        http_counts (RunHttpCounts, optional): The calling run's own counts, also updated.
+    """
+    latency_ms = latency_seconds * 1000
+    bucket = len(LATENCY_BUCKETS_MS)
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            bucket = index
+            break
+    with _metrics_lock:
+        metrics = _get_metrics(verkada_org_id, method, url)
+        metrics.attempts += 1
+        metrics.status_codes[str(status)] = metrics.status_codes.get(str(status), 0) + 1
+        metrics.latency_buckets[bucket] += 1
+        metrics.total_latency_ms += latency_ms
+        metrics.max_latency_ms = max(metrics.max_latency_ms, latency_ms)
+        metrics.bytes_out += bytes_out
+        metrics.bytes_in += bytes_in
+    if http_counts is not None:
+        http_counts.add_attempt(method, url)
+
+
+def record_call(verkada_org_id: Optional[str], method: str, url: str, attempts: int, succeeded: bool,
+                http_counts: Optional[RunHttpCounts] = None) -> None:
+    """Records the outcome of a Verkada call once retries are done, in the run's http_counts too if given."""
+    with _metrics_lock:
+        metrics = _get_metrics(verkada_org_id, method, url)
+        metrics.calls += 1
+        metrics.attempts_per_call[attempts] = metrics.attempts_per_call.get(attempts, 0) + 1
+        if not succeeded:
+            metrics.failed_calls += 1
+    if http_counts is not None:
+        http_counts.add_call(method, url, succeeded)
+
+
+def get_http_metrics(verkada_org_id: Optional[str] = None, reset: bool = False) -> Dict[str, dict]:
+    """
+    Returns the metrics summary per 'METHOD endpoint template', optionally for one Verkada org.
+
+    Args:
+        verkada_org_id (str, optional): Only include calls made for this Verkada org.
+        reset (bool, optional): Clear the returned metrics, so the next summary covers a new run.
+
+    Returns:
+        Dict[str, dict]: Summaries keyed by method and endpoint template (and org when not filtered).
+    """
+    summary = {}
+    with _metrics_lock:
+        for key in list(_metrics):
+            metrics_org_id, method, template = key
+            if verkada_org_id is not None and metrics_org_id != verkada_org_id:
+                continue
+            name = f"{method} {template}" if verkada_org_id is not None else f"{metrics_org_id} {method} {template}"
+            summary[name] = _metrics[key].summary()
+            if reset:
+                del _metrics[key]
+    return summary
+
+
+def log_http_metrics(verkada_org_id: Optional[str] = None) -> None:
+    """Logs the metrics summary, optionally for one Verkada org."""
+    for name, summary in sorted(get_http_metrics(verkada_org_id).items()):
+        logger.info(f"Verkada HTTP {name}: {summary}")
+
+
+def save_http_metrics(org_id: str, verkada_org_id: Optional[str], job_name: str) -> None:
+    """
+    Logs and stores the metrics summary of a job's run for one org, then clears it.
+
+    The summary is written to sensitiveConfigs/verkadaHttpMetrics under the
+    job's name, where get_verkada_http_metrics_callable reads it.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        verkada_org_id (str): The Verkada organization ID.
+        job_name (str): The scheduled job the metrics belong to.
+    """
+    summary = get_http_metrics(verkada_org_id, reset=True)
+    for name, endpoint_summary in sorted(summary.items()):
+        logger.info(f"{job_name} Verkada HTTP {name}: {endpoint_summary}")
+    try:
+        db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaHttpMetrics').set({
+            job_name: {
+                'endpoints': summary,
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+            }
+        }, merge=[job_name])
+    except Exception as e:
+        logger.error(f"Error saving Verkada HTTP metrics for organization {org_id}: {e}")
@@ -1,52 +1,261 @@
 import requests
+import threading
 import time
-from requests.exceptions import RequestException
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError as RequestsConnectionError, RequestException
+from urllib3.exceptions import ProtocolError
 from src.shared import logger
+from src.helper_functions.verkada_integration.utils.retry_policy import compute_backoff, default_policy_for_method, is_retryable
+from src.helper_functions.verkada_integration.utils.circuit_breaker import CircuitOpenError
+from src.helper_functions.verkada_integration.utils.json_codec import ACCEPT_ENCODING, encode_json_body
+from src.helper_functions.verkada_integration.utils.http_metrics import get_endpoint_template, record_attempt, record_call
+from src.helper_functions.verkada_integration.utils.deadline import MIN_REQUEST_SECONDS, DeadlineExceeded
+from src.helper_functions.verkada_integration.utils.hedging import send_hedged
+from src.helper_functions.verkada_integration.utils.concurrency_controller import AIMD_MAX_LIMIT
 
-def requests_with_retry(method, url, max_retries=10, delay=1, **kwargs):
+# Number of distinct *.command.verkada.com hosts we keep a connection pool for.
+HTTP_POOL_CONNECTIONS = 16
+# Keep-alive connections held per host, sized to the adaptive limit's ceiling.
+HTTP_POOL_MAXSIZE = AIMD_MAX_LIMIT
+
+# Errors raised while a streamed body is read, after its response headers arrived.
+STREAM_BODY_ERRORS = (ChunkedEncodingError, RequestsConnectionError, ProtocolError)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide requests Session used for all Verkada traffic.
+
+    The session is created lazily and kept at module level so warm function
+    instances reuse their open TLS connections across invocations. Cookies are
+    rejected so that state returned for one Verkada org can never leak into
+    requests made on behalf of another; authentication is carried in headers.
+    Compressed responses are requested for every call.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+                _session = session
+    return _session
+
+
+def requests_with_retry(method, url, policy=None, retry_budget=None, session=None, limiter=None, breaker=None, verkada_org_id=None, deadline=None,
+                        http_counts=None, **kwargs):
     """
     Sends an HTTP request using the requests library with a retry mechanism.
 
+    Failures are classified by the call site's retry policy: permanent errors
+    (e.g. 400/401/403/404) are raised immediately, while transient ones are
+    retried with exponential backoff and full jitter, honoring Retry-After on
+    429/503 responses. Under a hedging policy, a slow attempt is raced against
+    a second identical request and the first response is used.
+
     Args:
         method (str): The HTTP method (e.g., 'get', 'post', 'put', 'delete').
         url (str): The URL for the request.
-        max_retries (int): The maximum number of retries. Defaults to 10.
-        delay (int): The delay between retries in seconds. Defaults to 1.
+        policy (RetryPolicy, optional): How this call site retries. Defaults to
+                  a policy chosen from the HTTP method.
+        retry_budget (RetryBudget, optional): Shared cap on the caller's total retries.
+        session (requests.Session, optional): The session to send the request on.
+                  Defaults to the shared pooled session.
+        limiter (HostLimiter, optional): Adaptive concurrency and rate limiter each
+                  attempt must pass through, and whose limit each attempt's status
+                  and latency adjust. Backoff sleeps happen outside the limiter.
+        breaker (CircuitBreaker, optional): Circuit breaker for the URL's endpoint
+                  family. While it is open, attempts fail fast with CircuitOpenError
+                  and the request is recorded as skipped.
+        verkada_org_id (str, optional): The Verkada org the call's latency, status,
+                  attempt and byte metrics are recorded under.
+        deadline (Deadline, optional): The run's deadline. Each attempt's timeout is
+                  trimmed to the time left, and no attempt or retry is started
+                  past it; the call is then recorded as skipped on the deadline.
+        http_counts (RunHttpCounts, optional): The calling run's own call and attempt counts.
         **kwargs: Additional arguments to pass to the requests function
-                  (e.g., json, data, headers, timeout).
+                  (e.g., json, data, headers, timeout). A json payload is encoded
+                  with the fast codec.
 
     Returns:
         requests.Response: The response object if the request is successful.
 
     Raises:
-        RequestException: If the request fails after all retries.
+        RequestException: If the request fails permanently or retries are exhausted.
+        DeadlineExceeded: If the deadline leaves no time to start the request.
     """
-    retries = 0
-    last_exception = None
-    while retries < max_retries:
+    if session is None:
+        session = get_http_session()
+    if policy is None:
+        policy = default_policy_for_method(method)
+    # Add a default timeout if not specified by the caller
+    kwargs.setdefault('timeout', 30)
+    base_timeout = kwargs['timeout']
+    payload = kwargs.pop('json', None)
+    if payload is not None:
+        kwargs['data'], body_headers = encode_json_body(payload)
+        kwargs['headers'] = {**body_headers, **(kwargs.get('headers') or {})}
+
+    body = kwargs.get('data')
+    bytes_out = len(body) if isinstance(body, (bytes, str)) else 0
+
+    def send_attempt():
+        sent_at = time.monotonic()
         try:
-            # Add a default timeout if not specified by the caller
-            if 'timeout' not in kwargs:
-                kwargs['timeout'] = 30 # Default timeout of 30 seconds
-
-            response = requests.request(method.lower(), url, **kwargs)
-            if response.status_code == 400 and response.text == 'siteId and currentSiteId are the same':
-                response.status_code = 200
-            # Raise an HTTPError exception for bad status codes (4xx or 5xx)
-            response.raise_for_status()
-            # If request is successful, return the response
-            return response
+            response = session.request(method.lower(), url, **kwargs)
         except RequestException as e:
-            last_exception = e
-            retries += 1
-            logger.error(f"Request failed ({e}). Retrying ({retries}/{max_retries}) in {delay} second(s)... URL: {url}, Method: {method}")
-            if retries < max_retries:
-                time.sleep(delay)
-
-    logger.error(f"Request failed after {max_retries} retries. URL: {url}, Method: {method}")
-    # If all retries fail, raise the last captured exception
-    if last_exception:
-        raise last_exception
-    else:
-        # Fallback exception if no specific exception was caught
-        raise RequestException(f"Request failed after {max_retries} retries without capturing an exception. URL: {url}, Method: {method}")
+            record_attempt(verkada_org_id, method, url, type(e).__name__, time.monotonic() - sent_at, bytes_out, http_counts=http_counts)
+            raise
+        if kwargs.get('stream'):
+            bytes_in = int(response.headers.get('Content-Length') or 0)
+        else:
+            bytes_in = len(response.content)
+        record_attempt(verkada_org_id, method, url, response.status_code, time.monotonic() - sent_at, bytes_out, bytes_in, http_counts=http_counts)
+        return response
+
+    def send_limited():
+        if limiter is None:
+            return send_attempt()
+        with limiter.acquire(endpoint) as slot:
+            response = send_attempt()
+            slot.status = response.status_code
+            return response
+
+    endpoint = get_endpoint_template(url)
+    started_at = time.monotonic()
+    attempt = 0
+    succeeded = False
+    try:
+        while True:
+            attempt += 1
+            # The deadline is checked first, so a request it stops never holds a half-open probe slot
+            if deadline is not None:
+                try:
+                    kwargs['timeout'] = deadline.request_timeout(base_timeout)
+                except DeadlineExceeded:
+                    deadline.skip(f"{method.upper()} {get_endpoint_template(url)}")
+                    attempt -= 1
+                    raise
+            if breaker is not None and not breaker.allow_request():
+                breaker.record_skip(method, url, payload)
+                logger.warning(f"Circuit open for {url}, skipping request. Method: {method}")
+                attempt -= 1
+                raise CircuitOpenError(f"Circuit open for {url}")
+            try:
+                if policy.hedge:
+                    response = send_hedged(send_limited, method, url)
+                else:
+                    response = send_limited()
+                if response.status_code == 400 and response.text == 'siteId and currentSiteId are the same':
+                    response.status_code = 200
+                # Raise an HTTPError exception for bad status codes (4xx or 5xx)
+                response.raise_for_status()
+                if breaker is not None:
+                    breaker.record_outcome(None)
+                # If request is successful, return the response
+                succeeded = True
+                return response
+            except RequestException as e:
+                if breaker is not None:
+                    breaker.record_outcome(e)
+                if not is_retryable(e, policy):
+                    logger.error(f"Request failed with non-retryable error ({e}). URL: {url}, Method: {method}")
+                    raise
+                if attempt >= policy.max_attempts:
+                    logger.error(f"Request failed after {attempt} attempts ({e}). URL: {url}, Method: {method}")
+                    raise
+                sleep_for = compute_backoff(attempt, policy, e)
+                if time.monotonic() - started_at + sleep_for > policy.max_elapsed:
+                    logger.error(f"Request failed ({e}) and retrying would exceed the {policy.max_elapsed}s budget. URL: {url}, Method: {method}")
+                    raise
+                if retry_budget is not None and not retry_budget.try_consume():
+                    logger.error(f"Request failed ({e}) and the caller's retry budget is exhausted. URL: {url}, Method: {method}")
+                    raise
+                if deadline is not None and sleep_for + MIN_REQUEST_SECONDS > deadline.remaining():
+                    logger.error(f"Request failed ({e}) and the run's deadline leaves no time to retry. URL: {url}, Method: {method}")
+                    raise
+                logger.warning(f"Request failed ({e}). Retrying ({attempt}/{policy.max_attempts}, {policy.name}) in {sleep_for:.2f} second(s)... URL: {url}, Method: {method}")
+                time.sleep(sleep_for)
+            except BaseException:
+                # The attempt ended without an outcome to record
+                if breaker is not None:
+                    breaker.release_probe()
+                raise
+    finally:
+        record_call(verkada_org_id, method, url, attempt, succeeded, http_counts=http_counts)
+
+
+def stream_with_retry(method, url, decode, policy=None, retry_budget=None, breaker=None, verkada_org_id=None, deadline=None,
+                      http_counts=None, **kwargs):
+    """
+    Sends a request with stream=True through requests_with_retry and decodes
+    the body with decode(response) as it arrives. If the connection breaks
+    while the body is being read, the request and the decode are retried
+    together under the same policy, budget and deadline, so a dropped
+    download is not a failed list. decode must build its result from scratch
+    on each call, since a retried body is read again from the start.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL for the request.
+        decode (Callable[[requests.Response], Any]): Reads the streamed response and returns the result.
+        policy (RetryPolicy, optional): How this call site retries. Body reads are
+                  only retried if the policy retries read errors.
+        retry_budget (RetryBudget, optional): Shared cap on the caller's total retries.
+        breaker (CircuitBreaker, optional): Circuit breaker for the URL's endpoint family;
+                  a broken body counts as a failed attempt.
+        verkada_org_id (str, optional): The Verkada org the call's metrics are recorded under.
+        deadline (Deadline, optional): The run's deadline.
+        http_counts (RunHttpCounts, optional): The calling run's own call and attempt counts.
+        **kwargs: Additional arguments for requests_with_retry.
+
+    Returns:
+        Any: What decode returned.
+
+    Raises:
+        RequestException: If the request or the body read fails permanently or retries are exhausted.
+        ValueError: If the body is not valid JSON.
+    """
+    if policy is None:
+        policy = default_policy_for_method(method)
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        response = requests_with_retry(method, url, policy=policy, retry_budget=retry_budget, breaker=breaker,
+                                       verkada_org_id=verkada_org_id, deadline=deadline, http_counts=http_counts, stream=True, **kwargs)
+        read_started = time.monotonic()
+        try:
+            return decode(response)
+        except STREAM_BODY_ERRORS as e:
+            record_attempt(verkada_org_id, method, url, type(e).__name__, time.monotonic() - read_started, http_counts=http_counts)
+            if breaker is not None:
+                breaker.record_outcome(e)
+            if not policy.retry_read_errors or attempt >= policy.max_attempts:
+                logger.error(f"Reading the response failed after {attempt} attempt(s) ({e}). URL: {url}, Method: {method}")
+                raise
+            sleep_for = compute_backoff(attempt, policy)
+            if time.monotonic() - started_at + sleep_for > policy.max_elapsed:
+                logger.error(f"Reading the response failed ({e}) and retrying would exceed the {policy.max_elapsed}s budget. URL: {url}, Method: {method}")
+                raise
+            if retry_budget is not None and not retry_budget.try_consume():
+                logger.error(f"Reading the response failed ({e}) and the caller's retry budget is exhausted. URL: {url}, Method: {method}")
+                raise
+            if deadline is not None and sleep_for + MIN_REQUEST_SECONDS > deadline.remaining():
+                logger.error(f"Reading the response failed ({e}) and the run's deadline leaves no time to retry. URL: {url}, Method: {method}")
+                raise
+            logger.warning(f"Reading the response failed ({e}). Retrying ({attempt}/{policy.max_attempts}, {policy.name}) in {sleep_for:.2f} second(s)... URL: {url}, Method: {method}")
+            time.sleep(sleep_for)
+        finally:
+            response.close()
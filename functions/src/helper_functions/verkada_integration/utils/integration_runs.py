@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from firebase_admin import firestore
+from src.shared import db, logger
+from src.helper_functions.verkada_integration.utils.http_metrics import RunHttpCounts
+
+# Minimum time between writes of a running report. The final write is never throttled.
+RUN_REPORT_MIN_WRITE_INTERVAL_SECONDS = 15.0
+RUN_STATUS_RUNNING = 'running'
+RUN_STATUS_SUCCEEDED = 'succeeded'
+RUN_STATUS_FAILED = 'failed'
+
+
+class IntegrationRunReport:
+    """
+    The summary of one Verkada integration run for one org, written to
+    organizations/{orgId}/integrationRuns/{runId}. It holds wall time per
+    stage, counts per device type, Verkada HTTP calls and Firestore reads and
+    writes. Stages update it from any thread; while the run is going the
+    document is rewritten at most every RUN_REPORT_MIN_WRITE_INTERVAL_SECONDS,
+    and finish() always writes the final state. The HTTP calls are counted in
+    http_counts, which the run passes to its Verkada clients.
+    """
+
+    def __init__(self, org_id: str, job_name: str, verkada_org_id: Optional[str] = None):
+        self.org_id = org_id
+        self.job_name = job_name
+        self.verkada_org_id = verkada_org_id
+        self._ref = db.collection('organizations').document(org_id).collection('integrationRuns').document()
+        self.run_id = self._ref.id
+        self._lock = threading.Lock()
+        self._started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+        self._last_write = 0.0
+        self.http_counts = RunHttpCounts()
+        self._stages: Dict[str, float] = {}
+        self._device_types: Dict[str, Dict[str, int]] = {}
+        self._firestore = {'reads': 0, 'writes': 0}
+        self._extra: Dict[str, object] = {}
+        self._status = RUN_STATUS_RUNNING
+        self._error: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a stage. A stage entered more than once accumulates its time."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stages[name] = self._stages.get(name, 0.0) + time.monotonic() - started
+            self.flush()
+
+    def add_device_counts(self, device_type: str, counts: Dict[str, int]) -> None:
+        """Adds to a device type's counts, e.g. {'fetched': 12, 'unchanged': 10, 'update': 2}."""
+        with self._lock:
+            type_counts = self._device_types.setdefault(device_type, {})
+            for name, count in counts.items():
+                type_counts[name] = type_counts.get(name, 0) + count
+
+    def add_firestore_ops(self, reads: int = 0, writes: int = 0) -> None:
+        """Adds Firestore document reads and writes made by the run."""
+        with self._lock:
+            self._firestore['reads'] += reads
+            self._firestore['writes'] += writes
+
+    def set(self, key: str, value) -> None:
+        """Stores another field of the report, such as a step's result."""
+        with self._lock:
+            self._extra[key] = value
+
+    def _document(self) -> dict:
+        with self._lock:
+            document = dict(self._extra)
+            document.update({
+                'runId': self.run_id,
+                'jobName': self.job_name,
+                'status': self._status,
+                'startedAt': self._started_at,
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+                'durationSeconds': round(time.monotonic() - self._started, 3),
+                'stageSeconds': {name: round(seconds, 3) for name, seconds in self._stages.items()},
+                'deviceTypes': {name: dict(counts) for name, counts in self._device_types.items()},
+                'firestore': dict(self._firestore),
+                'error': self._error,
+            })
+        document['http'] = self.http_counts.summary()
+        return document
+
+    def flush(self, force: bool = False) -> None:
+        """Writes the report, unless the last write was too recent."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < RUN_REPORT_MIN_WRITE_INTERVAL_SECONDS:
+                return
+            self._last_write = now
+        try:
+            self._ref.set(self._document())
+        except Exception as e:
+            logger.error(f"Error writing {self.job_name} run report {self.run_id} for organization {self.org_id}: {e}")
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        """Marks the run succeeded, or failed with the given error, and writes the final report."""
+        with self._lock:
+            self._status = RUN_STATUS_FAILED if error is not None else RUN_STATUS_SUCCEEDED
+            self._error = str(error) if error is not None else None
+            self._extra['finishedAt'] = firestore.SERVER_TIMESTAMP
+        self.flush(force=True)
+        logger.info(f"{self.job_name} run {self.run_id} for organization {self.org_id} {self._status}.")
+
+
+def run_stage(report: Optional[IntegrationRunReport], name: str):
+    """report.stage(name), or a no-op context when the caller has no report."""
+    return report.stage(name) if report is not None else nullcontext()
@@ -0,0 +1,355 @@
+import gzip
+import threading
+import time
+import concurrent.futures
+from typing import Any, Dict, Iterable, Optional, Tuple
+from firebase_admin import firestore
+from src.shared import db, logger
+from src.helper_functions.verkada_integration.utils.verkada_client import get_verkada_client
+from src.helper_functions.verkada_integration.utils.retry_policy import HEDGED_READ_POLICY, READ_POLICY, RetryBudget
+from src.helper_functions.verkada_integration.utils.app_init_cache import get_verkada_app_init, invalidate_verkada_app_init
+from src.helper_functions.verkada_integration.utils.json_codec import dumps, loads, loads_response
+from src.helper_functions.verkada_integration.utils.json_stream import stream_response_array, stream_response_members
+from src.helper_functions.verkada_integration.utils.verkada_device_types import (
+    APP_INIT_SOURCE,
+    VERKADA_DEVICE_SOURCES,
+    VerkadaDeviceRecord,
+    device_types_by_source,
+    format_device_source,
+)
+
+# Bumped whenever a section's normalized form changes; snapshots of another version are refetched.
+INVENTORY_SNAPSHOT_VERSION = 2
+# How long a section is reused. Covers one scheduled pipeline (grants, syncers, cleaners) across
+# function instances; the sync callable always takes a fresh snapshot.
+INVENTORY_SNAPSHOT_MAX_AGE_SECONDS = 3600.0
+# Sections and device sources fetched at once. How many requests reach Verkada at once is still
+# decided per host by the adaptive limit.
+INVENTORY_FETCH_MAX_WORKERS = 8
+# Compressed snapshots larger than this are only kept in memory, to stay under Firestore's 1 MiB document limit.
+INVENTORY_SNAPSHOT_MAX_STORED_BYTES = 900_000
+
+SECTION_DEVICES = 'devices'
+SECTION_SITES = 'sites'
+SECTION_SITE_LIST = 'siteList'
+SECTION_ZONES = 'zones'
+SECTION_USER_GROUPS = 'userGroups'
+ALL_SECTIONS = (SECTION_DEVICES, SECTION_SITES, SECTION_SITE_LIST, SECTION_ZONES, SECTION_USER_GROUPS)
+
+# Device lists of a camera group (site) in the init payload.
+SITE_DEVICE_KEYS = (
+    'accessControllers', 'alarmsDevice', 'biometricAccessController', 'cameras', 'connectBox', 'deskApp',
+    'fortress', 'gateway', 'intercom', 'pavaSpeaker', 'speaker', 'vayuSensor', 'wirelessLocks',
+)
+
+_snapshots: Dict[tuple, 'InventorySnapshot'] = {}
+_snapshots_lock = threading.Lock()
+_org_locks: Dict[tuple, threading.Lock] = {}
+
+
+class InventorySnapshot:
+    """
+    A normalized copy of a Verkada org's inventory, one section per list endpoint:
+
+        devices:    device type -> VerkadaDeviceRecords
+        sites:      [{'siteId', 'devices': {SITE_DEVICE_KEYS key -> device IDs}}] from the init payload
+        siteList:   site IDs from the site list
+        zones:      classic alarm zone IDs
+        userGroups: [{'groupId', 'groupName'}]
+
+    Sections are fetched and expire independently. A section that could not be
+    fetched is absent.
+    """
+
+    def __init__(self, verkada_org_id: str, sections: Dict[str, Any] = None, fetched_at: Dict[str, float] = None):
+        self.version = INVENTORY_SNAPSHOT_VERSION
+        self.verkada_org_id = verkada_org_id
+        self.sections = dict(sections or {})
+        self.fetched_at = dict(fetched_at or {})
+
+    def get(self, section: str, default: Any = None) -> Any:
+        """Returns a section's data, or default if it is missing. The data is shared and must not be modified."""
+        return self.sections.get(section, default)
+
+    def is_fresh(self, section: str, max_age: float) -> bool:
+        """Whether the section is present and was fetched less than max_age seconds ago."""
+        return section in self.sections and time.time() - self.fetched_at.get(section, 0.0) < max_age
+
+    def merged(self, sections: Dict[str, Any], fetched_at: float) -> 'InventorySnapshot':
+        """Returns a copy with the given sections replaced."""
+        merged = InventorySnapshot(self.verkada_org_id, self.sections, self.fetched_at)
+        merged.sections.update(sections)
+        merged.fetched_at.update({section: fetched_at for section in sections})
+        return merged
+
+
+def _snapshot_ref(org_id: str):
+    return db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaInventorySnapshot')
+
+
+def _fetch_devices(verkada_client, verkada_bot_user_info: dict) -> Tuple[dict, bool]:
+    """Lists every registered device type, one request per source. Returns (type -> records, whether every source was listed)."""
+    org_short_name = verkada_bot_user_info.get("org_name")
+    verkada_org_id = verkada_bot_user_info.get("org_id")
+
+    def fetch_source(source_name: str, device_types: list) -> dict:
+        # Each item is reduced to its record as soon as it is decoded, so the full items are never held together
+        types_by_key = {device_type.result_key: device_type for device_type in device_types}
+
+        def decode(response) -> dict:
+            # Starts over on every call, since a retried body is read again from the start
+            records_by_key = {key: [] for key in types_by_key}
+            if len(device_types) == 1:
+                device_type = device_types[0]
+                records_by_key[device_type.result_key].extend(
+                    device_type.to_record(item) for item in stream_response_array(response, device_type.result_key))
+            else:
+                # Several types share one response; their arrays are decoded in document order
+                for key, item_data in stream_response_members(response, list(types_by_key)):
+                    records_by_key[key].append(types_by_key[key].to_record(item_data))
+            return records_by_key
+
+        if source_name == APP_INIT_SOURCE:
+            init_data = get_verkada_app_init(verkada_client)
+            records_by_key = {key: [device_type.to_record(item) for item in init_data.get(key) or []]
+                              for key, device_type in types_by_key.items()}
+        else:
+            method, url, payload = format_device_source(VERKADA_DEVICE_SOURCES[source_name], org_short_name, verkada_org_id)
+            records_by_key = verkada_client.stream(method, url, decode, json=payload, policy=HEDGED_READ_POLICY)
+        return {device_type.device_type: records_by_key[key] for key, device_type in types_by_key.items()}
+
+    devices = {}
+    complete = True
+    with concurrent.futures.ThreadPoolExecutor(max_workers=INVENTORY_FETCH_MAX_WORKERS) as executor:
+        futures = {executor.submit(fetch_source, source_name, device_types): source_name
+                   for source_name, device_types in device_types_by_source().items()}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                devices.update(future.result())
+            except Exception as e:
+                logger.error(f"Error listing Verkada devices from {futures[future]}: {e}")
+                complete = False
+    return devices, complete
+
+
+def _fetch_sites(verkada_client, verkada_bot_user_info: dict) -> Tuple[list, bool]:
+    init_data = get_verkada_app_init(verkada_client)
+    sites = [
+        {
+            'siteId': site.get('cameraGroupId'),
+            'devices': {key: list(site.get(key) or []) for key in SITE_DEVICE_KEYS if site.get(key)},
+        }
+        for site in init_data.get('cameraGroups') or []
+        if site.get('cameraGroupId')
+    ]
+    return sites, True
+
+
+def _fetch_site_list(verkada_client, verkada_bot_user_info: dict) -> Tuple[list, bool]:
+    url = f"https://vprovision.command.verkada.com/__v/{verkada_bot_user_info['org_name']}/org/site/list"
+    response = verkada_client.post(url, json={"orgId": verkada_bot_user_info['org_id']}, policy=READ_POLICY)
+    return [site.get('siteId') for site in loads_response(response).get('sites', []) if site.get('siteId')], True
+
+
+def _fetch_zones(verkada_client, verkada_bot_user_info: dict) -> Tuple[list, bool]:
+    url = f"https://alarms.command.verkada.com/__v/{verkada_bot_user_info['org_name']}/zone/list"
+    payload = {"organizationId": verkada_bot_user_info['org_id'], "includeLastEvent": False}
+    response = verkada_client.post(url, json=payload, policy=READ_POLICY)
+    zones = loads_response(response).get('zone', [])
+    for i, zone in enumerate(zones):
+        if not zone.get('zoneId'):
+            logger.warning(f"Zone {i} has no zoneId: {zone}")
+    return [zone.get('zoneId') for zone in zones if zone.get('zoneId')], True
+
+
+def _fetch_user_groups(verkada_client, verkada_bot_user_info: dict) -> Tuple[list, bool]:
+    url = "https://vauth.command.verkada.com/__v/webbpulse/security_entity_group/list"
+    payload = {
+        "organizationId": verkada_bot_user_info['org_id'],
+        "includeMembers": False,
+        "includeMemberCount": False,
+    }
+    response = verkada_client.post(url, json=payload, policy=READ_POLICY)
+    return [
+        {"groupId": group.get("entityGroupId"), "groupName": group.get("name")}
+        for group in loads_response(response).get("securityEntityGroup", [])
+        if group.get("entityGroupId") and group.get("name") is not None
+    ], True
+
+
+_SECTION_FETCHERS = {
+    SECTION_DEVICES: _fetch_devices,
+    SECTION_SITES: _fetch_sites,
+    SECTION_SITE_LIST: _fetch_site_list,
+    SECTION_ZONES: _fetch_zones,
+    SECTION_USER_GROUPS: _fetch_user_groups,
+}
+
+
+def _fetch_sections(verkada_bot_user_info: dict, sections: Iterable[str], deadline=None, http_counts=None) -> Tuple[dict, dict]:
+    """
+    Fetches sections concurrently. Returns (complete sections, partial sections);
+    partial ones are used by this run but not kept. Failed sections are left out.
+    """
+    verkada_client = get_verkada_client(verkada_bot_user_info, retry_budget=RetryBudget(), deadline=deadline, http_counts=http_counts)
+    complete, partial = {}, {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=INVENTORY_FETCH_MAX_WORKERS) as executor:
+        futures = {executor.submit(_SECTION_FETCHERS[section], verkada_client, verkada_bot_user_info): section for section in sections}
+        for future in concurrent.futures.as_completed(futures):
+            section = futures[future]
+            try:
+                data, is_complete = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching Verkada inventory section {section}: {e}")
+                continue
+            (complete if is_complete else partial)[section] = data
+    return complete, partial
+
+
+def _load_snapshot(org_id: str, verkada_org_id: str, sections: Iterable[str], max_age: float) -> Optional[InventorySnapshot]:
+    """Reads the fresh sections of an org's stored snapshot, or None if there is no usable one."""
+    try:
+        stored = _snapshot_ref(org_id).get().to_dict() or {}
+    except Exception as e:
+        logger.error(f"Error reading Verkada inventory snapshot for organization {org_id}: {e}")
+        return None
+    if stored.get('version') != INVENTORY_SNAPSHOT_VERSION or stored.get('verkadaOrgId') != verkada_org_id:
+        return None
+    snapshot = InventorySnapshot(verkada_org_id)
+    for section in sections:
+        entry = (stored.get('sections') or {}).get(section) or {}
+        fetched_at = entry.get('fetchedAt') or 0.0
+        if not entry.get('data') or time.time() - fetched_at >= max_age:
+            continue
+        try:
+            data = loads(gzip.decompress(entry['data']))
+            if section == SECTION_DEVICES:
+                data = {device_type: [VerkadaDeviceRecord(*values) for values in records] for device_type, records in data.items()}
+            snapshot.sections[section] = data
+            snapshot.fetched_at[section] = fetched_at
+        except Exception as e:
+            logger.error(f"Error decoding Verkada inventory section {section} for organization {org_id}: {e}")
+    return snapshot
+
+
+def _store_sections(org_id: str, verkada_org_id: str, sections: Dict[str, Any], fetched_at: float) -> None:
+    """Writes fetched sections to the org's stored snapshot, leaving its other sections in place."""
+    encoded = {}
+    for section, data in sections.items():
+        if section == SECTION_DEVICES:
+            # Records are stored as JSON arrays, which the JSON codec does not produce from tuples itself
+            data = {device_type: [list(record) for record in records] for device_type, records in data.items()}
+        encoded[section] = gzip.compress(dumps(data))
+    size = sum(len(blob) for blob in encoded.values())
+    if size > INVENTORY_SNAPSHOT_MAX_STORED_BYTES:
+        logger.warning(f"Verkada inventory snapshot for organization {org_id} is {size} bytes compressed; keeping it in memory only.")
+        return
+    try:
+        _snapshot_ref(org_id).set({
+            'version': INVENTORY_SNAPSHOT_VERSION,
+            'verkadaOrgId': verkada_org_id,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'sections': {section: {'fetchedAt': fetched_at, 'data': blob} for section, blob in encoded.items()},
+        }, merge=True)
+    except Exception as e:
+        logger.error(f"Error saving Verkada inventory snapshot for organization {org_id}: {e}")
+
+
+def get_inventory_snapshot(verkada_bot_user_info: dict, org_id: str = None, sections: Iterable[str] = ALL_SECTIONS,
+                           deadline=None, max_age: float = INVENTORY_SNAPSHOT_MAX_AGE_SECONDS, http_counts=None) -> InventorySnapshot:
+    """
+    Returns the org's inventory snapshot with the requested sections. Sections
+    are taken from this instance's copy, then from the copy stored in
+    Firestore, and only those missing or older than max_age are fetched from
+    Verkada, concurrently. Fetched sections are kept for the next caller in
+    memory and, given org_id, in Firestore, so every syncer and cleaner of a
+    run reads the same inventory without listing it again.
+
+    Concurrent callers for one org wait for a single fetch.
+
+    Args:
+        verkada_bot_user_info (dict): The Verkada bot user's info.
+        org_id (str, optional): The organization ID in Firestore; without it the snapshot is not stored there.
+        sections (Iterable[str], optional): The sections the caller reads.
+        deadline (Deadline, optional): The run's deadline; nothing is fetched past it.
+        max_age (float, optional): Maximum age in seconds of a reused section; 0 fetches every requested section,
+            including a fresh app/v2/init payload in place of the cached one.
+        http_counts (RunHttpCounts, optional): The run's HTTP counts, given the calls made by a fetch.
+
+    Returns:
+        InventorySnapshot: The snapshot. Sections that could not be fetched are missing.
+    """
+    verkada_org_id = verkada_bot_user_info.get("org_id")
+    key = (verkada_org_id, verkada_bot_user_info.get("org_name"))
+    sections = tuple(sections)
+    with _snapshots_lock:
+        org_lock = _org_locks.setdefault(key, threading.Lock())
+
+    with org_lock:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key) or InventorySnapshot(verkada_org_id)
+        missing = [section for section in sections if not snapshot.is_fresh(section, max_age)]
+        if missing and org_id and max_age > 0:
+            stored = _load_snapshot(org_id, verkada_org_id, missing, max_age)
+            if stored is not None and stored.sections:
+                snapshot = InventorySnapshot(verkada_org_id, {**snapshot.sections, **stored.sections}, {**snapshot.fetched_at, **stored.fetched_at})
+                missing = [section for section in missing if section not in stored.sections]
+        if not missing:
+            with _snapshots_lock:
+                _snapshots[key] = snapshot
+            return snapshot
+
+        if deadline is not None and deadline.expired:
+            deadline.skip("inventory snapshot")
+            return snapshot
+        if max_age <= 0:
+            # The sites and the init-listed devices are read from the init payload, which has its own cache
+            invalidate_verkada_app_init(verkada_org_id)
+        started = time.monotonic()
+        fetched_at = time.time()
+        complete, partial = _fetch_sections(verkada_bot_user_info, missing, deadline=deadline, http_counts=http_counts)
+        failed = sorted(set(missing) - set(complete) - set(partial))
+        logger.info(f"Fetched Verkada inventory sections {sorted(complete)} in {time.monotonic() - started:.1f}s. "
+                    f"Incomplete: {sorted(partial)}, failed: {failed}.")
+        snapshot = snapshot.merged(complete, fetched_at)
+        with _snapshots_lock:
+            _snapshots[key] = snapshot
+        if complete and org_id:
+            _store_sections(org_id, verkada_org_id, complete, fetched_at)
+        # Partial sections are only used by this caller, so the next one lists them again
+        return snapshot.merged(partial, fetched_at) if partial else snapshot
+
+
+def take_inventory_snapshot(verkada_bot_user_info: dict, org_id: str = None, deadline=None,
+                            sections: Iterable[str] = ALL_SECTIONS, http_counts=None) -> InventorySnapshot:
+    """Fetches the given sections (all by default) of the org's inventory snapshot, ignoring any stored copy."""
+    return get_inventory_snapshot(verkada_bot_user_info, org_id=org_id, sections=sections, deadline=deadline, max_age=0,
+                                  http_counts=http_counts)
+
+
+def invalidate_inventory_snapshot(verkada_bot_user_info: dict, org_id: str = None, sections: Iterable[str] = ALL_SECTIONS) -> None:
+    """
+    Drops sections of the org's snapshot, e.g. after devices were moved or
+    sites deleted, so the next caller lists them from Verkada again.
+    """
+    verkada_org_id = verkada_bot_user_info.get("org_id")
+    key = (verkada_org_id, verkada_bot_user_info.get("org_name"))
+    sections = tuple(sections)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots[key] = InventorySnapshot(
+                verkada_org_id,
+                {section: data for section, data in snapshot.sections.items() if section not in sections},
+                {section: at for section, at in snapshot.fetched_at.items() if section not in sections},
+            )
+    if org_id:
+        try:
+            _snapshot_ref(org_id).set({'sections': {section: firestore.DELETE_FIELD for section in sections}}, merge=True)
+        except Exception as e:
+            logger.error(f"Error invalidating Verkada inventory snapshot for organization {org_id}: {e}")
+
+
+def device_site_ids(sites: Iterable[dict]) -> Dict[str, str]:
+    """Returns Verkada device ID -> site ID from the snapshot's sites section."""
+    return {device_id: site['siteId'] for site in sites for device_ids in site['devices'].values() for device_id in device_ids}
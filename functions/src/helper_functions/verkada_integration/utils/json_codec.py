@@ -0,0 +1,62 @@
+import json
+from typing import Any, Dict, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# urllib3 and httpx decode br responses only when a brotli package is importable.
+try:
+    import brotli
+    _BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi
+        _BROTLI_AVAILABLE = True
+    except ImportError:
+        _BROTLI_AVAILABLE = False
+
+# Name of the codec in use, for logs and benchmarks.
+JSON_CODEC = 'orjson' if orjson is not None else 'json'
+# Only advertise br when a decoder for it is installed, otherwise responses could not be read.
+ACCEPT_ENCODING = 'gzip, br' if _BROTLI_AVAILABLE else 'gzip'
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes obj as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data) -> Any:
+    """
+    Decodes JSON from bytes or str, with orjson when it is installed.
+
+    Raises:
+        ValueError: If data is not valid JSON. Both codecs raise a subclass of
+            json.JSONDecodeError.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def loads_response(response) -> Any:
+    """Decodes a response body with the fast codec, in place of response.json()."""
+    return loads(response.content)
+
+
+def encode_json_body(payload: Any) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Encodes a request payload with the fast codec. Bodies are sent uncompressed:
+    no Verkada endpoint is known to accept Content-Encoding: gzip requests.
+
+    Args:
+        payload (Any): The JSON-serializable payload.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: The body and the headers describing it.
+    """
+    return dumps(payload), {'Content-Type': 'application/json'}
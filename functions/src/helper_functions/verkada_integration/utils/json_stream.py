@@ -0,0 +1,239 @@
+import codecs
+import re
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple
+from src.helper_functions.verkada_integration.utils.json_codec import loads
+
+# Bytes read from the socket per chunk when streaming a response body.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# The rest of a JSON string after its opening quote, up to and including the closing quote.
+_STRING_TAIL = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_SCALAR = re.compile(r'[^,\]}\s]+')
+
+
+class _TextBuffer:
+    """Decoded text pulled from byte chunks on demand, with the consumed prefix dropped as parsing moves on."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Appends the next chunk. Returns False once the body is exhausted."""
+        while not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                text = self._decoder.decode(b'', final=True)
+            else:
+                text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.text += text
+                return True
+        return False
+
+    def compact(self) -> int:
+        """Drops everything before pos. Returns how far positions shifted."""
+        shift = self.pos
+        if shift:
+            self.text = self.text[shift:]
+            self.pos = 0
+        return shift
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or '' at end of body."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            self.compact()
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of streamed JSON, got {self.peek()!r}")
+        self.pos += 1
+
+    def value_end(self) -> int:
+        """Returns the end offset of the JSON value starting at pos, reading more chunks as needed."""
+        start_char = self.peek()
+        if start_char == '"':
+            return self._string_end(self.pos + 1)
+        if start_char in '[{':
+            return self._container_end()
+        while True:
+            match = _SCALAR.match(self.text, self.pos)
+            if match and (match.end() < len(self.text) or self.eof):
+                return match.end()
+            if not self.fill():
+                if match:
+                    return match.end()
+                raise ValueError("Unexpected end of streamed JSON")
+
+    def _string_end(self, tail_start: int) -> int:
+        while True:
+            match = _STRING_TAIL.match(self.text, tail_start)
+            if match:
+                return match.end()
+            if not self.fill():
+                raise ValueError("Unterminated string in streamed JSON")
+
+    def _container_end(self) -> int:
+        depth = 0
+        index = self.pos
+        while True:
+            match = _STRUCTURAL.search(self.text, index)
+            if match is None:
+                index = len(self.text)
+                if not self.fill():
+                    raise ValueError("Unexpected end of streamed JSON")
+                continue
+            char = match.group()
+            if char == '"':
+                index = self._string_end(match.end())
+                continue
+            index = match.end()
+            depth += 1 if char in '[{' else -1
+            if depth == 0:
+                return index
+
+    def skip_value(self) -> None:
+        """Skips the value at pos without decoding it, keeping only unread text in memory."""
+        if self.peek() in '[{':
+            # Containers can be large, so scan them without holding the whole value.
+            depth = 0
+            while True:
+                match = _STRUCTURAL.search(self.text, self.pos)
+                if match is None:
+                    self.pos = len(self.text)
+                    self.compact()
+                    if not self.fill():
+                        raise ValueError("Unexpected end of streamed JSON")
+                    continue
+                char = match.group()
+                if char == '"':
+                    self.pos = self._string_end(match.end())
+                    continue
+                self.pos = match.end()
+                depth += 1 if char in '[{' else -1
+                if depth == 0:
+                    return
+        self.pos = self.value_end()
+
+    def decode_value(self) -> Any:
+        end = self.value_end()
+        value = loads(self.text[self.pos:end])
+        self.pos = end
+        return value
+
+
+def _iter_array(buffer: _TextBuffer) -> Iterator[Any]:
+    buffer.expect('[')
+    if buffer.peek() == ']':
+        buffer.pos += 1
+        return
+    while True:
+        yield buffer.decode_value()
+        buffer.compact()
+        next_char = buffer.peek()
+        buffer.pos += 1
+        if next_char == ']':
+            return
+        if next_char != ',':
+            raise ValueError(f"Expected ',' or ']' in streamed JSON array, got {next_char!r}")
+
+
+def iter_json_members(chunks: Iterable[bytes], keys: Optional[Sequence[str]] = None) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Incrementally decodes a JSON body and yields the elements of selected arrays.
+
+    Only one element is decoded at a time; the rest of the document is
+    scanned past without building Python objects, so memory stays flat however
+    large the body is. If the body is a top-level array, its elements are
+    yielded with key None. Otherwise the elements of the top-level arrays named
+    in keys are yielded as (key, element), in document order. Keys whose value
+    is not an array are skipped.
+
+    Args:
+        chunks (Iterable[bytes]): The body, e.g. response.iter_content().
+        keys (Sequence[str], optional): Top-level keys whose array elements to yield.
+
+    Yields:
+        Tuple[Optional[str], Any]: (key, element) pairs.
+
+    Raises:
+        ValueError: If the body is not valid JSON.
+    """
+    buffer = _TextBuffer(chunks)
+    first_char = buffer.peek()
+    if first_char == '[':
+        for element in _iter_array(buffer):
+            yield None, element
+        return
+    buffer.expect('{')
+    wanted = set(keys or ())
+    while wanted:
+        next_char = buffer.peek()
+        if next_char == '}':
+            return
+        if next_char == ',':
+            buffer.pos += 1
+            continue
+        key = buffer.decode_value()
+        buffer.expect(':')
+        if key in wanted and buffer.peek() == '[':
+            wanted.discard(key)
+            for element in _iter_array(buffer):
+                yield key, element
+        else:
+            buffer.skip_value()
+        buffer.compact()
+
+
+def iter_json_array(chunks: Iterable[bytes], key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Yields the elements of one array in a streamed JSON body: the body itself if
+    it is an array, otherwise the top-level array under key.
+
+    Args:
+        chunks (Iterable[bytes]): The body, e.g. response.iter_content().
+        key (str, optional): The top-level key of the array in an object body.
+
+    Yields:
+        Any: Each decoded element.
+    """
+    for _, element in iter_json_members(chunks, [key] if key else None):
+        yield element
+
+
+def stream_response_array(response, key: Optional[str] = None, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of an array in a response sent with stream=True, as the
+    body arrives, and releases the connection when done.
+
+    Args:
+        response (requests.Response): A response requested with stream=True.
+        key (str, optional): The top-level key of the array in an object body.
+        chunk_size (int, optional): Bytes read from the socket at a time.
+
+    Yields:
+        Any: Each decoded element.
+    """
+    try:
+        yield from iter_json_array(response.iter_content(chunk_size=chunk_size), key)
+    finally:
+        response.close()
+
+
+def stream_response_members(response, keys: Sequence[str], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Tuple[Optional[str], Any]]:
+    """stream_response_array counterpart of iter_json_members."""
+    try:
+        yield from iter_json_members(response.iter_content(chunk_size=chunk_size), keys)
+    finally:
+        response.close()
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from firebase_admin import firestore
+from src.helper_functions.verkada_integration.utils.json_codec import dumps
+from src.shared import db, logger
+
+# A category whose payload has not changed is still fully reprocessed once this long after
+# the last full pass. Callers check their stored state too; this bounds how long anything
+# such a check misses can stay stale.
+PAYLOAD_FINGERPRINT_MAX_AGE = timedelta(days=7)
+
+
+def fingerprint_records(records: Iterable[tuple]) -> str:
+    """
+    Returns a stable hash of a Verkada list payload, normalized to the
+    records the sync keeps of each item. Item order and all other fields
+    (such as status or last-seen times) do not affect it.
+
+    Args:
+        records (Iterable[VerkadaDeviceRecord]): The records of one device type.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    encoded = sorted(dumps(list(record)) for record in records)
+    digest = hashlib.sha256()
+    for record in encoded:
+        digest.update(record)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def get_payload_fingerprints(org_id: str, job_name: str) -> Dict[str, dict]:
+    """Returns the fingerprints a job saved for an org, as category -> {'hash', 'verifiedAt'}."""
+    try:
+        doc = db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaPayloadFingerprints').get()
+        return (doc.to_dict() or {}).get(job_name) or {}
+    except Exception as e:
+        logger.error(f"Error reading Verkada payload fingerprints for organization {org_id}: {e}")
+        return {}
+
+
+def is_fingerprint_current(saved: Optional[dict], fingerprint: str) -> bool:
+    """Whether a saved fingerprint matches and its last full pass is recent enough to skip the category."""
+    if not saved or saved.get('hash') != fingerprint:
+        return False
+    verified_at = saved.get('verifiedAt')
+    return isinstance(verified_at, datetime) and datetime.now(timezone.utc) - verified_at < PAYLOAD_FINGERPRINT_MAX_AGE
+
+
+def save_payload_fingerprints(org_id: str, job_name: str, fingerprints: Dict[str, str]) -> None:
+    """
+    Saves the fingerprints of the categories a job fully processed in this run.
+    Categories not given keep their previous fingerprint.
+
+    Args:
+        org_id (str): The organization ID in Firestore.
+        job_name (str): The syncer the fingerprints belong to.
+        fingerprints (Dict[str, str]): Category -> fingerprint.
+    """
+    if not fingerprints:
+        return
+    try:
+        db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaPayloadFingerprints').set({
+            job_name: {
+                category: {'hash': fingerprint, 'verifiedAt': firestore.SERVER_TIMESTAMP}
+                for category, fingerprint in fingerprints.items()
+            }
+        }, merge=True)
+    except Exception as e:
+        logger.error(f"Error saving Verkada payload fingerprints for organization {org_id}: {e}")
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+from src.shared import logger
+from src.helper_functions.verkada_integration.utils.concurrency_controller import AIMDController
+# Sustained requests-per-second ceiling per host and org, and the burst allowed above it.
+REQUESTS_PER_SECOND_PER_HOST = 25.0
+BURST_PER_HOST = 25
+
+_limiters: Dict[tuple, 'HostLimiter'] = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() always takes a token and returns how
+    long the caller must wait for it, so waiting can be done with either
+    time.sleep or asyncio.sleep.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class LimiterSlot:
+    """An acquired in-flight slot. The caller sets status to the response's status code."""
+
+    __slots__ = ('status',)
+
+    def __init__(self):
+        self.status = None
+
+
+class HostLimiter:
+    """
+    Caps in-flight requests and request rate for one (host, Verkada org) pair,
+    and records how long callers waited for a slot. The in-flight cap is an
+    AIMDController that adapts to the latency and errors seen on the host.
+    """
+
+    def __init__(self, key: tuple, rate: float = REQUESTS_PER_SECOND_PER_HOST, burst: int = BURST_PER_HOST):
+        self.key = key
+        self.concurrency = AIMDController(f"{key[0]}|{key[1]}")
+        self._bucket = TokenBucket(rate, burst)
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        with self._stats_lock:
+            self.in_flight += 1
+            self.acquisitions += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def _record_release(self) -> None:
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    def _record_outcome(self, slot: LimiterSlot, error: Optional[BaseException], held_since: float, endpoint: str) -> None:
+        status = type(error).__name__ if error is not None else slot.status
+        self.concurrency.record_outcome(status, time.monotonic() - held_since, endpoint)
+
+    @contextmanager
+    def acquire(self, endpoint: str = ''):
+        """
+        Blocks until an in-flight slot and a rate token are available. The
+        slot's status and how long it was held feed the concurrency controller;
+        an exception raised while holding it counts as a transport error.
+
+        Args:
+            endpoint (str, optional): The endpoint template, for latency-spike detection.
+
+        Yields:
+            LimiterSlot: The slot, whose status the caller sets.
+        """
+        started_at = time.monotonic()
+        self.concurrency.acquire()
+        try:
+            delay = self._bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            self._record_wait(time.monotonic() - started_at)
+            slot = LimiterSlot()
+            held_since = time.monotonic()
+            try:
+                yield slot
+            except Exception as e:
+                self._record_outcome(slot, e, held_since, endpoint)
+                raise
+            else:
+                self._record_outcome(slot, None, held_since, endpoint)
+            finally:
+                self._record_release()
+        finally:
+            self.concurrency.release()
+
+    @asynccontextmanager
+    async def acquire_async(self, endpoint: str = ''):
+        """
+        Async counterpart of acquire(). Slots, rate tokens and wait metrics are
+        shared with threaded callers for the same host and org.
+        """
+        started_at = time.monotonic()
+        await self.concurrency.acquire_async()
+        try:
+            delay = self._bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._record_wait(time.monotonic() - started_at)
+            slot = LimiterSlot()
+            held_since = time.monotonic()
+            try:
+                yield slot
+            except Exception as e:
+                self._record_outcome(slot, e, held_since, endpoint)
+                raise
+            else:
+                self._record_outcome(slot, None, held_since, endpoint)
+            finally:
+                self._record_release()
+        finally:
+            self.concurrency.release()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = {
+                'acquisitions': self.acquisitions,
+                'inFlight': self.in_flight,
+                'totalWaitSeconds': round(self.total_wait, 3),
+                'avgWaitSeconds': round(self.total_wait / self.acquisitions, 4) if self.acquisitions else 0.0,
+                'maxWaitSeconds': round(self.max_wait, 3),
+            }
+        stats.update(self.concurrency.stats())
+        return stats
+
+
+def get_host_limiter(host: str, verkada_org_id: Optional[str]) -> HostLimiter:
+    """
+    Returns the process-wide limiter for a Verkada host and Verkada org.
+
+    Args:
+        host (str): The request host, e.g. 'vprovision.command.verkada.com'.
+        verkada_org_id (str): The Verkada organization ID the request is made for.
+
+    Returns:
+        HostLimiter: The shared limiter for the pair.
+    """
+    key = (host, verkada_org_id)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = HostLimiter(key)
+                _limiters[key] = limiter
+    return limiter
+
+
+def get_limiter_stats(verkada_org_id: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Returns wait-time metrics for every limiter, optionally for one Verkada org.
+
+    Args:
+        verkada_org_id (str, optional): Only include limiters for this Verkada org.
+
+    Returns:
+        Dict[str, dict]: Stats keyed by host (and org when not filtered).
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    stats = {}
+    for limiter in limiters:
+        host, limiter_org_id = limiter.key
+        if verkada_org_id is not None and limiter_org_id != verkada_org_id:
+            continue
+        name = host if verkada_org_id is not None else f"{host}|{limiter_org_id}"
+        stats[name] = limiter.stats()
+    return stats
+
+
+def log_limiter_stats(verkada_org_id: Optional[str] = None) -> None:
+    """Logs the limiter wait-time metrics, optionally for one Verkada org."""
+    for name, stats in sorted(get_limiter_stats(verkada_org_id).items()):
+        logger.info(f"Verkada limiter {name}: {stats}")
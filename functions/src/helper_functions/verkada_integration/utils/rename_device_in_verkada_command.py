@@ -1,60 +1,75 @@
 from src.shared import db, logger
 
-from src.helper_functions.verkada_integration.utils.http_utils import requests_with_retry
+from src.helper_functions.verkada_integration.utils.verkada_client import get_verkada_client
+from src.helper_functions.verkada_integration.utils.async_verkada_client import VerkadaRequest
+from src.helper_functions.verkada_integration.utils.retry_policy import IDEMPOTENT_WRITE_POLICY, READ_POLICY
+from src.helper_functions.verkada_integration.utils.json_codec import loads_response
 
 from requests.exceptions import RequestException
 
-def rename_device_in_verkada_command(device_id, org_id, device_being_checked_out, verkada_bot_user_info=None):
-    """
-    Renames a device in the Verkada system based on its type and availability status.
-    
-    Parameters:
-        device_id (str): The ID of the device to be renamed.
-        org_id (str): The ID of the organization to which the device belongs.
-        device_being_checked_out (bool): Indicates whether the device is being checked out.
-        verkada_bot_user_info (dict, optional): A dictionary containing Verkada bot user information.
-            - org_id (str): The organization ID for the Verkada bot.
-            - auth_headers (dict): Authentication headers for API requests.
-            If not provided, the function will retrieve the bot user info using the organization's Verkada integration settings.
+CLASSIC_ALARM_SENSOR_PAYLOAD_TYPES = {
+    "Classic Alarm Door Contact Sensor": "doorContact",
+    "Classic Alarm Glass Break Sensor": "glassBreakSensor",
+    "Classic Alarm Motion Sensor": "motionSensor",
+    "Classic Alarm Panic Button": "panicButton",
+    "Classic Alarm Water Sensor": "waterSensor",
+    "Classic Alarm Wireless Relay": "wirelessRelay",
+}
+
+
+def get_verkada_device_name(device_serial_number, device_being_checked_out):
+    """Returns the Verkada name that reflects a device's checkout status."""
+    if device_being_checked_out:
+        return f"{device_serial_number} - Checked Out"
+    return f"{device_serial_number} - Available"
+
+
+def fetch_viewing_station_grids(verkada_client, verkada_org_short_name, verkada_org_id):
     """
+    Fetches the current grid data of every viewing station in the org.
 
-    org_verkada_integration_doc = db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaIntegrationSettings').get()
-    if not verkada_bot_user_info:
+    Viewing stations are renamed by resending their grid with a new name, so
+    the grid has to be read first.
 
-        verkada_bot_user_info = org_verkada_integration_doc.to_dict().get('orgVerkadaBotUserInfo', {})
-    if not verkada_bot_user_info:
+    Returns:
+        dict: Viewing station ID -> gridData.
+    """
+    fetch_current_grid_url = f"https://vvx.command.verkada.com/__v/{verkada_org_short_name}/device/list"
+    fetch_payload = {
+        'organizationId': verkada_org_id,
+    }
+    response = verkada_client.post(fetch_current_grid_url, json=fetch_payload, policy=READ_POLICY)
+    response.raise_for_status()
+    devices = loads_response(response).get('viewingStations', [])
+    return {device['viewingStationId']: device.get('gridData') for device in devices if device.get('viewingStationId')}
 
-        logger.error(f"Verkada bot user info not found for organization {org_id}.")
-        return
 
-    verkada_org_short_name = verkada_bot_user_info.get('orgVerkadaOrgShortName')
-    verkada_org_id = verkada_bot_user_info.get('org_id')
-    verkada_bot_headers = verkada_bot_user_info.get('auth_headers')
-    
-    deviceDoc = db.collection('organizations').document(org_id).collection('devices').document(device_id).get()
-    device_serial_number = deviceDoc.get('deviceSerialNumber')
-    device_verkada_device_id = deviceDoc.get('deviceVerkadaDeviceId')
-    device_verkada_device_type = deviceDoc.get('deviceVerkadaDeviceType')
-    
-    
-    if device_being_checked_out:
-        device_name = f"{device_serial_number} - Checked Out"
-    else:
-        device_name = f"{device_serial_number} - Available"
+def build_rename_request(device_data, device_name, verkada_org_short_name, verkada_org_id, viewing_station_grids=None):
+    """
+    Builds the Verkada API call that renames a device, without sending it.
+
+    Args:
+        device_data (dict): The device document data from Firestore.
+        device_name (str): The new name for the device.
+        verkada_org_short_name (str): The Verkada org short name used in URLs.
+        verkada_org_id (str): The Verkada organization ID.
+        viewing_station_grids (dict, optional): Viewing station ID -> gridData, required
+            to rename viewing stations (see fetch_viewing_station_grids).
+
+    Returns:
+        VerkadaRequest: The rename call, or None if the device type cannot be renamed.
+    """
+    device_verkada_device_id = device_data.get('deviceVerkadaDeviceId')
+    device_verkada_device_type = device_data.get('deviceVerkadaDeviceType')
+    context = (device_verkada_device_type, device_data.get('deviceSerialNumber'), device_name)
+
     if device_verkada_device_type == "Camera":
         rename_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/camera/name/set"
         payload = {
             "cameraId": device_verkada_device_id,
             "name": device_name,
         }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Access Controller" or device_verkada_device_type == "Input Output Board":
         rename_url = f"https://vcerberus.command.verkada.com/__v/{verkada_org_short_name}/access_controller/edit"
@@ -62,56 +77,28 @@ def rename_device_in_verkada_command(device_id, org_id, device_being_checked_out
                         "accessControllerId": device_verkada_device_id,
                         "name": device_name
                     }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Environmental Sensor":
         rename_url = f"https://vsensor.command.verkada.com/__v/{verkada_org_short_name}/devices/{device_verkada_device_id}"
         payload = {
                         "name": device_name
                     }
-        try:
-            response = requests_with_retry('patch', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('patch', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Intercom":
         rename_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/intercom/{device_verkada_device_id}"
         payload = {
                     "name": device_name
                 }
-        try:
-            response = requests_with_retry('patch', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"Intercom {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching Intercom info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming Intercom {device_serial_number}: {e}")
+        return VerkadaRequest('patch', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Gateway":
         rename_url = f"https://vnet.command.verkada.com/__v/{verkada_org_short_name}/devices/{device_verkada_device_id}"
         payload = {
                         "name": device_name
                     }
-        try:
-            response = requests_with_retry('patch', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('patch', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Command Connector":
         rename_url = f"https://vprovision.command.verkada.com/__v/{verkada_org_short_name}/vfortress/update_box"
@@ -119,162 +106,129 @@ def rename_device_in_verkada_command(device_id, org_id, device_being_checked_out
                         "deviceId": device_verkada_device_id,
                         "name": device_name
                     }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     #might not work have to check and test
     elif device_verkada_device_type == "Viewing Station":
-        fetch_current_grid_url = f"https://vvx.command.verkada.com/__v/{verkada_org_short_name}/device/list"
-        fetch_payload = {
-            'organizationId': verkada_org_id,
-        }
-        try:
-            response = requests_with_retry('post', fetch_current_grid_url, headers=verkada_bot_headers, json=fetch_payload)
-            response.raise_for_status()
-            devices = response.json().get('viewingStations', [])
-            device_info = next((device for device in devices if device['viewingStationId'] == device_verkada_device_id), None)
-            if device_info:
-                gridData = device_info.get('gridData')
-                gridData["name"] = device_name
-            else:
-                logger.error(f"Device {device_verkada_device_id} not found in the response.")
-                return
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-            return
-        except Exception as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info: {e}")
-            return
-
+        gridData = (viewing_station_grids or {}).get(device_verkada_device_id)
+        if gridData is None:
+            logger.error(f"Device {device_verkada_device_id} not found in the response.")
+            return None
+        gridData = dict(gridData, name=device_name)
         rename_url = f"https://vvx.command.verkada.com/__v/{verkada_org_short_name}/viewing_station/grid/update"
         payload = {
                     'gridData': gridData,
                     'viewingStationId': device_verkada_device_id
                 }
-        
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
-    
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
+
     elif device_verkada_device_type == "Desk Station":
         rename_url = f"https://api.command.verkada.com/__v/{verkada_org_short_name}/vinter/v1/user/organization/{verkada_org_id}/desk/{device_verkada_device_id}"
         payload = {
                     "name": device_name
                 }
-        try:
-            response = requests_with_retry('patch', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('patch', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
-    
     elif device_verkada_device_type == "Speaker":
         rename_url = f"https://vbroadcast.command.verkada.com/__v/{verkada_org_short_name}/management/speaker/update"
         payload = {
                     "deviceId": device_verkada_device_id,
                     "name": device_name,
                 }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Classic Alarm Hub Device":
-        device_verkada_site_id = deviceDoc.get('deviceVerkadaSiteId')
+        device_verkada_site_id = device_data.get('deviceVerkadaSiteId')
         rename_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/hub/{device_verkada_device_id}"
         payload = {
                     "siteId": device_verkada_site_id,
                     "name": device_name
                 }
-        try:
-            response = requests_with_retry('patch', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
-        
+        return VerkadaRequest('patch', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     elif device_verkada_device_type == "Classic Alarm Keypad":
-        rename_url = f"https://alarms.command.verkada.com/__v/{device_verkada_device_id}/device/keypad/update"
+        rename_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/keypad/update"
         payload = {
                     "keypadId": device_verkada_device_id,
                     "name": device_name
         }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"Keypad {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching Keypad info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming Keypad {device_serial_number}: {e}")
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
 
     # WILL ONLY WORK FOR CLASSIC ALARMS ATM
     # NEXT STEP - TRY CLASSIC ENDPOINT FIRST, IF NOT 200 PROCEED WITH NEW ALARM ENDPOINT
-    elif device_verkada_device_type == "Classic Alarm Door Contact Sensor" or device_verkada_device_type == 'Classic Alarm Glass Break Sensor' or device_verkada_device_type == 'lassic Alarm Motion Sensor' or device_verkada_device_type == 'Classic Alarm Panic Button' or device_verkada_device_type == 'Classic Alarm Water Sensor' or device_verkada_device_type == 'Classic Alarm Wireless Relay' or device_verkada_device_type == 'Classic Alarm Motion Sensor':
-
-        if device_verkada_device_type == "Classic Alarm Door Contact Sensor":
-            payload_type = "doorContact"
-        elif device_verkada_device_type == "Classic Alarm Glass Break Sensor":
-            payload_type = "glassBreakSensor"
-        elif device_verkada_device_type == "Classic Alarm Motion Sensor":
-            payload_type = "motionSensor"
-        elif device_verkada_device_type == "Classic Alarm Panic Button":
-            payload_type = "panicButton"
-        elif device_verkada_device_type == "Classic Alarm Water Sensor":
-            payload_type = "waterSensor"
-        elif device_verkada_device_type == "Classic Alarm Wireless Relay":
-            payload_type = "wirelessRelay"
-
+    elif device_verkada_device_type in CLASSIC_ALARM_SENSOR_PAYLOAD_TYPES:
         rename_url = f"https://alarms.command.verkada.com/__v/{verkada_org_short_name}/device/sensor/update"
         payload = {
                     "deviceId": device_verkada_device_id,
                     "name": device_name,
-                    "deviceType": payload_type
+                    "deviceType": CLASSIC_ALARM_SENSOR_PAYLOAD_TYPES[device_verkada_device_type]
                 }
-        try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
-        except RequestException as e:
-            logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
-        except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
-    
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
+
     elif device_verkada_device_type == "New Alarms Device":
         rename_url = f"https://vproconfig.command.verkada.com/__v/{verkada_org_short_name}/device/name/set"
         payload = {
                     "deviceId": device_verkada_device_id,
                     "name": device_name
                 }
+        return VerkadaRequest('post', rename_url, payload, IDEMPOTENT_WRITE_POLICY, context)
+
+    logger.info(f"Device type {device_verkada_device_type} not supported for renaming.")
+    return None
+
+
+def rename_device_in_verkada_command(device_id, org_id, device_being_checked_out, verkada_bot_user_info=None, retry_budget=None):
+    """
+    Renames a device in the Verkada system based on its type and availability status.
+
+    Parameters:
+        device_id (str): The ID of the device to be renamed.
+        org_id (str): The ID of the organization to which the device belongs.
+        device_being_checked_out (bool): Indicates whether the device is being checked out.
+        verkada_bot_user_info (dict, optional): A dictionary containing Verkada bot user information.
+            - org_id (str): The organization ID for the Verkada bot.
+            - auth_headers (dict): Authentication headers for API requests.
+            If not provided, the function will retrieve the bot user info using the organization's Verkada integration settings.
+        retry_budget (RetryBudget, optional): Caller-owned cap on retries, shared across a cleaner run.
+    """
+
+    if not verkada_bot_user_info:
+        org_verkada_integration_doc = db.collection('organizations').document(org_id).collection('sensitiveConfigs').document('verkadaIntegrationSettings').get()
+        verkada_bot_user_info = org_verkada_integration_doc.to_dict().get('orgVerkadaBotUserInfo', {})
+    if not verkada_bot_user_info:
+
+        logger.error(f"Verkada bot user info not found for organization {org_id}.")
+        return
+
+    verkada_org_short_name = verkada_bot_user_info.get('orgVerkadaOrgShortName')
+    verkada_org_id = verkada_bot_user_info.get('org_id')
+    verkada_client = get_verkada_client(verkada_bot_user_info, retry_budget=retry_budget)
+
+    device_data = db.collection('organizations').document(org_id).collection('devices').document(device_id).get().to_dict() or {}
+    device_serial_number = device_data.get('deviceSerialNumber')
+    device_verkada_device_type = device_data.get('deviceVerkadaDeviceType')
+    device_name = get_verkada_device_name(device_serial_number, device_being_checked_out)
+
+    viewing_station_grids = None
+    if device_verkada_device_type == "Viewing Station":
         try:
-            response = requests_with_retry('post', rename_url, headers=verkada_bot_headers, json=payload)
-            response.raise_for_status()
-            logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
+            viewing_station_grids = fetch_viewing_station_grids(verkada_client, verkada_org_short_name, verkada_org_id)
         except RequestException as e:
             logger.error(f"Error fetching {device_verkada_device_type} info after retries: {e}")
+            return
         except Exception as e:
-            logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
+            logger.error(f"Error fetching {device_verkada_device_type} info: {e}")
+            return
+
+    rename_request = build_rename_request(device_data, device_name, verkada_org_short_name, verkada_org_id, viewing_station_grids)
+    if rename_request is None:
+        return
 
-    else:
-        logger.info(f"Device type {device_verkada_device_type} not supported for renaming.")
\ No newline at end of file
+    try:
+        response = verkada_client.request(rename_request.method, rename_request.url, json=rename_request.json, policy=rename_request.policy)
+        response.raise_for_status()
+        logger.info(f"{device_verkada_device_type} {device_serial_number} renamed successfully to {device_name}.")
+    except RequestException as e:
+        logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number} after retries: {e}")
+    except Exception as e:
+        logger.error(f"Error renaming {device_verkada_device_type} {device_serial_number}: {e}")
@@ -0,0 +1,192 @@
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from requests.exceptions import ConnectionError, ConnectTimeout, HTTPError, RequestException, Timeout, ChunkedEncodingError
+from urllib3.exceptions import NewConnectionError
+
+# Statuses that indicate the request was not processed and can safely be resent.
+THROTTLED_STATUSES = frozenset({429, 503})
+# Statuses worth retrying when resending the request has no side effects.
+TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Describes how a Verkada call site retries failed requests.
+
+    Attributes:
+        name (str): Short name used in log messages.
+        max_attempts (int): Total attempts, including the first one.
+        base_delay (float): Backoff base in seconds; attempt n waits up to base_delay * 2**(n-1).
+        max_delay (float): Cap on a single backoff sleep in seconds.
+        retry_statuses (frozenset): HTTP statuses that are retried.
+        retry_after_statuses (frozenset): HTTP statuses whose Retry-After header is honored.
+        retry_read_errors (bool): Whether to retry read timeouts and dropped connections,
+            where the server may already have processed the request.
+        max_elapsed (float): Total seconds a single call may spend across attempts and sleeps.
+        hedge (bool): Whether a slow attempt is hedged with a second identical
+            request (see hedging.send_hedged). Only for calls safe to send twice.
+    """
+    name: str
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    retry_statuses: frozenset
+    retry_after_statuses: frozenset = THROTTLED_STATUSES
+    retry_read_errors: bool = True
+    max_elapsed: float = 90.0
+    hedge: bool = False
+
+
+# GETs and list/search POSTs that only read data.
+READ_POLICY = RetryPolicy(
+    name='read', max_attempts=5, base_delay=0.5, max_delay=8.0,
+    retry_statuses=TRANSIENT_STATUSES,
+)
+# Large list calls whose slowest response decides a sync's wall time; slow attempts are hedged.
+HEDGED_READ_POLICY = RetryPolicy(
+    name='hedged_read', max_attempts=5, base_delay=0.5, max_delay=8.0,
+    retry_statuses=TRANSIENT_STATUSES, hedge=True,
+)
+# Writes that set an absolute value (PATCH, move/rename/grant POSTs) and can be resent.
+IDEMPOTENT_WRITE_POLICY = RetryPolicy(
+    name='idempotent_write', max_attempts=4, base_delay=0.5, max_delay=8.0,
+    retry_statuses=TRANSIENT_STATUSES,
+)
+# Writes such as users/delete where a duplicate could have side effects: only
+# retried when the server says it did not process the request.
+NON_IDEMPOTENT_POLICY = RetryPolicy(
+    name='non_idempotent', max_attempts=3, base_delay=1.0, max_delay=8.0,
+    retry_statuses=THROTTLED_STATUSES, retry_read_errors=False,
+)
+
+
+def default_policy_for_method(method: str) -> RetryPolicy:
+    """
+    Returns the retry policy used when a call site does not choose one.
+
+    Args:
+        method (str): The HTTP method.
+
+    Returns:
+        RetryPolicy: READ_POLICY for GET/HEAD, IDEMPOTENT_WRITE_POLICY for
+        PUT/PATCH/DELETE, and NON_IDEMPOTENT_POLICY for everything else.
+    """
+    method = method.lower()
+    if method in ('get', 'head', 'options'):
+        return READ_POLICY
+    if method in ('put', 'patch', 'delete'):
+        return IDEMPOTENT_WRITE_POLICY
+    return NON_IDEMPOTENT_POLICY
+
+
+class RetryBudget:
+    """
+    Thread-safe cap on the total number of retries a caller (e.g. one cleaner
+    run for one org) may spend across all of its requests. Once exhausted,
+    failed requests are raised immediately instead of being retried.
+    """
+
+    def __init__(self, max_retries: int = 200):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_consume(self) -> bool:
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.used >= self.max_retries
+
+
+def _is_connect_error(exc: RequestException) -> bool:
+    """True when the request failed before any bytes could reach the server."""
+    if isinstance(exc, ConnectTimeout):
+        return True
+    if isinstance(exc, ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], 'reason', None)
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def is_retryable(exc: RequestException, policy: RetryPolicy) -> bool:
+    """
+    Classifies a failed request as retryable or permanent under a policy.
+
+    Args:
+        exc (RequestException): The exception raised for the attempt.
+        policy (RetryPolicy): The call site's policy.
+
+    Returns:
+        bool: True if the request should be attempted again.
+    """
+    if isinstance(exc, HTTPError):
+        response = exc.response
+        return response is not None and response.status_code in policy.retry_statuses
+    if _is_connect_error(exc):
+        return True
+    if isinstance(exc, (Timeout, ConnectionError, ChunkedEncodingError)):
+        return policy.retry_read_errors
+    return False
+
+
+def parse_retry_after(response) -> Optional[float]:
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+
+    Args:
+        response (requests.Response): The throttled response.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def compute_backoff(attempt: int, policy: RetryPolicy, exc: Optional[RequestException] = None) -> float:
+    """
+    Returns how long to sleep before the next attempt.
+
+    Uses exponential backoff with full jitter, unless the server sent a
+    Retry-After header on a throttling status, in which case that is honored.
+
+    Args:
+        attempt (int): The number of the attempt that just failed (1-based).
+        policy (RetryPolicy): The call site's policy.
+        exc (RequestException, optional): The exception from the failed attempt.
+
+    Returns:
+        float: Seconds to sleep.
+    """
+    response = getattr(exc, 'response', None)
+    if response is not None and response.status_code in policy.retry_after_statuses:
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            return retry_after
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1))))
@@ -1,5 +1,6 @@
 import concurrent.futures
 from src.helper_functions.verkada_integration.utils.check_verkada_device_type import check_verkada_device_type
+from src.helper_functions.verkada_integration.utils.firestore_writes import FirestoreWriteEngine
 from src.shared import db, logger
 
 
@@ -20,10 +21,10 @@ def _get_device_update_data(args):
         logger.error(f"Error checking device type for {doc_id} ({device_serial_number}): {e}")
         return None # Indicate error or inability to process
 
-def update_all_devices_verkada_device_type(org_id: str, max_workers: int = 10, batch_size: int = 499) -> None:
+def update_all_devices_verkada_device_type(org_id: str, max_workers: int = 10) -> None:
     """
     Updates the Verkada device type for all devices in an organization concurrently
-    using batch writes.
+    using bulk writes.
     """
     org_ref = db.collection('organizations').document(org_id)
     devices_ref = org_ref.collection('devices')
@@ -44,34 +45,9 @@ def update_all_devices_verkada_device_type(org_id: str, max_workers: int = 10, b
         # Filter out None results (errors or no update needed)
         update_data_list = [result for result in results if result is not None]
 
-    # Process updates in batches
-    batch = db.batch()
-    batch_count = 0
-    total_updated = 0
-    for doc_id, device_verkada_device_type in update_data_list:
-        doc_ref = devices_ref.document(doc_id)
-        batch.update(doc_ref, {'deviceVerkadaDeviceType': device_verkada_device_type})
-        batch_count += 1
-        total_updated += 1
+    # Write the new types through the shared bulk write engine
+    with FirestoreWriteEngine('device type') as writes:
+        for doc_id, device_verkada_device_type in update_data_list:
+            writes.update(devices_ref.document(doc_id), {'deviceVerkadaDeviceType': device_verkada_device_type})
 
-        if batch_count >= batch_size:
-            try:
-                logger.info(f"Committing batch of {batch_count} updates...")
-                batch.commit()
-                logger.info(f"Batch committed successfully.")
-            except Exception as e:
-                logger.error(f"Error committing batch: {e}")
-            # Start a new batch
-            batch = db.batch()
-            batch_count = 0
-
-    # Commit any remaining updates in the last batch
-    if batch_count > 0:
-        try:
-            logger.info(f"Committing final batch of {batch_count} updates...")
-            batch.commit()
-            logger.info(f"Final batch committed successfully.")
-        except Exception as e:
-            logger.error(f"Error committing final batch: {e}")
-
-    logger.info(f"Finished updating Verkada device types. Attempted to update {total_updated} devices.")
+    logger.info(f"Finished updating Verkada device types. Updated {len(writes.succeeded)} of {len(update_data_list)} devices.")
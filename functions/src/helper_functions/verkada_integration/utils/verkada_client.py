@@ -0,0 +1,139 @@
+import copy
+import threading
+from urllib.parse import urlparse
+from src.helper_functions.verkada_integration.utils.http_utils import get_http_session, requests_with_retry, stream_with_retry
+from src.helper_functions.verkada_integration.utils.rate_limiter import get_host_limiter
+from src.helper_functions.verkada_integration.utils.circuit_breaker import get_circuit_breaker
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class VerkadaClient:
+    """
+    Thin wrapper around the shared pooled session that binds a Verkada org's
+    bot auth headers once, so callers only pass the URL and payload.
+
+    Instances are safe to share across ThreadPoolExecutor workers: they hold no
+    per-request state and the underlying connection pool is thread-safe. Every
+    request passes through the shared per-host limiter and the endpoint
+    family's circuit breaker for the client's Verkada org, however many
+    worker pools are calling concurrently.
+    """
+
+    def __init__(self, verkada_bot_user_info: dict):
+        self.org_id = verkada_bot_user_info.get('org_id')
+        self.org_name = verkada_bot_user_info.get('org_name') or verkada_bot_user_info.get('orgVerkadaOrgShortName')
+        self.user_id = verkada_bot_user_info.get('user_id')
+        self.auth_headers = dict(verkada_bot_user_info.get('auth_headers') or {})
+        self.session = get_http_session()
+        self.retry_budget = None
+        self.deadline = None
+        self.http_counts = None
+
+    def bind(self, retry_budget=None, deadline=None, http_counts=None):
+        """
+        Returns a view of this client that shares its session and auth headers
+        but charges retries to the given caller-owned budget, stops at the
+        caller's deadline and counts its calls in the caller's run counts.
+
+        Args:
+            retry_budget (RetryBudget, optional): The caller's retry budget.
+            deadline (Deadline, optional): The caller's run deadline.
+            http_counts (RunHttpCounts, optional): The caller's run HTTP counts.
+
+        Returns:
+            VerkadaClient: The bound client.
+        """
+        bound = copy.copy(self)
+        bound.retry_budget = retry_budget
+        bound.deadline = deadline
+        bound.http_counts = http_counts
+        return bound
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request with the org's auth headers through requests_with_retry.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL for the request.
+            **kwargs: Additional arguments for requests_with_retry (e.g. policy,
+                      json, timeout). Any 'headers' passed are merged over the
+                      bound auth headers.
+
+        Returns:
+            requests.Response: The successful response.
+        """
+        return requests_with_retry(method, url, **self._request_kwargs(url, kwargs))
+
+    def stream(self, method, url, decode, **kwargs):
+        """
+        Sends a streamed request with the org's auth headers and decodes its
+        body with decode(response), through stream_with_retry: a connection
+        that breaks while the body is read is retried like a failed request.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL for the request.
+            decode (Callable[[requests.Response], Any]): Reads the response and returns the result.
+                      Called again from scratch for every retried read.
+            **kwargs: Additional arguments for stream_with_retry (e.g. policy, json).
+
+        Returns:
+            Any: What decode returned.
+        """
+        return stream_with_retry(method, url, decode, **self._request_kwargs(url, kwargs))
+
+    def _request_kwargs(self, url, kwargs):
+        """Adds the bound headers, budget, deadline, run counts, limiter and breaker to a request's arguments."""
+        headers = dict(self.auth_headers)
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('retry_budget', self.retry_budget)
+        kwargs.setdefault('limiter', get_host_limiter(urlparse(url).hostname, self.org_id))
+        kwargs.setdefault('breaker', get_circuit_breaker(url, self.org_id))
+        kwargs.setdefault('verkada_org_id', self.org_id)
+        kwargs.setdefault('deadline', self.deadline)
+        kwargs.setdefault('http_counts', self.http_counts)
+        return {'session': self.session, 'headers': headers, **kwargs}
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('patch', url, **kwargs)
+
+
+def get_verkada_client(verkada_bot_user_info: dict, retry_budget=None, deadline=None, http_counts=None) -> VerkadaClient:
+    """
+    Returns the process-wide VerkadaClient for the bot user's Verkada org.
+
+    Clients are cached per Verkada org so warm instances reuse them across
+    invocations. A new client is bound when the org's auth headers change
+    (e.g. after the bot user is re-provisioned).
+
+    Args:
+        verkada_bot_user_info (dict): The Verkada bot user info for the org.
+        retry_budget (RetryBudget, optional): Caller-owned cap on total retries
+            across every request made through the returned client.
+        deadline (Deadline, optional): The caller's run deadline, applied to
+            every request made through the returned client.
+        http_counts (RunHttpCounts, optional): The caller's run HTTP counts, updated by
+            every request made through the returned client.
+
+    Returns:
+        VerkadaClient: The client bound to the org's auth headers.
+    """
+    verkada_org_id = verkada_bot_user_info.get('org_id')
+    auth_headers = verkada_bot_user_info.get('auth_headers') or {}
+    with _clients_lock:
+        client = _clients.get(verkada_org_id)
+        if client is None or client.auth_headers != auth_headers or client.org_name != verkada_bot_user_info.get('org_name', client.org_name):
+            client = VerkadaClient(verkada_bot_user_info)
+            _clients[verkada_org_id] = client
+    if retry_budget is not None or deadline is not None or http_counts is not None:
+        return client.bind(retry_budget=retry_budget, deadline=deadline, http_counts=http_counts)
+    return client
@@ -0,0 +1,132 @@
+from typing import Dict, List, NamedTuple, Optional
+
+# Threads sync_verkada_device_ids writes device types on. The listings are fetched by the inventory snapshot.
+# How many requests reach Verkada at once is still decided per host by the adaptive limit.
+DEVICE_SYNC_MAX_WORKERS = 8
+
+# Source whose items come from the cached app/v2/init payload rather than their own request.
+APP_INIT_SOURCE = 'app_init'
+
+
+class VerkadaDeviceSource(NamedTuple):
+    """
+    A Verkada list endpoint one or more device types are read from. The URL and
+    string payload values are formatted with org_short_name and org_id.
+    """
+    method: Optional[str]
+    url: Optional[str]
+    payload: dict
+
+
+class VerkadaDeviceType(NamedTuple):
+    """How one Verkada device type is read and written to the devices collection."""
+    # deviceVerkadaDeviceType written for these devices
+    device_type: str
+    # Key of the VERKADA_DEVICE_SOURCES entry the items are listed by
+    source: str
+    # Key of the item list in the source's response; None when the response is the list
+    result_key: Optional[str]
+    id_field: str
+    serial_field: str
+    # Device document field -> item field, for extra fields written along with the ID
+    extra_fields: Dict[str, str] = {}
+    # Items whose serial number check_verkada_device_type classifies as this type are
+    # left to that type's own entry
+    reclassified_as: Optional[str] = None
+
+    def to_record(self, item: dict) -> 'VerkadaDeviceRecord':
+        """Reduces a decoded Verkada item to the fields the sync reads."""
+        serial_number = item.get(self.serial_field)
+        if self.serial_field == 'claimedSerialNumber' and not serial_number:
+            # Items without a claimed serial number fall back to their serialNumber
+            serial_number = item.get('serialNumber')
+        extra = {RECORD_EXTRA_FIELDS[dest_key]: item.get(src_key) for dest_key, src_key in self.extra_fields.items()}
+        return VerkadaDeviceRecord(item.get(self.id_field), serial_number, **extra)
+
+
+class VerkadaDeviceRecord(NamedTuple):
+    """
+    One listed Verkada device, kept instead of the item Verkada returned, which
+    carries every field of the device. The device type is the list it is in.
+    """
+    device_id: Optional[str]
+    serial_number: Optional[str]
+    site_id: Optional[str] = None
+    alarm_system_id: Optional[str] = None
+
+    def extra_data(self) -> dict:
+        """The device document fields written along with the ID, for those the record has."""
+        return {dest_key: getattr(self, attribute) for dest_key, attribute in RECORD_EXTRA_FIELDS.items()
+                if getattr(self, attribute) is not None}
+
+
+# Device document field of VerkadaDeviceType.extra_fields -> VerkadaDeviceRecord attribute holding it
+RECORD_EXTRA_FIELDS = {
+    'deviceVerkadaSiteId': 'site_id',
+    'deviceVerkadaNewAlarmsSystemId': 'alarm_system_id',
+}
+
+
+VERKADA_DEVICE_SOURCES: Dict[str, VerkadaDeviceSource] = {
+    # app/v2/init is shared with the site id sync and permission grants
+    APP_INIT_SOURCE: VerkadaDeviceSource(None, None, {}),
+    'access_controllers': VerkadaDeviceSource(
+        'get', "https://vcerberus.command.verkada.com/__v/{org_short_name}/access/v2/user/access_controllers", {}),
+    'sensors': VerkadaDeviceSource(
+        'post', "https://vsensor.command.verkada.com/__v/{org_short_name}/devices/list", {"organizationId": "{org_id}", "favoritesOnly": False}),
+    'gateways': VerkadaDeviceSource(
+        'post', "https://vnet.command.verkada.com/__v/{org_short_name}/devices/list", {"organizationId": "{org_id}"}),
+    'command_connectors': VerkadaDeviceSource(
+        'post', "https://vprovision.command.verkada.com/__v/{org_short_name}/vfortress/list_boxes", {"organizationId": "{org_id}"}),
+    'viewing_stations': VerkadaDeviceSource(
+        'post', "https://vvx.command.verkada.com/__v/{org_short_name}/device/list", {"organizationId": "{org_id}"}),
+    'speakers': VerkadaDeviceSource(
+        'post', "https://vbroadcast.command.verkada.com/__v/{org_short_name}/management/speaker/list", {"organizationId": "{org_id}"}),
+    'classic_alarm_keypads': VerkadaDeviceSource(
+        'post', "https://alarms.command.verkada.com/__v/{org_short_name}/device/keypad/get_all", {"organizationId": "{org_id}"}),
+    'classic_alarm_devices': VerkadaDeviceSource(
+        'post', "https://alarms.command.verkada.com/__v/{org_short_name}/device/get_all", {"organizationId": "{org_id}"}),
+    'new_alarms': VerkadaDeviceSource(
+        'post', "https://vproconfig.command.verkada.com/__v/{org_short_name}/org/get_devices_and_alarm_systems", {}),
+    'intercoms_and_desk_stations': VerkadaDeviceSource(
+        'get', "https://api.command.verkada.com/__v/{org_short_name}/vinter/v1/user/organization/{org_id}/device", {}),
+}
+
+VERKADA_DEVICE_TYPES: List[VerkadaDeviceType] = [
+    VerkadaDeviceType("Camera", APP_INIT_SOURCE, "cameras", "cameraId", "serialNumber", reclassified_as="Intercom"),
+    VerkadaDeviceType("Access Controller", 'access_controllers', "accessControllers", "accessControllerId", "serialNumber"),
+    VerkadaDeviceType("Environmental Sensor", 'sensors', "sensorDevice", "deviceId", "claimedSerialNumber"),
+    VerkadaDeviceType("Gateway", 'gateways', None, "device_id", "claimed_serial_number"),
+    VerkadaDeviceType("Command Connector", 'command_connectors', None, "deviceId", "claimedSerialNumber"),
+    VerkadaDeviceType("Viewing Station", 'viewing_stations', "viewingStations", "viewingStationId", "claimedSerialNumber"),
+    VerkadaDeviceType("Speaker", 'speakers', "garfunkel", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Keypad", 'classic_alarm_keypads', "keypad", "deviceId", "claimedSerialNumber"),
+    VerkadaDeviceType("New Alarms Device", 'new_alarms', "devices", "id", "serialNumber",
+                      extra_fields={"deviceVerkadaNewAlarmsSystemId": "alarmSystemId"}),
+    VerkadaDeviceType("Desk Station", 'intercoms_and_desk_stations', "deskApps", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Intercom", 'intercoms_and_desk_stations', "intercoms", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Hub Device", 'classic_alarm_devices', "hubDevice", "deviceId", "claimedSerialNumber",
+                      extra_fields={"deviceVerkadaSiteId": "siteId"}, reclassified_as="Classic Alarm Keypad"),
+    VerkadaDeviceType("Classic Alarm Door Contact Sensor", 'classic_alarm_devices', "doorContactSensor", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Glass Break Sensor", 'classic_alarm_devices', "glassBreakSensor", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Motion Sensor", 'classic_alarm_devices', "motionSensor", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Panic Button", 'classic_alarm_devices', "panicButton", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Water Sensor", 'classic_alarm_devices', "waterSensor", "deviceId", "serialNumber"),
+    VerkadaDeviceType("Classic Alarm Wireless Relay", 'classic_alarm_devices', "wirelessRelay", "deviceId", "serialNumber"),
+]
+
+
+def format_device_source(source: VerkadaDeviceSource, org_short_name: str, org_id: str) -> tuple:
+    """Returns (method, url, payload) for a source in one Verkada org."""
+    values = {'org_short_name': org_short_name, 'org_id': org_id}
+    url = source.url.format(**values) if source.url else None
+    payload = {key: value.format(**values) if isinstance(value, str) else value for key, value in source.payload.items()}
+    return source.method, url, payload
+
+
+def device_types_by_source(device_types: List[VerkadaDeviceType] = VERKADA_DEVICE_TYPES) -> Dict[str, List[VerkadaDeviceType]]:
+    """Groups device types by the source they are listed by, keeping registry order."""
+    grouped: Dict[str, List[VerkadaDeviceType]] = {}
+    for device_type in device_types:
+        grouped.setdefault(device_type.source, []).append(device_type)
+    return grouped
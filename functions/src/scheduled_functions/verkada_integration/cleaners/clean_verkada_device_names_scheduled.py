@@ -2,6 +2,8 @@ from firebase_functions import scheduler_fn
 from src.helper_functions.verkada_integration.cleaners.clean_verkada_device_names import clean_verkada_device_names
 from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpers import get_site_cleaner_enabled_orgs_data
 from src.shared import logger
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -11,6 +13,7 @@ def clean_verkada_device_names_scheduled(event: scheduler_fn.ScheduledEvent) ->
     Scheduled function to sync Verkada device names for all enabled organizations every 24 hours.
     """
     logger.info("Starting scheduled Verkada permissions sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         site_cleaner_enabled_orgs = get_site_cleaner_enabled_orgs_data()
@@ -19,11 +22,17 @@ def clean_verkada_device_names_scheduled(event: scheduler_fn.ScheduledEvent) ->
             logger.info("No organizations found with Verkada site cleaner enabled.")
             return
         for org_id, verkada_bot_user_info in site_cleaner_enabled_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'clean_verkada_device_names_scheduled', deadline.pop_skipped())
+                continue
             try:
-                clean_verkada_device_names(org_id, verkada_bot_user_info)
+                clean_verkada_device_names(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully cleaned Verkada device names for organization {org_id}.")
             except Exception as e:
                 logger.error(f"Error cleaning Verkada device names for organization {org_id}: {str(e)}")
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'clean_verkada_device_names_scheduled')
+            save_deadline_skips(org_id, 'clean_verkada_device_names_scheduled', deadline.pop_skipped())
 
         logger.info("Finished scheduled Verkada device name cleaning.")
 
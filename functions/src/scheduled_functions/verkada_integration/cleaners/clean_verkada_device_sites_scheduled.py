@@ -5,6 +5,8 @@ from src.helper_functions.verkada_integration.cleaners.clean_verkada_device_site
 from src.helper_functions.verkada_integration.syncers.sync_verkada_site_ids import sync_verkada_site_ids
 from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpers import get_site_cleaner_enabled_orgs_data
 from src.helper_functions.verkada_integration.cleaners.clean_orphaned_sites import clean_orphaned_sites
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -14,6 +16,7 @@ def clean_verkada_device_sites_scheduled(event: scheduler_fn.ScheduledEvent) ->
     Scheduled function to sync Verkada device sites for all enabled organizations every 24 hours.
     """
     logger.info("Starting scheduled Verkada device sites sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         site_cleaner_enabled_orgs = get_site_cleaner_enabled_orgs_data()
@@ -21,16 +24,22 @@ def clean_verkada_device_sites_scheduled(event: scheduler_fn.ScheduledEvent) ->
             logger.info("No organizations found with Verkada site cleaner enabled.")
             return
         for org_id, verkada_bot_user_info in site_cleaner_enabled_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'clean_verkada_device_sites_scheduled', deadline.pop_skipped())
+                continue
             try:
-                clean_verkada_device_sites(org_id, verkada_bot_user_info)
+                clean_verkada_device_sites(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully cleaned Verkada device sites for organization {org_id}.")
-                sync_verkada_site_ids(org_id, verkada_bot_user_info)
+                sync_verkada_site_ids(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully synced Verkada device sites id for organization {org_id}.")
-                clean_orphaned_sites(org_id, verkada_bot_user_info)
+                clean_orphaned_sites(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully cleaned orphaned sites for organization {org_id}.")
             except Exception as e:
                 logger.error(f"Error processing organization {org_id}: {str(e)}")
                 #Continue to the next organization even if one fails
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'clean_verkada_device_sites_scheduled')
+            save_deadline_skips(org_id, 'clean_verkada_device_sites_scheduled', deadline.pop_skipped())
     except Exception as e:
         logger.error(f"Error in scheduled function: {str(e)}")
         # Handle any errors that occur during the scheduled function execution
@@ -4,6 +4,8 @@ from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpe
 
 from firebase_functions import scheduler_fn
 from src.shared import logger
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -14,6 +16,7 @@ def clean_verkada_user_groups_scheduled(event: scheduler_fn.ScheduledEvent) -> N
     Scheduled function to sync Verkada user groups for all enabled organizations every 24 hours.
     """
     logger.info("Starting scheduled Verkada user group sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         site_cleaner_enabled_orgs = get_site_cleaner_enabled_orgs_data()
@@ -21,14 +24,20 @@ def clean_verkada_user_groups_scheduled(event: scheduler_fn.ScheduledEvent) -> N
             logger.info("No organizations found with Verkada user group sync enabled.")
             return
         for org_id, verkada_bot_user_info in site_cleaner_enabled_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'clean_verkada_user_groups_scheduled', deadline.pop_skipped())
+                continue
             try:
-                sync_verkada_user_groups(org_id, verkada_bot_user_info)
-                clean_verkada_user_groups(org_id, verkada_bot_user_info)
+                sync_verkada_user_groups(org_id, verkada_bot_user_info, deadline=deadline)
+                clean_verkada_user_groups(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully synced and cleaned Verkada groups for organization {org_id}.")
 
             except Exception as e:
                 logger.error(f"Error processing organization {org_id}: {str(e)}")
                 # Continue to the next organization even if one fails
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'clean_verkada_user_groups_scheduled')
+            save_deadline_skips(org_id, 'clean_verkada_user_groups_scheduled', deadline.pop_skipped())
 
         logger.info("Finished scheduled Verkada groups sync.")
 
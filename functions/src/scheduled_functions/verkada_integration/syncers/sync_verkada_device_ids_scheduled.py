@@ -2,6 +2,9 @@ from firebase_functions import scheduler_fn
 from src.shared import logger
 from src.helper_functions.verkada_integration.syncers.sync_verkada_device_ids import sync_verkada_device_ids
 from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpers import get_verkada_integrated_orgs_data
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.integration_runs import IntegrationRunReport
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -13,6 +16,7 @@ def sync_verkada_device_ids_scheduled(event: scheduler_fn.ScheduledEvent) -> Non
     Scheduled function to sync Verkada device IDs for all enabled organizations every 24 hours.
     """
     logger.info("Starting scheduled Verkada device IDs sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         verkada_integrated_orgs = get_verkada_integrated_orgs_data()
@@ -20,13 +24,22 @@ def sync_verkada_device_ids_scheduled(event: scheduler_fn.ScheduledEvent) -> Non
             logger.info("No organizations found with Verkada integration enabled.")
             return
         for org_id, verkada_bot_user_info in verkada_integrated_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'sync_verkada_device_ids_scheduled', deadline.pop_skipped())
+                continue
+            run_report = IntegrationRunReport(org_id, 'sync_verkada_device_ids_scheduled', verkada_bot_user_info.get('org_id'))
             try:
-                sync_verkada_device_ids(org_id, verkada_bot_user_info)
+                sync_verkada_device_ids(org_id, verkada_bot_user_info, deadline=deadline, report=run_report)
                 logger.info(f"Successfully synced Verkada device IDs for organization {org_id}.")
+                run_report.finish()
 
             except Exception as e:
                 logger.error(f"Error processing organization {org_id}: {str(e)}")
+                run_report.finish(error=e)
                 # Continue to the next organization even if one fails
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'sync_verkada_device_ids_scheduled')
+            save_deadline_skips(org_id, 'sync_verkada_device_ids_scheduled', deadline.pop_skipped())
 
         logger.info("Finished scheduled Verkada device IDs sync.")
 
@@ -2,6 +2,8 @@ from firebase_functions import scheduler_fn, https_fn
 from src.shared import logger
 from src.helper_functions.verkada_integration.utils.grant_all_verkada_permissions import grant_all_verkada_permissions
 from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpers import get_verkada_integrated_orgs_data
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -12,6 +14,7 @@ def sync_verkada_permissions_scheduled(event: scheduler_fn.ScheduledEvent) -> No
     Scheduled function to sync Verkada permissions for all enabled organizations every 24 hours.
     """
     logger.info("Starting scheduled Verkada permissions sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         verkada_integrated_orgs = get_verkada_integrated_orgs_data()
@@ -19,13 +22,19 @@ def sync_verkada_permissions_scheduled(event: scheduler_fn.ScheduledEvent) -> No
             logger.info("No organizations found with Verkada integration enabled.")
             return
         for org_id, verkada_bot_user_info in verkada_integrated_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'sync_verkada_permissions_scheduled', deadline.pop_skipped())
+                continue
             try:
-                grant_all_verkada_permissions(verkada_bot_user_info)
+                grant_all_verkada_permissions(verkada_bot_user_info, deadline=deadline, org_id=org_id)
                 logger.info(f"Successfully synced Verkada permissions for organization {org_id}.")
 
             except Exception as e:
                 logger.error(f"Error processing organization {org_id}: {str(e)}")
                 # Continue to the next organization even if one fails
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'sync_verkada_permissions_scheduled')
+            save_deadline_skips(org_id, 'sync_verkada_permissions_scheduled', deadline.pop_skipped())
 
         logger.info("Finished scheduled Verkada permissions sync.")
 
@@ -2,6 +2,8 @@ from firebase_functions import scheduler_fn
 from src.shared import logger
 from src.helper_functions.verkada_integration.syncers.sync_verkada_site_ids import sync_verkada_site_ids
 from src.helper_functions.verkada_integration.utils.scheduled_function_org_helpers import get_verkada_integrated_orgs_data
+from src.helper_functions.verkada_integration.utils.http_metrics import save_http_metrics
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, save_deadline_skips
 
 
 
@@ -11,6 +13,7 @@ def sync_verkada_site_ids_scheduled(event: scheduler_fn.ScheduledEvent) -> None:
     Scheduled function to sync Verkada site IDs for all enabled organizations every 24 horus.
     """
     logger.info("Starting scheduled Verkada device IDs sync.")
+    deadline = Deadline.from_function_timeout()
 
     try:
         verkada_integrated_orgs = get_verkada_integrated_orgs_data()
@@ -18,13 +21,19 @@ def sync_verkada_site_ids_scheduled(event: scheduler_fn.ScheduledEvent) -> None:
             logger.info("No organizations found with Verkada integration enabled.")
             return
         for org_id, verkada_bot_user_info in verkada_integrated_orgs:
+            if deadline.expired:
+                deadline.skip("organization not started")
+                save_deadline_skips(org_id, 'sync_verkada_site_ids_scheduled', deadline.pop_skipped())
+                continue
             try:
-                sync_verkada_site_ids(org_id, verkada_bot_user_info)
+                sync_verkada_site_ids(org_id, verkada_bot_user_info, deadline=deadline)
                 logger.info(f"Successfully synced Verkada device IDs for organization {org_id}.")
 
             except Exception as e:
                 logger.error(f"Error processing organization {org_id}: {str(e)}")
                 # Continue to the next organization even if one fails
+            save_http_metrics(org_id, verkada_bot_user_info.get('org_id'), 'sync_verkada_site_ids_scheduled')
+            save_deadline_skips(org_id, 'sync_verkada_site_ids_scheduled', deadline.pop_skipped())
 
         logger.info("Finished scheduled Verkada device IDs sync.")
 
@@ -0,0 +1,26 @@
+"""
+Test setup. src.shared creates its Firestore client at import time, so a
+Firebase app is initialized here against the Firestore emulator, with
+anonymous credentials. Unit tests never reach it; tests that do need it
+should start the emulator first (firebase emulators:start --only firestore).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+
+import firebase_admin
+from firebase_admin import credentials
+from google.auth.credentials import AnonymousCredentials
+
+
+class _EmulatorCredential(credentials.Base):
+    """Anonymous credentials; the emulator does not check them."""
+
+    def get_credential(self):
+        return AnonymousCredentials()
+
+
+if not firebase_admin._apps:
+    firebase_admin.initialize_app(_EmulatorCredential(), options={'projectId': os.environ.get('GCLOUD_PROJECT', 'demo-webbpulse-inventory-management')})
@@ -0,0 +1,92 @@
+import threading
+import uuid
+
+import pytest
+
+from src.helper_functions.verkada_integration.utils.app_init_cache import get_verkada_app_init
+
+
+class FakeResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), 7):
+            yield self.body[start:start + 7]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Stands in for a VerkadaClient; each stream() call takes the next body or exception."""
+
+    def __init__(self, *outcomes, started=None, release=None):
+        self.org_id = str(uuid.uuid4())
+        self.org_name = 'test-org'
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.started = started
+        self.release = release
+
+    def stream(self, method, url, decode, **kwargs):
+        self.calls += 1
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return decode(FakeResponse(outcome))
+
+
+INIT_BODY = b'{"cameras": [{"cameraId": "c1"}, {"cameraId": "c2"}], "permissions": {"x": [1]}, "cameraGroups": []}'
+
+
+def test_decodes_only_the_requested_arrays():
+    client = FakeClient(INIT_BODY)
+    assert get_verkada_app_init(client) == {'cameras': [{'cameraId': 'c1'}, {'cameraId': 'c2'}]}
+
+
+def test_reuses_a_fresh_payload():
+    client = FakeClient(INIT_BODY)
+    first = get_verkada_app_init(client)
+    assert get_verkada_app_init(client) is first
+    assert client.calls == 1
+
+
+def test_refetches_an_expired_payload():
+    client = FakeClient(INIT_BODY, INIT_BODY)
+    get_verkada_app_init(client)
+    get_verkada_app_init(client, max_age=0)
+    assert client.calls == 2
+
+
+@pytest.mark.parametrize('failure, error', [
+    (RuntimeError('boom'), RuntimeError),
+    # Fails while decoding, after some elements were read
+    (b'{"cameras": [{"cameraId": "c1"}, {"cameraId": ', ValueError),
+])
+def test_failed_fetch_is_not_cached(failure, error):
+    client = FakeClient(failure, INIT_BODY)
+    with pytest.raises(error):
+        get_verkada_app_init(client)
+    assert get_verkada_app_init(client)['cameras'][0] == {'cameraId': 'c1'}
+    assert client.calls == 2
+
+
+def test_concurrent_callers_share_one_fetch():
+    started, release = threading.Event(), threading.Event()
+    client = FakeClient(INIT_BODY, started=started, release=release)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(get_verkada_app_init(client)))
+    leader.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(get_verkada_app_init(client)))
+    waiter.start()
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    assert client.calls == 1
+    assert len(results) == 2 and results[0] is results[1]
@@ -0,0 +1,131 @@
+import pytest
+import requests
+
+from src.helper_functions.verkada_integration.utils.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_endpoint_family, is_breaker_failure,
+)
+from src.helper_functions.verkada_integration.utils.deadline import Deadline, DeadlineExceeded
+from src.helper_functions.verkada_integration.utils.http_utils import requests_with_retry
+from src.helper_functions.verkada_integration.utils.retry_policy import RetryPolicy
+
+URL = 'https://vsensor.command.verkada.com/__v/acme/devices/list'
+# One attempt, so a failed request is not retried
+SINGLE_ATTEMPT_POLICY = RetryPolicy(name='test', max_attempts=1, base_delay=0.0, max_delay=0.0, retry_statuses=frozenset())
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(('vsensor', 'devices', 'org'), failure_threshold=1, recovery_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+class RaisingSession:
+    def __init__(self, exc):
+        self.exc = exc
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise self.exc
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(('vsensor', 'devices', 'org'), failure_threshold=3)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()['skipped'] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(('vsensor', 'devices', 'org'), failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_opens_after_recovery_and_limits_probes():
+    breaker = half_open_breaker()
+    assert not breaker.allow_request()
+
+
+def test_probe_success_closes():
+    breaker = half_open_breaker()
+    breaker.record_outcome(None)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_probe_failure_reopens():
+    breaker = half_open_breaker()
+    breaker.record_outcome(http_error(503))
+    assert breaker.state == OPEN
+
+
+def test_client_errors_do_not_count_as_failures():
+    assert not is_breaker_failure(http_error(429))
+    assert not is_breaker_failure(http_error(404))
+    assert not is_breaker_failure(CircuitOpenError('open'))
+    assert is_breaker_failure(http_error(500))
+    assert is_breaker_failure(requests.ConnectionError())
+
+
+def test_release_probe_frees_the_slot():
+    breaker = half_open_breaker()
+    breaker.release_probe()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_release_probe_outside_half_open_is_a_no_op():
+    breaker = CircuitBreaker(('vsensor', 'devices', 'org'))
+    breaker.release_probe()
+    assert breaker.state == CLOSED
+    assert breaker.half_open_calls == 0
+
+
+def test_interrupted_probe_does_not_leak_its_slot():
+    breaker = half_open_breaker()
+    breaker.release_probe()
+    with pytest.raises(KeyboardInterrupt):
+        requests_with_retry('post', URL, policy=SINGLE_ATTEMPT_POLICY, session=RaisingSession(KeyboardInterrupt()), breaker=breaker)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_request_stopped_by_the_deadline_takes_no_probe_slot():
+    breaker = half_open_breaker()
+    breaker.release_probe()
+    session = RaisingSession(AssertionError('no request should be sent'))
+    with pytest.raises(DeadlineExceeded):
+        requests_with_retry('post', URL, policy=SINGLE_ATTEMPT_POLICY, session=session, breaker=breaker,
+                            deadline=Deadline(0.0, reserve=0.0))
+    assert session.calls == 0
+    assert breaker.allow_request()
+
+
+def test_open_circuit_skips_the_request():
+    breaker = CircuitBreaker(('vsensor', 'devices', 'org'), failure_threshold=1)
+    breaker.record_failure()
+    session = RaisingSession(AssertionError('no request should be sent'))
+    with pytest.raises(CircuitOpenError):
+        requests_with_retry('post', URL, policy=SINGLE_ATTEMPT_POLICY, session=session, breaker=breaker)
+    assert session.calls == 0
+
+
+def test_endpoint_family():
+    assert get_endpoint_family(URL) == ('vsensor', 'devices')
+    assert get_endpoint_family('https://api.verkada.com/cameras/v1/devices') == ('api', 'cameras')
@@ -0,0 +1,90 @@
+import pytest
+
+from src.helper_functions.devices.device_doc_ids import (
+    DEVICE_DOC_ID_MODE_FIELD, DEVICE_DOC_ID_MODE_MIGRATING, DEVICE_DOC_ID_MODE_SERIAL,
+    creates_serial_keyed_devices, device_doc_id, normalize_serial_number,
+)
+from src.helper_functions.verkada_integration.utils import device_index
+
+
+class FakeReference:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, fields):
+        self.id = doc_id
+        self.reference = FakeReference(doc_id)
+        self._fields = fields
+
+    def to_dict(self):
+        return self._fields
+
+
+def test_normalize_serial_number():
+    assert normalize_serial_number('  abc-123\n') == 'ABC-123'
+
+
+@pytest.mark.parametrize('serial_number, doc_id', [
+    ('abc123', 'ABC123'),
+    (' Abc123 ', 'ABC123'),
+    ('a/b', 'A%2FB'),
+    ('a b', 'A%20B'),
+    ('100%', '100%25'),
+    ('.', '%2E'),
+    ('..', '%2E.'),
+    ('__x__', '%5F_X__'),
+])
+def test_device_doc_id(serial_number, doc_id):
+    assert device_doc_id(serial_number) == doc_id
+
+
+def test_device_doc_id_never_contains_a_slash():
+    assert '/' not in device_doc_id('a/b/c')
+
+
+def test_distinct_serials_get_distinct_ids():
+    serials = ['A/B', 'A%2FB', '.', '%2E', '..', '%2E.', '__X__', '%5F_X__', 'AB', 'A B']
+    doc_ids = [device_doc_id(serial) for serial in serials]
+    assert len(set(doc_ids)) == len(serials)
+
+
+@pytest.mark.parametrize('org_data, serial_keyed', [
+    (None, False),
+    ({}, False),
+    ({DEVICE_DOC_ID_MODE_FIELD: DEVICE_DOC_ID_MODE_MIGRATING}, True),
+    ({DEVICE_DOC_ID_MODE_FIELD: DEVICE_DOC_ID_MODE_SERIAL}, True),
+    ({DEVICE_DOC_ID_MODE_FIELD: 'something else'}, False),
+])
+def test_creates_serial_keyed_devices(org_data, serial_keyed):
+    assert creates_serial_keyed_devices(org_data) is serial_keyed
+
+
+def build_index(monkeypatch, *pages):
+    monkeypatch.setattr(device_index, 'iter_device_pages', lambda org_id, fields: iter(pages))
+    return device_index.build_device_index('org')
+
+
+def test_index_matches_normalized_serials(monkeypatch):
+    index = build_index(monkeypatch, [FakeSnapshot('random1', {'deviceSerialNumber': ' abc123 '})])
+    assert index.get('ABC123').reference.id == 'random1'
+    assert index.get('abc123').reference.id == 'random1'
+
+
+def test_index_skips_missing_and_blank_serials(monkeypatch):
+    index = build_index(monkeypatch, [
+        FakeSnapshot('a', {}),
+        FakeSnapshot('b', {'deviceSerialNumber': '  '}),
+        FakeSnapshot('c', {'deviceSerialNumber': 12345}),
+        FakeSnapshot('d', None),
+    ])
+    assert len(index) == 0
+
+
+@pytest.mark.parametrize('order', [1, -1])
+def test_index_prefers_the_serial_keyed_duplicate(monkeypatch, order):
+    duplicates = [FakeSnapshot('random1', {'deviceSerialNumber': 'abc123'}), FakeSnapshot('ABC123', {'deviceSerialNumber': 'ABC123'})]
+    index = build_index(monkeypatch, duplicates[::order])
+    assert index.get('abc123').reference.id == 'ABC123'
+    assert index.pages == 1
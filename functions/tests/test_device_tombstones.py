@@ -0,0 +1,64 @@
+from src.helper_functions.verkada_integration.utils.device_index import IndexedDevice
+from src.helper_functions.verkada_integration.utils.device_tombstones import (
+    TOMBSTONE_GUARD_MIN_DEVICES, VERKADA_REMOVED_FIELD, find_removed_devices, is_removed_from_verkada,
+)
+
+
+def device(verkada_device_id, device_type='Camera', **fields):
+    return IndexedDevice(reference=f"ref-{verkada_device_id}", fields={
+        'deviceVerkadaDeviceId': verkada_device_id,
+        'deviceVerkadaDeviceType': device_type,
+        **fields,
+    })
+
+
+def removed_ids(devices):
+    return sorted(found.fields['deviceVerkadaDeviceId'] for found in devices)
+
+
+def test_unlisted_devices_are_removed():
+    devices = [device('c1'), device('c2'), device('c3')]
+    assert removed_ids(find_removed_devices(devices, {'c1', 'c3'}, {'Camera'})) == ['c2']
+
+
+def test_only_completely_fetched_types_are_considered():
+    devices = [device('c1'), device('s1', 'Sensor'), device('s2', 'Sensor')]
+    assert removed_ids(find_removed_devices(devices, {'s1'}, {'Sensor'})) == ['s2']
+
+
+def test_devices_without_a_verkada_id_are_ignored():
+    devices = [device(None), device(''), device('c1')]
+    assert find_removed_devices(devices, {'c1'}, {'Camera'}) == []
+
+
+def test_already_marked_devices_are_left_out():
+    devices = [device('c1', **{VERKADA_REMOVED_FIELD: True}), device('c2')]
+    assert removed_ids(find_removed_devices(devices, {'c2'}, {'Camera'})) == []
+
+
+def test_ids_are_compared_as_strings():
+    assert find_removed_devices([device(12345)], {'12345'}, {'Camera'}) == []
+
+
+def test_guard_skips_a_type_that_would_mostly_disappear():
+    devices = [device(f"c{i}") for i in range(TOMBSTONE_GUARD_MIN_DEVICES * 2)] + [device('s1', 'Sensor'), device('s2', 'Sensor')]
+    removed = find_removed_devices(devices, {'c0', 's1'}, {'Camera', 'Sensor'})
+    assert removed_ids(removed) == ['s2']
+
+
+def test_guard_allows_a_small_removal():
+    devices = [device(f"c{i}") for i in range(TOMBSTONE_GUARD_MIN_DEVICES)]
+    assert len(find_removed_devices(devices, set(), {'Camera'})) == TOMBSTONE_GUARD_MIN_DEVICES
+
+
+def test_guard_allows_removing_up_to_the_max_fraction():
+    devices = [device(f"c{i}") for i in range(TOMBSTONE_GUARD_MIN_DEVICES * 4)]
+    listed = {f"c{i}" for i in range(TOMBSTONE_GUARD_MIN_DEVICES * 2, TOMBSTONE_GUARD_MIN_DEVICES * 4)}
+    assert len(find_removed_devices(devices, listed, {'Camera'})) == TOMBSTONE_GUARD_MIN_DEVICES * 2
+
+
+def test_is_removed_from_verkada():
+    assert is_removed_from_verkada({VERKADA_REMOVED_FIELD: True})
+    assert not is_removed_from_verkada({VERKADA_REMOVED_FIELD: False})
+    assert not is_removed_from_verkada({})
+    assert not is_removed_from_verkada(None)
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from google.cloud.firestore_v1.bulk_writer import BulkWriteFailure
+
+from src.helper_functions.verkada_integration.utils.firestore_writes import BULK_WRITE_MAX_ATTEMPTS, FirestoreWriteEngine
+
+UNAVAILABLE = 14
+INVALID_ARGUMENT = 3
+
+
+def failure(path, code, retries):
+    """A failure as BulkWriter reports it: attempts counts the retries made so far, from 0."""
+    operation = SimpleNamespace(reference=SimpleNamespace(path=path), attempts=retries)
+    return BulkWriteFailure(operation=operation, code=code, message='error')
+
+
+def test_transient_errors_are_retried_up_to_the_max_attempts():
+    engine = FirestoreWriteEngine('test')
+    retried = [engine._on_write_error(failure('devices/a', UNAVAILABLE, retries), None) for retries in range(BULK_WRITE_MAX_ATTEMPTS)]
+    assert retried == [True] * (BULK_WRITE_MAX_ATTEMPTS - 1) + [False]
+    assert engine.results['devices/a'].attempts == BULK_WRITE_MAX_ATTEMPTS
+    engine.close()
+
+
+def test_permanent_error_counts_one_attempt():
+    engine = FirestoreWriteEngine('test')
+    assert not engine._on_write_error(failure('devices/a', INVALID_ARGUMENT, 0), None)
+    assert engine.results['devices/a'] == ('devices/a', False, 1, '3: error', INVALID_ARGUMENT)
+    engine.close()
+
+
+def test_success_after_a_retry_counts_both_attempts():
+    engine = FirestoreWriteEngine('test')
+    assert engine._on_write_error(failure('devices/a', UNAVAILABLE, 0), None)
+    engine._on_write_result(SimpleNamespace(path='devices/a'), None, None)
+    engine._on_write_result(SimpleNamespace(path='devices/b'), None, None)
+    assert engine.results['devices/a'].attempts == 2
+    assert engine.results['devices/b'].attempts == 1
+    assert len(engine.succeeded) == 2
+    engine.close()
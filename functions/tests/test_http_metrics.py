@@ -0,0 +1,38 @@
+import uuid
+
+from src.helper_functions.verkada_integration.utils.http_metrics import RunHttpCounts, get_http_metrics, record_attempt, record_call
+
+URL = 'https://vsensor.command.verkada.com/__v/acme/devices/list'
+
+
+def send(verkada_org_id, http_counts, attempts=1, succeeded=True):
+    for _ in range(attempts):
+        record_attempt(verkada_org_id, 'post', URL, 200 if succeeded else 503, 0.01, http_counts=http_counts)
+    record_call(verkada_org_id, 'post', URL, attempts, succeeded, http_counts=http_counts)
+
+
+def test_runs_count_only_their_own_calls():
+    verkada_org_id = str(uuid.uuid4())
+    first, second = RunHttpCounts(), RunHttpCounts()
+    send(verkada_org_id, first, attempts=3, succeeded=False)
+    send(verkada_org_id, second)
+    send(verkada_org_id, None)
+    assert first.summary() == {
+        'calls': 1, 'attempts': 3, 'failedCalls': 1,
+        'endpoints': {'POST vsensor/__v/{org}/devices/list': {'calls': 1, 'attempts': 3, 'failedCalls': 1}},
+    }
+    assert second.summary()['calls'] == 1
+    assert get_http_metrics(verkada_org_id)['POST vsensor/__v/{org}/devices/list']['calls'] == 3
+
+
+def test_resetting_the_global_metrics_does_not_affect_a_run():
+    verkada_org_id = str(uuid.uuid4())
+    counts = RunHttpCounts()
+    send(verkada_org_id, counts)
+    get_http_metrics(verkada_org_id, reset=True)
+    send(verkada_org_id, counts)
+    assert counts.summary()['calls'] == 2
+
+
+def test_empty_summary():
+    assert RunHttpCounts().summary() == {'calls': 0, 'attempts': 0, 'failedCalls': 0, 'endpoints': {}}
@@ -0,0 +1,70 @@
+import json
+import uuid
+
+from src.helper_functions.verkada_integration.utils import inventory_snapshot
+from src.helper_functions.verkada_integration.utils.app_init_cache import get_verkada_app_init
+from src.helper_functions.verkada_integration.utils.inventory_snapshot import SECTION_SITES, get_inventory_snapshot, take_inventory_snapshot
+
+
+class FakeResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def iter_content(self, chunk_size=1):
+        yield self.body
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    """Stands in for a VerkadaClient whose init payload lists the given sites."""
+
+    def __init__(self, verkada_bot_user_info):
+        self.org_id = verkada_bot_user_info['org_id']
+        self.org_name = verkada_bot_user_info['org_name']
+        self.site_ids = []
+        self.calls = 0
+
+    def stream(self, method, url, decode, **kwargs):
+        self.calls += 1
+        body = {'cameraGroups': [{'cameraGroupId': site_id} for site_id in self.site_ids]}
+        return decode(FakeResponse(json.dumps(body).encode()))
+
+
+def make_client(monkeypatch):
+    verkada_bot_user_info = {'org_id': str(uuid.uuid4()), 'org_name': 'test-org'}
+    client = FakeClient(verkada_bot_user_info)
+    monkeypatch.setattr(inventory_snapshot, 'get_verkada_client', lambda *args, **kwargs: client)
+    return verkada_bot_user_info, client
+
+
+def site_ids(snapshot):
+    return [site['siteId'] for site in snapshot.get(SECTION_SITES)]
+
+
+def test_fresh_snapshot_does_not_reuse_the_cached_init_payload(monkeypatch):
+    verkada_bot_user_info, client = make_client(monkeypatch)
+    client.site_ids = ['s1']
+    assert site_ids(take_inventory_snapshot(verkada_bot_user_info, sections=(SECTION_SITES,))) == ['s1']
+    # e.g. a grant made a second site visible
+    client.site_ids = ['s1', 's2']
+    assert site_ids(take_inventory_snapshot(verkada_bot_user_info, sections=(SECTION_SITES,))) == ['s1', 's2']
+    assert client.calls == 2
+
+
+def test_reused_snapshot_reads_no_payload(monkeypatch):
+    verkada_bot_user_info, client = make_client(monkeypatch)
+    client.site_ids = ['s1']
+    take_inventory_snapshot(verkada_bot_user_info, sections=(SECTION_SITES,))
+    client.site_ids = ['s1', 's2']
+    assert site_ids(get_inventory_snapshot(verkada_bot_user_info, sections=(SECTION_SITES,))) == ['s1']
+    assert client.calls == 1
+
+
+def test_fresh_payload_is_cached_for_later_readers(monkeypatch):
+    verkada_bot_user_info, client = make_client(monkeypatch)
+    client.site_ids = ['s1']
+    take_inventory_snapshot(verkada_bot_user_info, sections=(SECTION_SITES,))
+    get_verkada_app_init(client)
+    assert client.calls == 1
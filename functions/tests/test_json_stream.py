@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from src.helper_functions.verkada_integration.utils.json_stream import (
+    iter_json_array, iter_json_members, stream_response_array, stream_response_members,
+)
+
+ELEMENTS = [
+    {'id': 1, 'name': 'plain'},
+    {'id': 2, 'name': 'quote " and backslash \\', 'tags': ['[', ']', '{', '}']},
+    {'id': 3, 'name': 'café ☃ \U0001F600', 'nested': {'a': [1, 2.5, None, True, False]}},
+    'a string',
+    -12.5e3,
+    None,
+    [],
+    {},
+]
+
+
+def chunked(body: bytes, size: int):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+class FakeResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        return iter(chunked(self.body, chunk_size))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+def test_top_level_array_in_any_chunking(chunk_size):
+    body = json.dumps(ELEMENTS, ensure_ascii=False).encode()
+    assert list(iter_json_array(chunked(body, chunk_size))) == ELEMENTS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1024])
+def test_array_under_key(chunk_size):
+    body = json.dumps({
+        'before': {'devices': ['not this one'], 'text': 'a "]" inside'},
+        'devices': ELEMENTS,
+        'after': [1, 2, 3],
+    }, ensure_ascii=False).encode()
+    assert list(iter_json_array(chunked(body, chunk_size), 'devices')) == ELEMENTS
+
+
+def test_members_in_document_order():
+    body = json.dumps({'cameras': [1, 2], 'skipped': [9], 'groups': [{'g': 1}], 'scalar': 5}).encode()
+    members = list(iter_json_members(chunked(body, 3), ['groups', 'cameras']))
+    assert members == [('cameras', 1), ('cameras', 2), ('groups', {'g': 1})]
+
+
+def test_keys_with_non_array_values_are_skipped():
+    body = b'{"cameras": {"not": "an array"}, "groups": null}'
+    assert list(iter_json_members(chunked(body, 4), ['cameras', 'groups'])) == []
+
+
+def test_missing_key_yields_nothing():
+    assert list(iter_json_array(chunked(b'{"other": [1, 2]}', 4), 'devices')) == []
+
+
+@pytest.mark.parametrize('body', [b'[]', b' [ ] ', b'{"devices": []}'])
+def test_empty_arrays(body):
+    assert list(iter_json_array(chunked(body, 2), 'devices')) == []
+
+
+def test_whitespace_between_tokens():
+    body = b' {\n "devices" :\t[ 1 ,\r\n 2 ] \n} '
+    assert list(iter_json_array(chunked(body, 1), 'devices')) == [1, 2]
+
+
+@pytest.mark.parametrize('body', [
+    b'[1, 2',
+    b'[{"a": 1}, {"a": ',
+    b'{"devices": [1 2]}',
+    b'{"devices": ["unterminated]}',
+    b'"not a container"',
+])
+def test_invalid_bodies_raise_value_error(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(body, 3), 'devices'))
+
+
+def test_elements_before_an_error_are_yielded():
+    elements = iter_json_array(chunked(b'[1, 2, {"broken"', 2))
+    assert next(elements) == 1
+    assert next(elements) == 2
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+def test_stream_response_array_closes_the_response():
+    response = FakeResponse(b'{"devices": [1, 2, 3]}')
+    assert list(stream_response_array(response, 'devices', chunk_size=4)) == [1, 2, 3]
+    assert response.closed
+
+
+def test_stream_response_members_closes_the_response_on_error():
+    response = FakeResponse(b'{"cameras": [1, ')
+    with pytest.raises(ValueError):
+        list(stream_response_members(response, ['cameras'], chunk_size=4))
+    assert response.closed
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from src.helper_functions.verkada_integration.utils.retry_policy import READ_POLICY, RetryPolicy, compute_backoff, parse_retry_after
+
+
+def make_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+def http_error(status_code, headers=None):
+    return requests.HTTPError(response=make_response(status_code, headers))
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after(make_response(429, {'Retry-After': ' 7 '})) == 7.0
+    assert parse_retry_after(make_response(429, {'Retry-After': '1.5'})) == 1.5
+
+
+def test_parse_retry_after_negative_seconds_is_zero():
+    assert parse_retry_after(make_response(429, {'Retry-After': '-3'})) == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    seconds = parse_retry_after(make_response(503, {'Retry-After': format_datetime(retry_at, usegmt=True)}))
+    assert 25 <= seconds <= 30
+
+
+def test_parse_retry_after_past_http_date_is_zero():
+    retry_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert parse_retry_after(make_response(503, {'Retry-After': format_datetime(retry_at, usegmt=True)})) == 0.0
+
+
+@pytest.mark.parametrize('headers', [{}, {'Retry-After': ''}, {'Retry-After': 'soon'}])
+def test_parse_retry_after_missing_or_invalid(headers):
+    assert parse_retry_after(make_response(429, headers)) is None
+
+
+def test_parse_retry_after_without_response():
+    assert parse_retry_after(None) is None
+
+
+def test_compute_backoff_is_capped_exponential(monkeypatch):
+    policy = RetryPolicy(name='test', max_attempts=10, base_delay=0.5, max_delay=3.0, retry_statuses=frozenset({500}))
+    upper_bounds = []
+
+    def uniform(low, high):
+        upper_bounds.append((low, high))
+        return high
+
+    monkeypatch.setattr('random.uniform', uniform)
+    for attempt in range(1, 6):
+        compute_backoff(attempt, policy)
+    assert upper_bounds == [(0, 0.5), (0, 1.0), (0, 2.0), (0, 3.0), (0, 3.0)]
+
+
+def test_compute_backoff_is_jittered():
+    policy = RetryPolicy(name='test', max_attempts=3, base_delay=1.0, max_delay=1.0, retry_statuses=frozenset({500}))
+    delays = [compute_backoff(1, policy) for _ in range(50)]
+    assert all(0 <= delay <= 1.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_compute_backoff_honors_retry_after_on_throttling():
+    assert compute_backoff(1, READ_POLICY, http_error(429, {'Retry-After': '12'})) == 12.0
+
+
+def test_compute_backoff_ignores_retry_after_on_other_statuses():
+    delay = compute_backoff(1, READ_POLICY, http_error(500, {'Retry-After': '120'}))
+    assert delay <= READ_POLICY.base_delay
+
+
+def test_compute_backoff_falls_back_without_retry_after():
+    delay = compute_backoff(1, READ_POLICY, http_error(429))
+    assert 0 <= delay <= READ_POLICY.base_delay
@@ -0,0 +1,50 @@
+from src.helper_functions.verkada_integration.syncers.sync_verkada_device_ids import _is_type_in_sync
+from src.helper_functions.verkada_integration.utils.device_index import DeviceIndex, IndexedDevice
+from src.helper_functions.verkada_integration.utils.device_tombstones import VERKADA_REMOVED_FIELD
+from src.helper_functions.verkada_integration.utils.verkada_device_types import VerkadaDeviceRecord, VerkadaDeviceType
+
+CAMERA = VerkadaDeviceType('Camera', 'appInit', 'cameras', 'cameraId', 'serialNumber', reclassified_as='Intercom')
+RECORDS = [VerkadaDeviceRecord('c1', 'ALP-0001'), VerkadaDeviceRecord('c2', 'ALP-0002')]
+
+
+def synced(verkada_device_id, **fields):
+    return {'deviceVerkadaDeviceId': verkada_device_id, 'deviceVerkadaDeviceType': 'Camera', **fields}
+
+
+def index(**devices):
+    return DeviceIndex({serial: IndexedDevice(f"ref-{serial}", fields) for serial, fields in devices.items()}, pages=1)
+
+
+def test_in_sync_when_every_device_is_stored_as_listed():
+    device_index = index(**{'ALP-0001': synced('c1'), 'ALP-0002': synced('c2')})
+    assert _is_type_in_sync(CAMERA, RECORDS, device_index, {})
+
+
+def test_device_created_in_the_app_without_its_verkada_id():
+    device_index = index(**{'ALP-0001': synced('c1'), 'ALP-0002': {'deviceSerialNumber': 'ALP-0002'}})
+    assert not _is_type_in_sync(CAMERA, RECORDS, device_index, {})
+
+
+def test_deleted_device():
+    assert not _is_type_in_sync(CAMERA, RECORDS, index(**{'ALP-0001': synced('c1')}), {})
+
+
+def test_verkada_fields_edited_in_firestore():
+    device_index = index(**{'ALP-0001': synced('c1'), 'ALP-0002': synced('c2', deviceVerkadaDeviceType='Sensor')})
+    assert not _is_type_in_sync(CAMERA, RECORDS, device_index, {})
+
+
+def test_device_marked_removed():
+    device_index = index(**{'ALP-0001': synced('c1'), 'ALP-0002': synced('c2', **{VERKADA_REMOVED_FIELD: True})})
+    assert not _is_type_in_sync(CAMERA, RECORDS, device_index, {})
+
+
+def test_changed_site():
+    device_index = index(**{'ALP-0001': synced('c1', deviceVerkadaSiteId='s1'), 'ALP-0002': synced('c2', deviceVerkadaSiteId='s1')})
+    assert _is_type_in_sync(CAMERA, RECORDS, device_index, {'c1': 's1', 'c2': 's1'})
+    assert not _is_type_in_sync(CAMERA, RECORDS, device_index, {'c1': 's1', 'c2': 's2'})
+
+
+def test_reclassified_and_incomplete_records_are_ignored():
+    records = [VerkadaDeviceRecord('c1', 'ALP-0001'), VerkadaDeviceRecord('i1', 'CHA-0001'), VerkadaDeviceRecord(None, 'ALP-0003')]
+    assert _is_type_in_sync(CAMERA, records, index(**{'ALP-0001': synced('c1')}), {})